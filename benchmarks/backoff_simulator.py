@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""Trace-replay simulator for the recorder's offline polling policy.
+
+Replays online/offline timelines for many channels on a virtual clock, through the
+recorder's own _should_check_user_now/_update_user_check_schedule (so backoff and the
+learned schedule behave exactly as in production) or through a plug-in policy, and
+reports per setting:
+
+- Helix calls (one per channel check) in total and per hour
+- detection delay from go-live to the first check that sees the channel online
+- streams missed entirely (over before any check) and minutes lost at stream starts
+
+Weeks of traffic replay in seconds of CPU time. Traces are JSON
+{"channels": {"name": [[start, end], ...]}} with Unix timestamps; build one from a
+recording directory or generate a synthetic one:
+
+    python benchmarks/backoff_simulator.py --synthetic 200 --weeks 4 --base 60,120 --max 600,1800
+    python benchmarks/backoff_simulator.py --from-recordings /mnt/recordings --write-trace trace.json
+    python benchmarks/backoff_simulator.py --trace trace.json --policy fixed,backoff,learned
+    python benchmarks/backoff_simulator.py --trace trace.json --policy backoff,learned --learned-budget 200,600
+    python benchmarks/backoff_simulator.py --trace trace.json --policy mypolicies:Jittered
+"""
+import argparse
+import datetime
+import heapq
+import importlib
+import json
+import logging
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import harness
+
+
+class Policy:
+    """When to check a channel. Plug-ins subclass this and are named as "module:Class".
+
+    The simulator constructs it with (usernames, refresh, args) and drives it like the
+    recorder's check loop: due() for every channel each cycle, then observe() with the
+    check result. A channel that is seen online is recording, and not checked, until its
+    stream ends; observe() is then called with online=True.
+    """
+    name = "custom"
+
+    def __init__(self, usernames, refresh, args):
+        self.usernames = usernames
+        self.refresh = refresh
+
+    def due(self, username, now):
+        return True
+
+    def next_check_at(self, username):
+        """Earliest time the channel can be due again, or None to ask every cycle"""
+        return None
+
+    def detected(self, username, started_at, now):
+        """A check at now found the channel live since started_at"""
+
+    def observe(self, username, online, now):
+        """A check at now came back offline, or a recording ended"""
+
+    def close(self):
+        pass
+
+
+class RecorderPolicy(Policy):
+    """The recorder's own scheduling, on a TwitchRecorder that never touches the network"""
+
+    def __init__(self, usernames, refresh, args, module, clock, backoff=True, learned=False,
+                 base_seconds=60, max_seconds=600, budget_per_hour=600):
+        super().__init__(usernames, refresh, args)
+        self.name = "learned" if learned else "backoff" if backoff else "fixed"
+        self._module = module
+        self._workdir = tempfile.mkdtemp(prefix="twitch-recorder-backoff-sim-")
+        # Only the state the scheduling methods read; __init__ would start the whole recorder
+        recorder = module.TwitchRecorder.__new__(module.TwitchRecorder)
+        recorder._clock = clock
+        recorder.usernames = usernames
+        recorder.refresh = refresh
+        recorder.offline_backoff_enabled = backoff
+        recorder.offline_backoff_base_seconds = base_seconds
+        recorder.offline_backoff_max_seconds = max(base_seconds, max_seconds)
+        recorder.learned_schedule_api_budget_per_hour = budget_per_hour
+        recorder.learned_schedule_min_events = args.learned_min_events
+        recorder.learned_schedule_max_interval_seconds = max(refresh, args.learned_max_interval)
+        recorder._offline_backoff_lock = module.threading.Lock()
+        recorder._offline_check_counts = {}
+        recorder._next_user_check_at = {}
+        recorder._schedule_constant_cache = None
+        recorder._go_live_schedule = (
+            module.GoLiveSchedule(os.path.join(self._workdir, "golive-schedule.json")) if learned else None
+        )
+        self.recorder = recorder
+
+    def due(self, username, now):
+        return self.recorder._should_check_user_now(username, now)
+
+    def next_check_at(self, username):
+        if not self.recorder.offline_backoff_enabled:
+            return None
+        return self.recorder._next_user_check_at.get(username, 0)
+
+    def detected(self, username, started_at, now):
+        started = datetime.datetime.fromtimestamp(started_at, datetime.timezone.utc)
+        self.recorder._observe_go_live(username, {"data": [{"started_at": started.strftime("%Y-%m-%dT%H:%M:%SZ")}]})
+
+    def observe(self, username, online, now):
+        status = self._module.TwitchResponseStatus.ONLINE if online else self._module.TwitchResponseStatus.OFFLINE
+        self.recorder._update_user_check_schedule(username, status)
+
+    def close(self):
+        shutil.rmtree(self._workdir, ignore_errors=True)
+
+
+class Simulation:
+    """Discrete-event replay of one trace through one policy on a virtual clock.
+
+    Checks happen on the recorder's cycle grid (start + k * refresh). Each channel has
+    one pending event: its next candidate check, or the end of the stream it is recording.
+    """
+
+    def __init__(self, trace, policy, refresh, start, end):
+        self.trace = trace
+        self.policy = policy
+        self.refresh = refresh
+        self.start = start
+        self.end = end
+        self.now = start
+
+    def _next_cycle(self, after):
+        """First cycle time at or after the given time"""
+        cycles = max(0, math.ceil((after - self.start) / self.refresh - 1e-9))
+        return self.start + cycles * self.refresh
+
+    def _schedule_check(self, events, username, after):
+        hint = self.policy.next_check_at(username)
+        at = self._next_cycle(max(after, hint or 0))
+        if at < self.end:
+            heapq.heappush(events, (at, 0, username))
+
+    def run(self):
+        delays = []
+        missed = 0
+        lost_seconds = 0.0
+        calls = 0
+        position = {username: 0 for username in self.trace}
+        events = [(self.start, 0, username) for username in self.trace]
+        heapq.heapify(events)
+
+        while events:
+            at, kind, username = heapq.heappop(events)
+            self.now = at
+            intervals = self.trace[username]
+            if kind == 1:  # The stream being recorded ended
+                self.policy.observe(username, True, at)
+                self._schedule_check(events, username, self._next_cycle(at))
+                continue
+            if not self.policy.due(username, at):
+                self._schedule_check(events, username, at + self.refresh)
+                continue
+
+            calls += 1
+            index = position[username]
+            while index < len(intervals) and intervals[index][1] <= at:
+                # Over before any check saw it
+                missed += 1
+                lost_seconds += intervals[index][1] - max(intervals[index][0], self.start)
+                index += 1
+            position[username] = index
+            if index < len(intervals) and intervals[index][0] <= at:
+                stream_start, stream_end = intervals[index]
+                delays.append(round(at - max(stream_start, self.start), 1))
+                lost_seconds += at - max(stream_start, self.start)
+                self.policy.detected(username, stream_start, at)
+                position[username] = index + 1
+                heapq.heappush(events, (min(stream_end, self.end), 1, username))
+            else:
+                self.policy.observe(username, False, at)
+                self._schedule_check(events, username, at + self.refresh)
+
+        for username, intervals in self.trace.items():
+            for stream_start, stream_end in intervals[position[username]:]:
+                if stream_end <= self.end:
+                    missed += 1
+                    lost_seconds += stream_end - max(stream_start, self.start)
+        return delays, missed, lost_seconds, calls
+
+
+def load_trace(path):
+    with open(path, "r") as file:
+        data = json.load(file)
+    return {username: merge_intervals(intervals) for username, intervals in data["channels"].items()}
+
+
+def merge_intervals(intervals):
+    merged = []
+    for start, end in sorted((float(start), float(end)) for start, end in intervals if end > start):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def synthetic_trace(channels, weeks, seed, start):
+    """Weekly schedules with start-time jitter and skipped days, plus unscheduled streams"""
+    rng = random.Random(seed)
+    trace = {}
+    for index in range(channels):
+        intervals = []
+        slots = [
+            (rng.randrange(7), rng.randrange(10, 23) * 3600 + rng.choice((0, 1800)), rng.uniform(2, 6) * 3600)
+            for _ in range(rng.randint(0, 5))
+        ]
+        jitter = rng.choice((120, 600, 1800))
+        for week in range(weeks):
+            week_start = start + week * 7 * 86400
+            for day, offset, duration in slots:
+                if rng.random() < 0.85:
+                    begin = week_start + day * 86400 + offset + rng.gauss(0, jitter)
+                    intervals.append([begin, begin + duration * rng.uniform(0.8, 1.2)])
+            for _ in range(rng.randint(0, 2)):
+                begin = week_start + rng.uniform(0, 7 * 86400)
+                intervals.append([begin, begin + rng.uniform(0.5, 4) * 3600])
+        trace[f"channel{index:04d}"] = merge_intervals(
+            [[max(start, begin), end] for begin, end in intervals if end > start]
+        )
+    return trace
+
+
+def trace_from_recordings(root, max_hours):
+    """Streams from recording filenames: start from the name, end from the file's mtime"""
+    trace = {}
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            parts = filename.split(" - ")
+            if len(parts) < 3:
+                continue
+            try:
+                started = datetime.datetime.strptime(parts[1], '%Y-%m-%d %Hh%Mm%Ss').timestamp()
+                ended = os.path.getmtime(os.path.join(directory, filename))
+            except (ValueError, OSError):
+                continue
+            if ended > started:
+                trace.setdefault(parts[0], []).append([started, min(ended, started + max_hours * 3600)])
+    return {username: merge_intervals(intervals) for username, intervals in trace.items()}
+
+
+def build_policy(name, module, usernames, refresh, args, clock, base_seconds, max_seconds, budget_per_hour):
+    if name in ("backoff", "learned", "fixed"):
+        return RecorderPolicy(
+            usernames, refresh, args, module, clock, backoff=name != "fixed", learned=name == "learned",
+            base_seconds=base_seconds, max_seconds=max_seconds, budget_per_hour=budget_per_hour
+        )
+    module_name, _, class_name = name.partition(":")
+    policy_class = getattr(importlib.import_module(module_name), class_name)
+    return policy_class(usernames, refresh, args)
+
+
+def run_scenario(module, trace, policy_name, base_seconds, max_seconds, budget_per_hour, args, start, end):
+    holder = {}
+    policy = build_policy(
+        policy_name, module, sorted(trace), args.refresh, args, lambda: holder["simulation"].now,
+        base_seconds, max_seconds, budget_per_hour
+    )
+    simulation = Simulation(trace, policy, args.refresh, start, end)
+    holder["simulation"] = simulation
+    cpu_started = time.process_time()
+    try:
+        delays, missed, lost_seconds, calls = simulation.run()
+    finally:
+        policy.close()
+    cpu_seconds = time.process_time() - cpu_started
+
+    hours = (end - start) / 3600
+    streams = len(delays) + missed
+    return {
+        "policy": getattr(policy, "name", policy_name),
+        "base_seconds": base_seconds,
+        "max_seconds": max_seconds,
+        "learned_budget_per_hour": budget_per_hour,
+        "channels": len(trace),
+        "streams": streams,
+        "helix_calls": calls,
+        "helix_calls_per_hour": round(calls / hours, 1),
+        "detection_delay_seconds": harness.summarize(delays),
+        "detection_delay_seconds_p90": harness.percentile(delays, 0.9),
+        "detection_delay_seconds_p99": harness.percentile(delays, 0.99),
+        "streams_missed": missed,
+        "minutes_lost": round(lost_seconds / 60, 1),
+        "simulated_days": round(hours / 24, 1),
+        "cpu_seconds": round(cpu_seconds, 2),
+    }
+
+
+def parse_list(value, kind=int):
+    return [kind(item) for item in value.split(",") if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--trace", help="trace JSON to replay")
+    source.add_argument("--synthetic", type=int, metavar="CHANNELS", help="generate a trace with this many channels")
+    source.add_argument("--from-recordings", metavar="ROOT", help="build a trace from recording filenames under ROOT")
+    parser.add_argument("--weeks", type=int, default=4, help="length of a synthetic trace")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--max-stream-hours", type=float, default=24, help="cap on streams read from recordings")
+    parser.add_argument("--write-trace", help="save the trace being replayed to this file")
+    parser.add_argument("--policy", default="fixed,backoff", help="comma-separated: fixed, backoff, learned, module:Class")
+    parser.add_argument("--refresh", type=int, default=60, help="refresh_interval (seconds between check cycles)")
+    parser.add_argument("--base", default="60", help="comma-separated offline_backoff_base_seconds to sweep")
+    parser.add_argument("--max", default="600", help="comma-separated offline_backoff_max_seconds to sweep")
+    parser.add_argument("--learned-budget", default="600", help="comma-separated learned_schedule_api_budget_per_hour to sweep")
+    parser.add_argument("--learned-min-events", type=int, default=5, help="learned_schedule_min_events")
+    parser.add_argument("--learned-max-interval", type=int, default=1800, help="learned_schedule_max_interval_seconds")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        start = datetime.datetime(2024, 1, 1).timestamp()
+        end = start + args.weeks * 7 * 86400
+        trace = synthetic_trace(args.synthetic, args.weeks, args.seed, start)
+    else:
+        trace = load_trace(args.trace) if args.trace else trace_from_recordings(args.from_recordings, args.max_stream_hours)
+        if not any(trace.values()):
+            print("No streams in the trace")
+            return 1
+        start = min(intervals[0][0] for intervals in trace.values() if intervals)
+        end = max(intervals[-1][1] for intervals in trace.values() if intervals)
+    if args.write_trace:
+        with open(args.write_trace, "w") as file:
+            json.dump({"channels": trace}, file)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    module = harness.load_recorder_module()
+    results = []
+    for policy_name in args.policy.split(","):
+        # Only the recorder's backoff reads the base and max settings, only the learned schedule the budget
+        budgets = parse_list(args.learned_budget) if policy_name == "learned" else [None]
+        sweep = (
+            [(base, maximum, budget) for base in parse_list(args.base) for maximum in parse_list(args.max)
+             for budget in budgets]
+            if policy_name in ("backoff", "learned") else [(None, None, None)]
+        )
+        for base_seconds, max_seconds, budget in sweep:
+            result = run_scenario(
+                module, trace, policy_name, base_seconds or 60, max_seconds or 600, budget or 600, args, start, end
+            )
+            if base_seconds is None:
+                result["base_seconds"] = result["max_seconds"] = None
+            result["learned_budget_per_hour"] = budget
+            delay = result["detection_delay_seconds"]
+            settings = f"base {base_seconds}s max {max_seconds}s" if base_seconds else ""
+            if budget:
+                settings += f" budget {budget}/h"
+            print(
+                f"{result['policy']:>8} {settings:>34} | {result['helix_calls']} calls "
+                f"({result['helix_calls_per_hour']}/h) | delay p50/p90/p99/max "
+                f"{delay['p50']}/{result['detection_delay_seconds_p90']}/{result['detection_delay_seconds_p99']}/"
+                f"{delay['max']}s | missed {result['streams_missed']}/{result['streams']} "
+                f"lost {result['minutes_lost']}min | {result['simulated_days']} days in {result['cpu_seconds']}s CPU"
+            )
+            results.append(result)
+
+    path = harness.save_results("backoff", results)
+    print(f"\nResults saved to {path}")
+    if args.compare:
+        harness.compare_results(args.compare, results, ["policy", "base_seconds", "max_seconds", "learned_budget_per_hour"])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
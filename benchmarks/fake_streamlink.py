@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Stand-in for the streamlink CLI used by the benchmarks.
+
+Accepts the arguments record_stream passes (``... twitch.tv/<user> <quality> -o <file>``)
+and writes MPEG-TS data to the output file at a fixed bitrate until the mock API
+reports the channel offline or the process is terminated.
+
+Environment:
+    FAKE_STREAMLINK_BITRATE   bits per second to write (default 6000000)
+    FAKE_STREAMLINK_SAMPLE    TS file to loop; null TS packets are written when unset
+    FAKE_HELIX_URL            mock API base URL, polled to find out when the stream ends
+"""
+import json
+import os
+import sys
+import time
+import urllib.parse
+import urllib.request
+
+TS_PACKET_SIZE = 188
+# Null packet (PID 0x1FFF) so the output is at least valid TS framing
+NULL_PACKET = bytes([0x47, 0x1F, 0xFF, 0x10]) + bytes([0xFF] * (TS_PACKET_SIZE - 4))
+WRITE_INTERVAL = 0.25
+STATUS_INTERVAL = 2.0
+
+
+def channel_online(base_url, user):
+    if not base_url:
+        return True
+    try:
+        query = urllib.parse.urlencode({"user": user})
+        with urllib.request.urlopen(f"{base_url}/control/status?{query}", timeout=5) as response:
+            return json.load(response).get("online", False)
+    except Exception:
+        return True
+
+
+def main(argv):
+    if "--version" in argv:
+        print("streamlink 6.0.0 (benchmark fake)")
+        return 0
+
+    output = argv[argv.index("-o") + 1]
+    url = next(arg for arg in argv if "twitch.tv/" in arg)
+    user = url.rsplit("/", 1)[-1]
+    bitrate = int(os.environ.get("FAKE_STREAMLINK_BITRATE", "6000000"))
+    base_url = os.environ.get("FAKE_HELIX_URL")
+
+    sample_path = os.environ.get("FAKE_STREAMLINK_SAMPLE")
+    if sample_path and os.path.exists(sample_path):
+        with open(sample_path, "rb") as file:
+            sample = file.read()
+    else:
+        sample = NULL_PACKET * 5000
+
+    bytes_per_tick = max(TS_PACKET_SIZE, int(bitrate / 8 * WRITE_INTERVAL) // TS_PACKET_SIZE * TS_PACKET_SIZE)
+    position = 0
+    next_status = time.monotonic() + STATUS_INTERVAL
+    next_write = time.monotonic()
+
+    with open(output, "wb") as file:
+        while True:
+            chunk = bytearray()
+            while len(chunk) < bytes_per_tick:
+                take = min(bytes_per_tick - len(chunk), len(sample) - position)
+                chunk += sample[position:position + take]
+                position = (position + take) % len(sample)
+            file.write(chunk)
+            file.flush()
+
+            now = time.monotonic()
+            if now >= next_status:
+                if not channel_online(base_url, user):
+                    return 0
+                next_status = now + STATUS_INTERVAL
+            next_write += WRITE_INTERVAL
+            time.sleep(max(0.0, next_write - time.monotonic()))
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,278 @@
+"""Shared pieces for the recorder benchmarks.
+
+Provides a mock Twitch API (token endpoint + Helix /streams) running in its own
+process, helpers to load twitch-recorder.py as a module and to write a config
+pointing it at the mock, and result bookkeeping so runs can be compared.
+"""
+import datetime
+import importlib.util
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+FAKE_STREAMLINK = os.path.join(BENCHMARK_DIR, "fake_streamlink.py")
+
+
+def load_recorder_module():
+    """Import twitch-recorder.py (the hyphen keeps it from being imported normally)"""
+    spec = importlib.util.spec_from_file_location("twitch_recorder", os.path.join(REPO_DIR, "twitch-recorder.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class _MockTwitchHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        url = urllib.parse.urlparse(self.path)
+        if url.path == "/oauth2/token":
+            self.server.stats["token_requests"] += 1
+            self._send_json({"access_token": "benchmark-token", "expires_in": 3600, "token_type": "bearer"})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        state = self.server.channel_state
+
+        if url.path == "/helix/streams":
+            now = time.time()
+            with self.server.lock:
+                self.server.stats["helix_requests"] += 1
+                self.server.stats.setdefault("first_helix_request_at", now)
+                recent = [t for t in self.server.request_times if t > now - 60]
+                used = len(recent)
+                rate_headers = {
+                    "Ratelimit-Limit": str(self.server.rate_limit),
+                    "Ratelimit-Remaining": str(max(0, self.server.rate_limit - used - 1)),
+                    # When the oldest point in the window comes back
+                    "Ratelimit-Reset": str(int((recent[0] if recent else now) + 60)),
+                }
+                if used >= self.server.rate_limit:
+                    # Like Helix, a request over the limit is rejected and does not use a point
+                    self.server.stats["throttled"] = self.server.stats.get("throttled", 0) + 1
+                    rate_headers["Ratelimit-Remaining"] = "0"
+                    data = None
+                else:
+                    self.server.request_times.append(now)
+                    data = []
+                    for login in query.get("user_login", []):
+                        channel = state.get(login)
+                        if channel and channel["online"]:
+                            started_at = datetime.datetime.fromtimestamp(channel["started_at"], datetime.timezone.utc)
+                            data.append({
+                                "id": channel["stream_id"],
+                                "user_login": login,
+                                "type": "live",
+                                "title": f"benchmark stream {login}",
+                                "started_at": started_at.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                            })
+            if data is None:
+                self._send_json({"error": "Too Many Requests"}, status=429, headers=rate_headers)
+            else:
+                self._send_json({"data": data}, headers=rate_headers)
+        elif url.path == "/control/set":
+            login = query["user"][0]
+            online = query.get("online", ["1"])[0] == "1"
+            with self.server.lock:
+                channel = state.setdefault(login, {"online": False, "started_at": 0, "stream_id": "0"})
+                if online and not channel["online"]:
+                    channel["started_at"] = time.time()
+                    channel["stream_id"] = str(int(channel["started_at"] * 1000))
+                channel["online"] = online
+            self._send_json({"ok": True})
+        elif url.path == "/control/status":
+            with self.server.lock:
+                channel = state.get(query["user"][0], {"online": False})
+            self._send_json({"online": channel["online"]})
+        elif url.path == "/control/reset":
+            with self.server.lock:
+                self.server.stats.clear()
+                self.server.stats.update({"helix_requests": 0, "token_requests": 0})
+                self.server.request_times.clear()
+            self._send_json({"ok": True})
+        elif url.path == "/control/stats":
+            with self.server.lock:
+                self._send_json(dict(self.server.stats))
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+
+def _serve_mock_twitch(port, ready, rate_limit):
+    server = ThreadingHTTPServer(("127.0.0.1", port), _MockTwitchHandler)
+    server.rate_limit = rate_limit
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.channel_state = {}
+    server.stats = {"helix_requests": 0, "token_requests": 0}
+    server.request_times = []
+    ready.set()
+    server.serve_forever()
+
+
+class MockTwitch:
+    """Mock token endpoint and Helix API in a child process, so it does not skew CPU numbers"""
+
+    def __init__(self, rate_limit=800):
+        self.rate_limit = rate_limit  # Helix points per minute
+        self.port = free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self._process = None
+
+    def __enter__(self):
+        ready = multiprocessing.Event()
+        self._process = multiprocessing.Process(target=_serve_mock_twitch, args=(self.port, ready, self.rate_limit), daemon=True)
+        self._process.start()
+        ready.wait(10)
+        return self
+
+    def __exit__(self, *exc):
+        self._process.terminate()
+        self._process.join(5)
+
+    def _get(self, path, **params):
+        url = f"{self.base_url}{path}?{urllib.parse.urlencode(params)}"
+        with urllib.request.urlopen(url, timeout=10) as response:
+            return json.load(response)
+
+    def set_online(self, user, online=True):
+        self._get("/control/set", user=user, online="1" if online else "0")
+
+    def stats(self):
+        return self._get("/control/stats")
+
+    def reset_stats(self):
+        self._get("/control/reset")
+
+
+def write_config(workdir, mock, usernames, **overrides):
+    """Write config/config.json in workdir pointing the recorder at the mock API"""
+    config = {
+        "usernames": usernames,
+        "client_id": "benchmark",
+        "client_secret": "benchmark",
+        "root_path": os.path.join(workdir, "recording"),
+        "helix_api_url": f"{mock.base_url}/helix",
+        "oauth_token_url": f"{mock.base_url}/oauth2/token",
+        "streamlink_path": FAKE_STREAMLINK,
+        "refresh_interval": 10,
+        "offline_backoff_enabled": False,
+        "disable_ffmpeg": True,
+        "idle_compress_enabled": False,
+        "prune_after_days": 0,
+        "max_concurrent_recordings": len(usernames),
+        "cpu_threshold": 100,
+        "memory_threshold": 100,
+        "check_cpu_threshold": 101,
+    }
+    config.update(overrides)
+    os.makedirs(os.path.join(workdir, "config"), exist_ok=True)
+    with open(os.path.join(workdir, "config", "config.json"), "w") as file:
+        json.dump(config, file, indent=2)
+    return config
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "p50": percentile(values, 0.5),
+        "p95": percentile(values, 0.95),
+        "max": max(values) if values else None,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def save_results(name, results):
+    """Save results as benchmarks/results/<name>-<timestamp>-<revision>.json and return the path"""
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(RESULTS_DIR, f"{name}-{timestamp}-{git_revision()}.json")
+    payload = {
+        "benchmark": name,
+        "revision": git_revision(),
+        "timestamp": timestamp,
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    with open(path, "w") as file:
+        json.dump(payload, file, indent=2)
+    return path
+
+
+def compare_results(previous_path, results, key_fields):
+    """Print numeric differences between matching entries of an older results file"""
+    with open(previous_path, "r") as file:
+        previous = json.load(file)
+    print(f"\nCompared with {os.path.basename(previous_path)} (revision {previous.get('revision')}):")
+
+    def flatten(prefix, value, out):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                flatten(f"{prefix}.{key}" if prefix else key, item, out)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[prefix] = value
+        return out
+
+    old_by_key = {tuple(entry.get(field) for field in key_fields): entry for entry in previous.get("results", [])}
+    for entry in results:
+        key = tuple(entry.get(field) for field in key_fields)
+        old_entry = old_by_key.get(key)
+        if not old_entry:
+            continue
+        print(f"  {dict(zip(key_fields, key))}")
+        old_values = flatten("", old_entry, {})
+        for name, value in flatten("", entry, {}).items():
+            old_value = old_values.get(name)
+            if name in key_fields or old_value in (None, 0):
+                continue
+            change = (value - old_value) / abs(old_value) * 100
+            print(f"    {name:45} {old_value:>12.3f} -> {value:>12.3f} ({change:+.1f}%)")
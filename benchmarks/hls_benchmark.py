@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Benchmark and gap check for the native HLS capture (capture_backend "hls").
+
+Runs HLSCapture against the synthetic server in hls_server.py for every
+combination of concurrent stream count and latency-spike probability, and reports:
+
+- recorder CPU per stream (all captures share the recorder process)
+- segments captured, ad segments skipped, and missing segments, found by reading
+  the sequence markers back out of the captured files and as reported by the capture
+
+    python benchmarks/hls_benchmark.py --streams 1,10 --spike-probabilities 0,0.1
+    python benchmarks/hls_benchmark.py --compare benchmarks/results/hls-...json
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import psutil
+
+import harness
+import hls_server
+
+
+def run_scenario(module, streams, spike_probability, args):
+    settings = dict(
+        segment_duration=args.segment_duration, window=6, spike_probability=spike_probability,
+        spike_seconds=args.spike_seconds, ad_every=args.ad_every, ad_length=3 if args.ad_every else 0,
+    )
+    workdir = tempfile.mkdtemp(prefix="twitch-recorder-hls-bench-")
+    with hls_server.HLSServer(**settings) as server:
+        this_process = psutil.Process()
+        cpu_before = this_process.cpu_times()
+        started = time.time()
+        captures = [
+            module.HLSCapture(
+                f"channel{index}", args.quality, os.path.join(workdir, f"channel{index}.ts"),
+                master_url=server.master_url(), prefetch=args.prefetch
+            )
+            for index in range(streams)
+        ]
+        time.sleep(args.duration)
+        cpu_after = this_process.cpu_times()
+        wall_seconds = time.time() - started
+        for capture in captures:
+            capture.terminate()
+        for capture in captures:
+            capture.wait(30)
+
+    missing = 0
+    out_of_order = 0
+    captured = 0
+    for index, capture in enumerate(captures):
+        path = os.path.join(workdir, f"channel{index}.ts")
+        sequences = hls_server.segment_markers(path) if os.path.exists(path) else []
+        captured += len(sequences)
+        out_of_order += sum(1 for previous, current in zip(sequences, sequences[1:]) if current <= previous)
+        if sequences:
+            expected = [sequence for sequence in range(sequences[0], sequences[-1] + 1)
+                        if not hls_server.StreamSettings(**settings).is_ad(sequence)]
+            missing += len(set(expected) - set(sequences))
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    cpu_seconds = (cpu_after.user + cpu_after.system) - (cpu_before.user + cpu_before.system)
+    return {
+        "streams": streams,
+        "spike_probability": spike_probability,
+        "duration_seconds": round(wall_seconds, 1),
+        "segments_captured": captured,
+        "segments_missing": missing,
+        "gaps_reported": sum(capture.stats["gaps"] + capture.stats["failed_segments"] for capture in captures),
+        "segments_out_of_order": out_of_order,
+        "ads_skipped": sum(capture.stats["ads_skipped"] for capture in captures),
+        "megabytes": round(sum(capture.stats["bytes"] for capture in captures) / (1024 ** 2), 1),
+        "cpu_percent": round(cpu_seconds / wall_seconds * 100, 2),
+        "cpu_percent_per_stream": round(cpu_seconds / wall_seconds * 100 / streams, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", default="1,10,50", help="comma-separated concurrent stream counts")
+    parser.add_argument("--spike-probabilities", default="0,0.1", help="comma-separated latency spike chances")
+    parser.add_argument("--spike-seconds", type=float, default=3.0)
+    parser.add_argument("--segment-duration", type=float, default=2.0)
+    parser.add_argument("--ad-every", type=int, default=15, help="ad break every N segments, 0 for none")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per scenario")
+    parser.add_argument("--quality", default="best")
+    parser.add_argument("--prefetch", type=int, default=4)
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    module = harness.load_recorder_module()
+    results = []
+    for streams in [int(value) for value in args.streams.split(",")]:
+        for spike_probability in [float(value) for value in args.spike_probabilities.split(",")]:
+            result = run_scenario(module, streams, spike_probability, args)
+            print(
+                f"{streams:>4} streams  spikes {spike_probability:>4.2f} | "
+                f"segments {result['segments_captured']} missing {result['segments_missing']}/{result['gaps_reported']} "
+                f"ads skipped {result['ads_skipped']} | "
+                f"cpu {result['cpu_percent']:.2f}% ({result['cpu_percent_per_stream']:.3f}% per stream)"
+            )
+            results.append(result)
+
+    path = harness.save_results("hls", results)
+    print(f"\nResults saved to {path}")
+    if args.compare:
+        harness.compare_results(args.compare, results, ["streams", "spike_probability"])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""Local HLS server with synthetic live streams for exercising the native HLS capture.
+
+Every channel under /hls/<channel>/ is a live stream that started with the server:
+
+- /hls/<channel>/master.m3u8 lists a 720p60 and a 480p30 variant
+- /hls/<channel>/<variant>/playlist.m3u8 is a sliding window of finished segments
+- /hls/<channel>/<variant>/<sequence>.ts is a segment whose first TS packet carries
+  its sequence number, so a capture can be checked for gaps with segment_markers()
+
+Options inject latency spikes into segment responses and Twitch-style stitched ad
+breaks (DATERANGE + "Amazon" titles, surrounded by discontinuities).
+
+    python benchmarks/hls_server.py --port 8080 --spike-probability 0.05
+"""
+import argparse
+import datetime
+import multiprocessing
+import random
+import struct
+import sys
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import harness
+
+TS_PACKET_SIZE = 188
+MARKER_PID = 0x100
+MARKER = b"HLSSEQ"
+NULL_PACKET = bytes([0x47, 0x1F, 0xFF, 0x10]) + bytes([0xFF] * (TS_PACKET_SIZE - 4))
+VARIANTS = {"720p60": 3000000, "480p30": 1200000}
+
+
+def marker_packet(sequence):
+    payload = MARKER + struct.pack(">Q", sequence)
+    header = bytes([0x47, 0x40 | (MARKER_PID >> 8), MARKER_PID & 0xFF, 0x10])
+    return header + payload + bytes([0xFF] * (TS_PACKET_SIZE - 4 - len(payload)))
+
+
+def segment_markers(path):
+    """Sequence numbers of the synthetic segments in a capture, in file order"""
+    sequences = []
+    with open(path, "rb") as file:
+        data = file.read()
+    for offset in range(0, len(data) - TS_PACKET_SIZE + 1, TS_PACKET_SIZE):
+        packet = data[offset:offset + TS_PACKET_SIZE]
+        if ((packet[1] & 0x1F) << 8 | packet[2]) == MARKER_PID and packet[4:4 + len(MARKER)] == MARKER:
+            sequences.append(struct.unpack(">Q", packet[4 + len(MARKER):12 + len(MARKER)])[0])
+    return sequences
+
+
+class StreamSettings:
+    def __init__(self, segment_duration=2.0, window=6, spike_probability=0.0, spike_seconds=0.0,
+                 ad_every=0, ad_length=0):
+        self.segment_duration = segment_duration
+        self.window = window
+        self.spike_probability = spike_probability
+        self.spike_seconds = spike_seconds
+        self.ad_every = ad_every
+        self.ad_length = ad_length
+
+    def is_ad(self, sequence):
+        return bool(self.ad_every) and sequence >= self.ad_every and sequence % self.ad_every < self.ad_length
+
+
+class _HLSHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, body, content_type, status=200):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parts = urllib.parse.urlparse(self.path).path.strip("/").split("/")
+        if len(parts) == 3 and parts[0] == "hls" and parts[2] == "master.m3u8":
+            self._send(self._master().encode(), "application/vnd.apple.mpegurl")
+        elif len(parts) == 4 and parts[0] == "hls" and parts[2] in VARIANTS and parts[3] == "playlist.m3u8":
+            self._send(self._media_playlist().encode(), "application/vnd.apple.mpegurl")
+        elif len(parts) == 4 and parts[0] == "hls" and parts[2] in VARIANTS and parts[3].endswith(".ts"):
+            self._segment(parts[2], int(parts[3][:-3]))
+        else:
+            self._send(b"not found", "text/plain", status=404)
+
+    def _master(self):
+        lines = ["#EXTM3U"]
+        for name, bandwidth in VARIANTS.items():
+            lines.append(f'#EXT-X-MEDIA:TYPE=VIDEO,GROUP-ID="{name}",NAME="{name}",AUTOSELECT=YES,DEFAULT=YES')
+            height = name.split("p")[0]
+            width = int(int(height) * 16 / 9)
+            lines.append(f'#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION={width}x{height},VIDEO="{name}"')
+            lines.append(f"{name}/playlist.m3u8")
+        return "\n".join(lines) + "\n"
+
+    def _media_playlist(self):
+        settings = self.server.settings
+        duration = settings.segment_duration
+        latest = int((time.time() - self.server.started_at) / duration) - 1
+        first = max(0, latest - settings.window + 1)
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", f"#EXT-X-TARGETDURATION:{int(duration + 0.999)}",
+                 f"#EXT-X-MEDIA-SEQUENCE:{first}"]
+        for sequence in range(first, latest + 1):
+            starts_at = self.server.started_at + sequence * duration
+            ad = settings.is_ad(sequence)
+            if sequence > first and ad != settings.is_ad(sequence - 1):
+                lines.append("#EXT-X-DISCONTINUITY")
+            if ad and (sequence == first or not settings.is_ad(sequence - 1)):
+                lines.append(
+                    f'#EXT-X-DATERANGE:ID="stitched-ad-{sequence}",CLASS="twitch-stitched-ad",'
+                    f'START-DATE="{iso(starts_at)}",DURATION={settings.ad_length * duration:.3f}'
+                )
+            lines.append(f"#EXT-X-PROGRAM-DATE-TIME:{iso(starts_at)}")
+            lines.append(f"#EXTINF:{duration:.3f},{'Amazon|ad' if ad else 'live'}")
+            lines.append(f"{sequence}.ts")
+        return "\n".join(lines) + "\n"
+
+    def _segment(self, variant, sequence):
+        settings = self.server.settings
+        if random.random() < settings.spike_probability:
+            time.sleep(settings.spike_seconds)
+        packets = max(1, int(VARIANTS[variant] / 8 * settings.segment_duration) // TS_PACKET_SIZE)
+        self._send(marker_packet(sequence) + NULL_PACKET * (packets - 1), "video/mp2t")
+
+
+def iso(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _serve(port, settings, ready):
+    server = ThreadingHTTPServer(("127.0.0.1", port), _HLSHandler)
+    server.daemon_threads = True
+    server.settings = settings
+    server.started_at = time.time()
+    ready.set()
+    server.serve_forever()
+
+
+class HLSServer:
+    """Synthetic HLS server in a child process, so it does not skew CPU numbers"""
+
+    def __init__(self, port=None, **settings):
+        self.port = port or harness.free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.settings = StreamSettings(**settings)
+        self._process = None
+
+    def master_url(self, channel="{username}"):
+        return f"{self.base_url}/hls/{channel}/master.m3u8"
+
+    def __enter__(self):
+        ready = multiprocessing.Event()
+        self._process = multiprocessing.Process(target=_serve, args=(self.port, self.settings, ready), daemon=True)
+        self._process.start()
+        ready.wait(10)
+        return self
+
+    def __exit__(self, *exc):
+        self._process.terminate()
+        self._process.join(5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--segment-duration", type=float, default=2.0)
+    parser.add_argument("--window", type=int, default=6, help="segments listed in the live playlist")
+    parser.add_argument("--spike-probability", type=float, default=0.0, help="chance a segment response is delayed")
+    parser.add_argument("--spike-seconds", type=float, default=3.0, help="length of a latency spike")
+    parser.add_argument("--ad-every", type=int, default=0, help="start an ad break every N segments")
+    parser.add_argument("--ad-length", type=int, default=3, help="segments per ad break")
+    args = parser.parse_args()
+    settings = StreamSettings(args.segment_duration, args.window, args.spike_probability, args.spike_seconds,
+                              args.ad_every, args.ad_length if args.ad_every else 0)
+    print(f"Serving synthetic HLS on http://127.0.0.1:{args.port}/hls/<channel>/master.m3u8")
+    try:
+        _serve(args.port, settings, multiprocessing.Event())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
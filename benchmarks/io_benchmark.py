@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""Disk I/O benchmark for the recorder's IOPolicy.
+
+Simulates concurrent captures writing at a fixed bitrate, with the policy driven
+the way _monitor_recording drives it (track/update every few seconds, finish at
+the end), once with the policy disabled and once enabled, and reports:
+
+- page-cache pressure: growth of Cached and peak Dirty from /proc/meminfo, and how
+  much of a "hot" file that was cached before the run is still resident afterwards
+- write latency per write() call (p50/p99/max), where dirty-page throttling shows up
+- fragmentation: extents per finished file, from filefrag when it is installed
+
+Run it on the disk you record to; tmpfs hides all of these effects:
+
+    python benchmarks/io_benchmark.py --dir /mnt/usb/bench --writers 4 --duration 60
+    python benchmarks/io_benchmark.py --compare benchmarks/results/io-...json
+"""
+import argparse
+import ctypes
+import ctypes.util
+import mmap
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import harness
+
+
+def meminfo():
+    values = {}
+    with open("/proc/meminfo") as file:
+        for line in file:
+            name, value = line.split(":", 1)
+            values[name] = int(value.split()[0]) * 1024
+    return values
+
+
+def resident_fraction(path):
+    """Fraction of a file's pages in the page cache, via mincore(2)"""
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    size = os.path.getsize(path)
+    pages = (size + mmap.PAGESIZE - 1) // mmap.PAGESIZE
+    vector = (ctypes.c_ubyte * pages)()
+    with open(path, "rb") as file:
+        # A private mapping is writable, which ctypes needs for the address; nothing is written
+        mapping = mmap.mmap(file.fileno(), size, access=mmap.ACCESS_COPY)
+        first_byte = ctypes.c_char.from_buffer(mapping)
+        result = libc.mincore(ctypes.c_void_p(ctypes.addressof(first_byte)), ctypes.c_size_t(size), vector)
+        del first_byte
+        mapping.close()
+    if result != 0:
+        return None
+    return round(sum(byte & 1 for byte in vector) / pages, 3)
+
+
+def extents(path):
+    if not shutil.which("filefrag"):
+        return None
+    output = subprocess.run(["filefrag", path], capture_output=True, text=True).stdout
+    match = re.search(r"(\d+) extents? found", output)
+    return int(match.group(1)) if match else None
+
+
+class Writer(threading.Thread):
+    """Writes like a capture process: fixed-size chunks at a steady bitrate"""
+
+    def __init__(self, path, bitrate, duration, chunk_bytes):
+        super().__init__(daemon=True)
+        self.path = path
+        self.bitrate = bitrate
+        self.duration = duration
+        self.chunk_bytes = chunk_bytes
+        self.latencies = []
+
+    def run(self):
+        chunk = os.urandom(self.chunk_bytes)
+        interval = self.chunk_bytes * 8 / self.bitrate
+        started = time.monotonic()
+        next_write = started
+        with open(self.path, "wb") as file:
+            while time.monotonic() - started < self.duration:
+                write_started = time.perf_counter()
+                file.write(chunk)
+                file.flush()
+                self.latencies.append(time.perf_counter() - write_started)
+                next_write += interval
+                time.sleep(max(0.0, next_write - time.monotonic()))
+
+
+def run_scenario(module, enabled, args, directory):
+    policy = module.IOPolicy({"io_policy_enabled": enabled, "io_expected_bitrate_mbps": args.bitrate / 1e6})
+    hot_file = os.path.join(directory, "hot.bin")
+    with open(hot_file, "wb") as file:
+        file.write(os.urandom(args.hot_mb * 1024 * 1024))
+    with open(hot_file, "rb") as file:
+        while file.read(1024 * 1024):
+            pass  # Pull it into the page cache
+
+    before = meminfo()
+    writers = [
+        Writer(os.path.join(directory, f"capture{index}.ts"), args.bitrate, args.duration, args.chunk_kb * 1024)
+        for index in range(args.writers)
+    ]
+    for writer in writers:
+        writer.start()
+    trackers = {}
+    peak_cached = 0
+    peak_dirty = 0
+    next_update = time.monotonic()
+    while any(writer.is_alive() for writer in writers):
+        info = meminfo()
+        peak_cached = max(peak_cached, info["Cached"] - before["Cached"])
+        peak_dirty = max(peak_dirty, info["Dirty"])
+        if time.monotonic() >= next_update:
+            for writer in writers:
+                if os.path.exists(writer.path):
+                    tracker = trackers.setdefault(writer.path, policy.track(writer.path))
+                    tracker.update(os.path.getsize(writer.path))
+            next_update += args.update_interval
+        time.sleep(0.25)
+    for tracker in trackers.values():
+        tracker.finish()
+    os.sync()
+    after = meminfo()
+
+    latencies = [latency * 1000 for writer in writers for latency in writer.latencies]
+    file_extents = [extents(writer.path) for writer in writers]
+    file_extents = [count for count in file_extents if count is not None]
+    result = {
+        "policy": "enabled" if enabled else "disabled",
+        "writers": args.writers,
+        "megabytes_written": round(sum(os.path.getsize(writer.path) for writer in writers) / (1024 ** 2), 1),
+        "cached_growth_mb_peak": round(peak_cached / (1024 ** 2), 1),
+        "cached_growth_mb_after": round((after["Cached"] - before["Cached"]) / (1024 ** 2), 1),
+        "dirty_mb_peak": round(peak_dirty / (1024 ** 2), 1),
+        "hot_file_resident_fraction": resident_fraction(hot_file),
+        "write_latency_ms": harness.summarize(latencies),
+        "write_latency_ms_p99": harness.percentile(latencies, 0.99),
+        "extents_per_file_mean": round(sum(file_extents) / len(file_extents), 1) if file_extents else None,
+    }
+    for writer in writers:
+        os.remove(writer.path)
+    os.remove(hot_file)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", help="directory on the disk under test (default: a temporary directory here)")
+    parser.add_argument("--writers", type=int, default=4, help="concurrent captures")
+    parser.add_argument("--bitrate", type=int, default=8000000, help="bits per second per capture")
+    parser.add_argument("--chunk-kb", type=int, default=64, help="size of each write")
+    parser.add_argument("--duration", type=float, default=60, help="seconds per scenario")
+    parser.add_argument("--update-interval", type=float, default=5, help="seconds between policy updates")
+    parser.add_argument("--hot-mb", type=int, default=256, help="size of the file whose eviction is measured")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    module = harness.load_recorder_module()
+    directory = args.dir or tempfile.mkdtemp(prefix="twitch-recorder-io-bench-", dir=os.getcwd())
+    os.makedirs(directory, exist_ok=True)
+    results = []
+    try:
+        for enabled in (False, True):
+            result = run_scenario(module, enabled, args, directory)
+            latency = result["write_latency_ms"]
+            print(
+                f"policy {result['policy']:>8} | cache +{result['cached_growth_mb_after']}MB "
+                f"(peak +{result['cached_growth_mb_peak']}MB, dirty peak {result['dirty_mb_peak']}MB) | "
+                f"hot file resident {result['hot_file_resident_fraction']} | "
+                f"write p50/p99/max {latency['p50']:.3f}/{result['write_latency_ms_p99']:.3f}/{latency['max']:.3f}ms | "
+                f"extents/file {result['extents_per_file_mean']}"
+            )
+            results.append(result)
+    finally:
+        if not args.dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    path = harness.save_results("io", results)
+    print(f"\nResults saved to {path}")
+    if args.compare:
+        harness.compare_results(args.compare, results, ["policy", "writers"])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""End-to-end load benchmark for TwitchRecorder.run().
+
+Runs the real recorder against a mock Helix API and a fake streamlink that writes
+synthetic TS data, for every combination of channel count and online ratio, and
+reports:
+
+- check-cycle latency (from TwitchRecorder.check_cycle_durations)
+- time from go-live on the mock API to the first byte on disk
+- CPU and RSS per active recording (fake streamlink children) and of the recorder
+- processing throughput of the remux step, when ffmpeg is installed
+
+Results are written to benchmarks/results/ so revisions can be compared:
+
+    python benchmarks/load_benchmark.py --channels 10,100 --online-ratios 0.1,0.5
+    python benchmarks/load_benchmark.py --compare benchmarks/results/load-...json
+"""
+import argparse
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("TQDM_DISABLE", "1")  # Hundreds of progress bars would swamp the output
+
+import psutil
+
+import harness
+
+
+def make_sample_ts(workdir, bitrate):
+    """Encode a few seconds of test video so the captures can really be remuxed"""
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return None
+    sample = os.path.join(workdir, "sample.ts")
+    result = subprocess.run([
+        ffmpeg, "-v", "error", "-f", "lavfi", "-i", "testsrc=size=1280x720:rate=30",
+        "-f", "lavfi", "-i", "sine=frequency=440", "-t", "10",
+        "-c:v", "libx264", "-preset", "ultrafast", "-b:v", str(bitrate), "-g", "60",
+        "-c:a", "aac", "-f", "mpegts", "-y", sample
+    ], capture_output=True, timeout=120)
+    return sample if result.returncode == 0 else None
+
+
+class RecordingSampler(threading.Thread):
+    """Samples first-byte times of new captures and resource use of capture processes"""
+
+    def __init__(self, recorded_root, go_live_times):
+        super().__init__(daemon=True)
+        self.recorded_root = recorded_root
+        self.go_live_times = go_live_times  # username -> time it went live on the mock API
+        self.first_byte_latency = {}
+        self.capture_cpu = []
+        self.capture_rss = []
+        self.active_counts = []
+        self._processes = {}
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join(10)
+
+    def _scan_first_bytes(self):
+        for username, went_live in list(self.go_live_times.items()):
+            if username in self.first_byte_latency:
+                continue
+            directory = os.path.join(self.recorded_root, username)
+            try:
+                for entry in os.scandir(directory):
+                    if entry.name.endswith(".mp4") and entry.stat().st_size > 0:
+                        self.first_byte_latency[username] = time.time() - went_live
+                        break
+            except OSError:
+                pass
+
+    def _sample_processes(self):
+        active = 0
+        for child in psutil.Process().children(recursive=True):
+            try:
+                if child.pid not in self._processes:
+                    if harness.FAKE_STREAMLINK not in " ".join(child.cmdline()):
+                        continue
+                    child.cpu_percent(None)  # Prime; the first reading is meaningless
+                    self._processes[child.pid] = child
+                    continue
+                active += 1
+                self.capture_cpu.append(child.cpu_percent(None))
+                self.capture_rss.append(child.memory_info().rss / (1024 ** 2))
+            except psutil.Error:
+                self._processes.pop(child.pid, None)
+        self.active_counts.append(active)
+
+    def run(self):
+        next_process_sample = 0
+        while not self._stop_event.wait(0.1):
+            self._scan_first_bytes()
+            if time.time() >= next_process_sample:
+                self._sample_processes()
+                next_process_sample = time.time() + 1
+
+
+def run_scenario(module, mock, channels, online_ratio, duration, bitrate, sample):
+    workdir = tempfile.mkdtemp(prefix="twitch-recorder-bench-")
+    usernames = [f"bench{index:04d}" for index in range(channels)]
+    online_count = int(round(channels * online_ratio))
+    if online_ratio > 0:
+        online_count = max(1, online_count)
+    online_users = usernames[:online_count]
+    config = harness.write_config(workdir, mock, usernames)
+
+    os.environ["FAKE_HELIX_URL"] = mock.base_url
+    os.environ["FAKE_STREAMLINK_BITRATE"] = str(bitrate)
+    if sample:
+        os.environ["FAKE_STREAMLINK_SAMPLE"] = sample
+
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    logging.basicConfig(
+        level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.FileHandler(os.path.join(workdir, "recorder.log"))], force=True
+    )
+
+    this_process = psutil.Process()
+    cpu_before = this_process.cpu_times()
+    started = time.time()
+    recorder = module.TwitchRecorder()
+    init_seconds = time.time() - started
+    runner = threading.Thread(target=recorder.run, daemon=True)
+    runner.start()
+
+    # Stagger go-lives over the first half of the run, after the first full cycle
+    go_live_times = {}
+    sampler = RecordingSampler(os.path.join(config["root_path"], "recorded"), go_live_times)
+    sampler.start()
+    warmup = min(10, duration / 4)
+    window = duration / 2
+    for index, username in enumerate(online_users):
+        go_live_at = started + warmup + window * index / max(1, len(online_users))
+        time.sleep(max(0.0, go_live_at - time.time()))
+        mock.set_online(username)
+        go_live_times[username] = time.time()
+
+    time.sleep(max(0.0, started + duration - time.time()))
+    wall_seconds = time.time() - started
+    cpu_after = this_process.cpu_times()
+    recorder_rss_mb = this_process.memory_info().rss / (1024 ** 2)
+
+    recorder._shutdown_event.set()
+    for username in online_users:
+        mock.set_online(username, False)
+    runner.join(120)
+    sampler.stop()
+    stats = mock.stats()
+    os.chdir(previous_cwd)
+
+    recorder_cpu_seconds = (cpu_after.user + cpu_after.system) - (cpu_before.user + cpu_before.system)
+    active = [count for count in sampler.active_counts if count]
+    result = {
+        "channels": channels,
+        "online_ratio": online_ratio,
+        "duration_seconds": round(wall_seconds, 1),
+        "init_seconds": round(init_seconds, 3),
+        "helix_requests": stats["helix_requests"],
+        "helix_requests_per_second": round(stats["helix_requests"] / wall_seconds, 2),
+        "check_cycle_seconds": harness.summarize(list(recorder.check_cycle_durations)),
+        "go_live_to_first_byte_seconds": harness.summarize(list(sampler.first_byte_latency.values())),
+        "captures_started": len(sampler.first_byte_latency),
+        "captures_expected": len(online_users),
+        "capture_cpu_percent_mean": round(sum(sampler.capture_cpu) / len(sampler.capture_cpu), 2) if sampler.capture_cpu else None,
+        "capture_rss_mb_mean": round(sum(sampler.capture_rss) / len(sampler.capture_rss), 1) if sampler.capture_rss else None,
+        "active_recordings_peak": max(active) if active else 0,
+        "recorder_cpu_percent": round(recorder_cpu_seconds / wall_seconds * 100, 2),
+        "recorder_rss_mb": round(recorder_rss_mb, 1),
+    }
+    result["recorder_cpu_percent_per_recording"] = (
+        round(result["recorder_cpu_percent"] / result["active_recordings_peak"], 3)
+        if result["active_recordings_peak"] else None
+    )
+    return result, recorder, workdir
+
+
+def measure_processing(recorder, workdir):
+    """Remux the captures from a scenario and report throughput"""
+    if not shutil.which("ffmpeg"):
+        return {"skipped": "ffmpeg not installed"}
+    recorder.disable_ffmpeg = False
+    recorder.ffmpeg_path = shutil.which("ffmpeg")
+    recorded_root = os.path.join(recorder.root_path, "recorded")
+    processed_root = os.path.join(recorder.root_path, "processed")
+    files = []
+    for username in os.listdir(recorded_root):
+        for name in os.listdir(os.path.join(recorded_root, username)):
+            if name.endswith(".mp4"):
+                files.append((os.path.join(recorded_root, username, name), os.path.join(processed_root, username, name)))
+
+    total_bytes = 0
+    succeeded = 0
+    started = time.time()
+    for recorded_file, processed_file in files:
+        total_bytes += os.path.getsize(recorded_file)
+        if recorder.ffmpeg_copy_and_fix_errors(recorded_file, processed_file):
+            succeeded += 1
+    elapsed = max(time.time() - started, 1e-6)
+    return {
+        "files": len(files),
+        "succeeded": succeeded,
+        "megabytes": round(total_bytes / (1024 ** 2), 1),
+        "megabytes_per_second": round(total_bytes / (1024 ** 2) / elapsed, 2),
+        "files_per_hour": round(len(files) / elapsed * 3600, 1),
+    }
+
+
+def print_result(result):
+    cycle = result["check_cycle_seconds"]
+    first_byte = result["go_live_to_first_byte_seconds"]
+
+    def fmt(value):
+        return "-" if value is None else f"{value:.2f}"
+
+    print(
+        f"{result['channels']:>5} ch  {result['online_ratio']:>4.2f} online | "
+        f"cycle p50/p95 {fmt(cycle['p50'])}/{fmt(cycle['p95'])}s | "
+        f"first byte p50/p95 {fmt(first_byte['p50'])}/{fmt(first_byte['p95'])}s "
+        f"({result['captures_started']}/{result['captures_expected']}) | "
+        f"capture cpu {fmt(result['capture_cpu_percent_mean'])}% rss {fmt(result['capture_rss_mb_mean'])}MB | "
+        f"recorder cpu {fmt(result['recorder_cpu_percent'])}% rss {fmt(result['recorder_rss_mb'])}MB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--channels", default="10,100,1000", help="comma-separated channel counts")
+    parser.add_argument("--online-ratios", default="0.05,0.2", help="comma-separated fractions of channels that go live")
+    parser.add_argument("--duration", type=float, default=60, help="seconds per scenario")
+    parser.add_argument("--bitrate", type=int, default=6000000, help="fake stream bitrate in bits per second")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    module = harness.load_recorder_module()
+    sample_dir = tempfile.mkdtemp(prefix="twitch-recorder-bench-sample-")
+    sample = make_sample_ts(sample_dir, args.bitrate)
+    if not sample:
+        print("ffmpeg not available: captures use null TS packets and processing throughput is skipped")
+
+    results = []
+    last_run = None
+    with harness.MockTwitch() as mock:
+        for channels in [int(value) for value in args.channels.split(",")]:
+            for online_ratio in [float(value) for value in args.online_ratios.split(",")]:
+                result, recorder, workdir = run_scenario(
+                    module, mock, channels, online_ratio, args.duration, args.bitrate, sample
+                )
+                print_result(result)
+                results.append(result)
+                if last_run:
+                    shutil.rmtree(last_run[1], ignore_errors=True)
+                last_run = (recorder, workdir)
+
+    if last_run and sample:
+        processing = measure_processing(*last_run)
+        print(f"processing: {processing}")
+        results.append({"channels": "processing", "online_ratio": None, "processing": processing})
+    if last_run:
+        shutil.rmtree(last_run[1], ignore_errors=True)
+    shutil.rmtree(sample_dir, ignore_errors=True)
+
+    path = harness.save_results("load", results)
+    print(f"\nResults saved to {path}")
+    if args.compare:
+        harness.compare_results(args.compare, results, ["channels", "online_ratio"])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
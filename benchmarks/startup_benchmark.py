@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Startup benchmark: time from launching twitch-recorder.py to its first Helix request.
+
+Launches the real script as a subprocess against the mock API and fake streamlink,
+with fast start on and off and with a cold or warm token cache, and reports the
+median time until the first status check reaches the mock API.
+
+    python benchmarks/startup_benchmark.py --runs 5 --channels 50
+"""
+import argparse
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import harness
+
+SCRIPT = os.path.join(harness.REPO_DIR, "twitch-recorder.py")
+
+
+def time_to_first_check(mock, workdir, timeout=60):
+    mock.reset_stats()
+    started = time.time()
+    process = subprocess.Popen(
+        [sys.executable, SCRIPT], cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.time() - started < timeout:
+            first_request = mock.stats().get("first_helix_request_at")
+            if first_request:
+                return first_request - started, mock.stats()["token_requests"]
+            if process.poll() is not None:
+                raise RuntimeError(f"twitch-recorder.py exited with code {process.returncode}")
+            time.sleep(0.01)
+        raise RuntimeError(f"no Helix request within {timeout}s")
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="launches per variant")
+    parser.add_argument("--channels", type=int, default=20)
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    usernames = [f"bench{index:04d}" for index in range(args.channels)]
+    results = []
+    with harness.MockTwitch() as mock:
+        for fast_start in (False, True):
+            for warm_token in (False, True):
+                workdir = tempfile.mkdtemp(prefix="twitch-recorder-startup-")
+                config = harness.write_config(workdir, mock, usernames, fast_start=fast_start)
+                token_cache = os.path.join(config["root_path"], ".token-cache")
+                timings = []
+                token_requests = 0
+                for _ in range(args.runs):
+                    if not warm_token:
+                        # Every cold start fetches a token, not just the first
+                        if os.path.exists(token_cache):
+                            os.remove(token_cache)
+                    elif not os.path.exists(token_cache):
+                        time_to_first_check(mock, workdir)  # Populate the cache
+                    seconds, tokens = time_to_first_check(mock, workdir)
+                    timings.append(seconds)
+                    token_requests += tokens
+                shutil.rmtree(workdir, ignore_errors=True)
+                result = {
+                    "fast_start": fast_start,
+                    "warm_token": warm_token,
+                    "time_to_first_check_seconds": harness.summarize(timings),
+                    "token_requests_per_start": token_requests / args.runs,
+                }
+                summary = result["time_to_first_check_seconds"]
+                print(
+                    f"fast_start={str(fast_start):5}  warm_token={str(warm_token):5}  "
+                    f"first check p50 {summary['p50']:.3f}s  max {summary['max']:.3f}s  "
+                    f"token requests/start {result['token_requests_per_start']:.1f}"
+                )
+                results.append(result)
+
+    path = harness.save_results("startup", results)
+    print(f"\nResults saved to {path}")
+    if args.compare:
+        harness.compare_results(args.compare, results, ["fast_start", "warm_token"])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -26,7 +26,7 @@ BEFORE=$(find "$LOGS_DIR" -name "*.log" -type f | wc -l)
 SIZE_BEFORE=$(du -sh "$LOGS_DIR" 2>/dev/null | cut -f1)
 
 # Remove old logs
-DELETED=$(find "$LOGS_DIR" -name "twitch-recorder-*.log" -type f -mtime +${DAYS} -delete -print | wc -l)
+DELETED=$(find "$LOGS_DIR" \( -name "twitch-recorder-*.log" -o -name "twitch-recorder.log.*" \) -type f -mtime +${DAYS} -delete -print | wc -l)
 
 # Count files after
 AFTER=$(find "$LOGS_DIR" -name "*.log" -type f | wc -l)
@@ -21,7 +21,7 @@ export TWITCH_RECORDER_CONFIG="${TWITCH_RECORDER_CONFIG:-$TWITCH_RECORDER_BASE/c
 [ ! -f "$TWITCH_RECORDER_CONFIG" ] && TWITCH_RECORDER_CONFIG="$TWITCH_RECORDER_BASE/config/config.json"
 
 # Log files
-export TWITCH_RECORDER_MAIN_LOG="$TWITCH_RECORDER_BASE/twitch-recorder.log"
+export TWITCH_RECORDER_MAIN_LOG="$TWITCH_RECORDER_LOGS/twitch-recorder.log"
 export TWITCH_RECORDER_VALIDATION_LOG="$TWITCH_RECORDER_LOGS/validation.log"
 export TWITCH_RECORDER_REPAIR_LOG="$TWITCH_RECORDER_LOGS/repair.log"
 export TWITCH_RECORDER_CLEANUP_LOG="$TWITCH_RECORDER_LOGS/cleanup.log"
@@ -1,23 +1,81 @@
+import array
+import atexit
+import bisect
+import collections
+import cProfile
+import ctypes
+import ctypes.util
 import datetime
 import enum
 import getopt
+import gzip
+import hashlib
+import heapq
+import hmac
+import importlib
 import logging
+import logging.handlers
 import os
+import pstats
+import queue
+import random
+import re
+import selectors
 import subprocess
 import sys
 import shutil
 import time
-import requests
-import psutil
 import json
+import math
+import socket
+import struct
+import sqlite3
 import threading
 import signal
+import tracemalloc
+import urllib.parse
 from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
-from tqdm import tqdm
 from pathlib import Path
-from colorama import init, Fore, Style
 
-init(autoreset=True)
+try:
+    import fcntl
+except ImportError:  # Windows: token cache works without cross-process locking
+    fcntl = None
+
+class _LazyImport:
+    """Stand-in for a module (or module attribute) that is imported on first use.
+
+    Keeps requests, psutil, tqdm and colorama off the startup path; together they
+    take longer to import than the first status check on a Raspberry Pi.
+    """
+
+    def __init__(self, module_name, attribute=None, on_import=None):
+        self._module_name = module_name
+        self._attribute = attribute
+        self._on_import = on_import
+        self._target = None
+
+    def _load(self):
+        if self._target is None:
+            target = importlib.import_module(self._module_name)
+            if self._on_import:
+                self._on_import(target)
+            self._target = getattr(target, self._attribute) if self._attribute else target
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+requests = _LazyImport("requests")
+asyncio = _LazyImport("asyncio")
+ssl = _LazyImport("ssl")
+psutil = _LazyImport("psutil")
+tqdm = _LazyImport("tqdm", "tqdm")
+Fore = _LazyImport("colorama", "Fore", on_import=lambda colorama: colorama.init(autoreset=True))
+curses = _LazyImport("curses")
 
 class TwitchResponseStatus(enum.Enum):
     ONLINE = 0
@@ -25,15 +83,2556 @@ class TwitchResponseStatus(enum.Enum):
     NOT_FOUND = 2
     UNAUTHORIZED = 3
     ERROR = 4
+    RATE_LIMITED = 5
+
+class GoLiveSchedule:
+    """Learned weekly go-live distribution per channel, persisted as JSON.
+
+    Go-live events are bucketed by local time-of-week (15 minute buckets) so a
+    channel that always starts at 19:00 on weekdays builds up mass in those
+    buckets. Older events decay with a half-life so schedule changes are picked up.
+    """
+    BUCKET_SECONDS = 900
+    WEEK_SECONDS = 7 * 24 * 3600
+    BUCKETS = WEEK_SECONDS // BUCKET_SECONDS
+    HALF_LIFE_WEEKS = 8
+    MAX_EVENTS = 500
+    # Share of a channel's go-live rate spread evenly over the week, so unscheduled
+    # streams in otherwise empty buckets are still polled for
+    PRIOR_SHARE = 0.4
+    # Captures starting within this window of a known go-live are the same broadcast
+    DUPLICATE_WINDOW_SECONDS = 2 * 3600
+
+    def __init__(self, state_file):
+        self.state_file = state_file
+        self._lock = threading.Lock()
+        self._channels = {}  # username -> {"first_seen": ts, "events": [ts, ...]}
+        self._intensity_cache = {}
+        self._load()
+
+    def _load(self):
+        try:
+            if os.path.exists(self.state_file):
+                with open(self.state_file, "r") as file:
+                    data = json.load(file)
+                self._channels = data.get("channels", {})
+        except Exception as e:
+            logging.warning(f"Could not load go-live schedule {self.state_file}: {e}")
+            self._channels = {}
+
+    def save(self):
+        with self._lock:
+            data = {"version": 1, "channels": self._channels}
+        try:
+            os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+            temp_file = f"{self.state_file}.tmp"
+            with open(temp_file, "w") as file:
+                json.dump(data, file)
+            os.replace(temp_file, self.state_file)
+        except Exception as e:
+            logging.warning(f"Could not save go-live schedule {self.state_file}: {e}")
+
+    def event_count(self, username):
+        with self._lock:
+            return len(self._channels.get(username, {}).get("events", []))
+
+    def record_go_live(self, username, timestamp, observed_at=None):
+        """Record a go-live event. Returns False if it duplicates a known broadcast."""
+        observed_at = observed_at or time.time()
+        with self._lock:
+            channel = self._channels.setdefault(username, {"first_seen": observed_at, "events": []})
+            channel["first_seen"] = min(channel.get("first_seen", observed_at), timestamp)
+            events = channel["events"]
+            if any(abs(timestamp - event) < self.DUPLICATE_WINDOW_SECONDS for event in events):
+                return False
+            events.append(timestamp)
+            events.sort()
+            del events[:-self.MAX_EVENTS]
+            self._intensity_cache.pop(username, None)
+            return True
+
+    @classmethod
+    def bucket_of(cls, timestamp):
+        local_time = datetime.datetime.fromtimestamp(timestamp)
+        seconds_into_week = (
+            local_time.weekday() * 86400 + local_time.hour * 3600 +
+            local_time.minute * 60 + local_time.second
+        )
+        return int(seconds_into_week // cls.BUCKET_SECONDS) % cls.BUCKETS
+
+    def _intensities(self, username, now):
+        """Go-live rate (events per second) for every time-of-week bucket."""
+        cached = self._intensity_cache.get(username)
+        # Decay weights shift slowly, an hourly rebuild is plenty
+        if cached and now - cached[0] < 3600:
+            return cached[1]
+
+        channel = self._channels.get(username)
+        if not channel or not channel.get("events"):
+            return None
+
+        weights = [0.0] * self.BUCKETS
+        for event in channel["events"]:
+            age_weeks = max(0.0, (now - event) / self.WEEK_SECONDS)
+            weight = 0.5 ** (age_weeks / self.HALF_LIFE_WEEKS)
+            bucket = self.bucket_of(event)
+            # Spread each event over neighbouring buckets to absorb start-time jitter
+            for offset, share in ((-1, 0.25), (0, 0.5), (1, 0.25)):
+                weights[(bucket + offset) % self.BUCKETS] += weight * share
+        prior = sum(weights) * self.PRIOR_SHARE / self.BUCKETS
+        weights = [weight * (1 - self.PRIOR_SHARE) + prior for weight in weights]
+
+        # Effective number of observed weeks under the same decay
+        observed_weeks = max(1.0, (now - channel.get("first_seen", now)) / self.WEEK_SECONDS)
+        effective_weeks = sum(0.5 ** (week / self.HALF_LIFE_WEEKS) for week in range(int(observed_weeks) + 1))
+        intensities = [weight / (effective_weeks * self.BUCKET_SECONDS) for weight in weights]
+
+        self._intensity_cache[username] = (now, intensities)
+        return intensities
+
+    def intensity(self, username, timestamp, now=None):
+        with self._lock:
+            intensities = self._intensities(username, now or timestamp)
+        if intensities is None:
+            return 0.0
+        return intensities[self.bucket_of(timestamp)]
+
+    def mean_sqrt_intensity(self, username, now):
+        with self._lock:
+            intensities = self._intensities(username, now)
+        if not intensities:
+            return 0.0
+        return sum(rate ** 0.5 for rate in intensities) / len(intensities)
+
+    def sqrt_intensities(self, username, now):
+        """Square root of the go-live rate for every time-of-week bucket"""
+        with self._lock:
+            intensities = self._intensities(username, now)
+        return [rate ** 0.5 for rate in intensities] if intensities else []
+
+class LeaseStore:
+    """Coordination backend for cluster mode.
+
+    Leases are rows of (channel, node_id, expires_at) that a node must renew
+    before they expire. A backend only has to make acquire() atomic; everything
+    else is bookkeeping. Custom backends can subclass this and be selected with
+    "cluster_backend": "package.module:ClassName" (constructed with the config dict).
+    """
+
+    def heartbeat(self, node_id, capacity, expires_at):
+        raise NotImplementedError
+
+    def remove_node(self, node_id):
+        raise NotImplementedError
+
+    def live_nodes(self, now):
+        """Return {node_id: capacity} for nodes whose heartbeat has not expired"""
+        raise NotImplementedError
+
+    def acquire(self, channel, node_id, expires_at, now):
+        """Take the lease if it is free, expired or already ours. Returns True on success."""
+        raise NotImplementedError
+
+    def renew(self, channels, node_id, expires_at):
+        """Extend leases still held by node_id. Returns the set of renewed channels."""
+        raise NotImplementedError
+
+    def release(self, channel, node_id):
+        raise NotImplementedError
+
+class MemoryLeaseStore(LeaseStore):
+    """In-process stand-in for a shared store, for single-host runs and testing"""
+
+    def __init__(self, config_data=None):
+        self._lock = threading.Lock()
+        self._nodes = {}
+        self._leases = {}
+
+    def heartbeat(self, node_id, capacity, expires_at):
+        with self._lock:
+            self._nodes[node_id] = (capacity, expires_at)
+
+    def remove_node(self, node_id):
+        with self._lock:
+            self._nodes.pop(node_id, None)
+
+    def live_nodes(self, now):
+        with self._lock:
+            return {node_id: capacity for node_id, (capacity, expires_at) in self._nodes.items() if expires_at > now}
+
+    def acquire(self, channel, node_id, expires_at, now):
+        with self._lock:
+            holder = self._leases.get(channel)
+            if holder and holder[0] != node_id and holder[1] > now:
+                return False
+            self._leases[channel] = (node_id, expires_at)
+            return True
+
+    def renew(self, channels, node_id, expires_at):
+        renewed = set()
+        with self._lock:
+            for channel in channels:
+                holder = self._leases.get(channel)
+                if holder and holder[0] == node_id:
+                    self._leases[channel] = (node_id, expires_at)
+                    renewed.add(channel)
+        return renewed
+
+    def release(self, channel, node_id):
+        with self._lock:
+            holder = self._leases.get(channel)
+            if holder and holder[0] == node_id:
+                del self._leases[channel]
+
+class SQLiteLeaseStore(LeaseStore):
+    """Lease store in a SQLite file on storage shared by all nodes.
+
+    Uses the rollback journal rather than WAL because WAL does not work over
+    network filesystems. Every write is a short BEGIN IMMEDIATE transaction.
+    """
+
+    def __init__(self, config_data):
+        self.path = config_data.get(
+            "cluster_store_path", os.path.join(config_data.get("root_path", "./recordings"), ".cluster.db")
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        with self._lock:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS nodes (node_id TEXT PRIMARY KEY, capacity REAL, expires_at REAL)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS leases (channel TEXT PRIMARY KEY, node_id TEXT, expires_at REAL)"
+            )
+
+    def _transaction(self, statements):
+        """Run (sql, params) pairs in one immediate transaction, returning the last cursor"""
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, params in statements:
+                    cursor.execute(sql, params)
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+            return cursor
+
+    def heartbeat(self, node_id, capacity, expires_at):
+        self._transaction([(
+            "INSERT OR REPLACE INTO nodes (node_id, capacity, expires_at) VALUES (?, ?, ?)",
+            (node_id, capacity, expires_at)
+        )])
+
+    def remove_node(self, node_id):
+        self._transaction([("DELETE FROM nodes WHERE node_id = ?", (node_id,))])
+
+    def live_nodes(self, now):
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT node_id, capacity FROM nodes WHERE expires_at > ?", (now,)
+            ).fetchall()
+        return dict(rows)
+
+    def acquire(self, channel, node_id, expires_at, now):
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                row = cursor.execute(
+                    "SELECT node_id, expires_at FROM leases WHERE channel = ?", (channel,)
+                ).fetchone()
+                if row and row[0] != node_id and row[1] > now:
+                    cursor.execute("COMMIT")
+                    return False
+                cursor.execute(
+                    "INSERT OR REPLACE INTO leases (channel, node_id, expires_at) VALUES (?, ?, ?)",
+                    (channel, node_id, expires_at)
+                )
+                cursor.execute("COMMIT")
+                return True
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+
+    def renew(self, channels, node_id, expires_at):
+        renewed = set()
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                for channel in channels:
+                    cursor.execute(
+                        "UPDATE leases SET expires_at = ? WHERE channel = ? AND node_id = ?",
+                        (expires_at, channel, node_id)
+                    )
+                    if cursor.rowcount:
+                        renewed.add(channel)
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+        return renewed
+
+    def release(self, channel, node_id):
+        self._transaction([("DELETE FROM leases WHERE channel = ? AND node_id = ?", (channel, node_id))])
+
+def create_lease_store(config_data):
+    """Build the lease store named by cluster_backend"""
+    backend = config_data.get("cluster_backend", "sqlite")
+    if backend == "sqlite":
+        return SQLiteLeaseStore(config_data)
+    if backend == "memory":
+        return MemoryLeaseStore(config_data)
+    module_name, _, class_name = backend.partition(":")
+    store_class = getattr(importlib.import_module(module_name), class_name)
+    return store_class(config_data)
+
+class ClusterCoordinator:
+    """Claims channels for this node through expiring leases.
+
+    Channels are spread with weighted rendezvous hashing: every node scores
+    every channel and the highest score wins, so all nodes agree on the
+    assignment without talking to each other and only the channels of a dead
+    or new node move. Weights are each node's advertised free capacity. A node
+    never gives up a channel it is recording, and stops a recording whose lease
+    it fails to renew before expiry, so two nodes never record the same channel.
+    """
+    # A held channel only moves when another node scores this much better
+    HANDOVER_MARGIN = 1.25
+
+    def __init__(self, store, node_id, lease_ttl, capacity_fn, is_recording_fn, on_lease_lost):
+        self.store = store
+        self.node_id = node_id
+        self.lease_ttl = lease_ttl
+        self._capacity_fn = capacity_fn
+        self._is_recording_fn = is_recording_fn
+        self._on_lease_lost = on_lease_lost
+        self._held = {}  # channel -> local expiry time
+        self._held_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.channels = []
+
+    def holds(self, channel):
+        with self._held_lock:
+            return self._held.get(channel, 0) > time.time()
+
+    def held_channels(self):
+        now = time.time()
+        with self._held_lock:
+            return [channel for channel, expires_at in self._held.items() if expires_at > now]
+
+    def start(self, channels):
+        self.channels = list(channels)
+        self.sync()
+        self._thread = threading.Thread(target=self._run, name="cluster-heartbeat", daemon=True)
+        self._thread.start()
+
+    def stop(self, keep=()):
+        """Release leases so surviving nodes pick the channels up immediately.
+
+        Channels in keep are recordings handed off to the next instance on this node,
+        which re-acquires them with adopt(); their leases stay until then or expiry.
+        """
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        with self._held_lock:
+            channels = [channel for channel in self._held if channel not in keep]
+            self._held.clear()
+        try:
+            for channel in channels:
+                self.store.release(channel, self.node_id)
+            if not keep:
+                self.store.remove_node(self.node_id)
+        except Exception as e:
+            logging.warning(f"Cluster: failed to release leases on shutdown: {e}")
+
+    def adopt(self, channel):
+        """Take the lease of a channel whose capture this node re-adopted. False if another node has it."""
+        now = time.time()
+        expires_at = now + self.lease_ttl
+        try:
+            if not self.store.acquire(channel, self.node_id, expires_at, now):
+                return False
+        except Exception as e:
+            logging.warning(f"Cluster: failed to claim {channel}: {e}")
+            return False
+        with self._held_lock:
+            self._held[channel] = expires_at
+        return True
+
+    def _run(self):
+        interval = max(1.0, self.lease_ttl / 3)
+        while not self._stop_event.wait(timeout=interval):
+            self.sync()
+
+    @staticmethod
+    def _score(node_id, capacity, channel):
+        digest = hashlib.sha256(f"{node_id}/{channel}".encode()).digest()
+        unit = (int.from_bytes(digest[:8], "big") + 1) / (2 ** 64 + 1)
+        return max(capacity, 0.01) / -math.log(unit)
+
+    def sync(self):
+        """Heartbeat, renew held leases, and claim or hand over channels"""
+        now = time.time()
+        expires_at = now + self.lease_ttl
+        try:
+            self.store.heartbeat(self.node_id, self._capacity_fn(), expires_at)
+            with self._held_lock:
+                held = list(self._held)
+            renewed = self.store.renew(held, self.node_id, expires_at) if held else set()
+            nodes = self.store.live_nodes(now) or {self.node_id: self._capacity_fn()}
+        except Exception as e:
+            logging.warning(f"Cluster: coordination store unavailable: {e}")
+            self._expire_unrenewed(time.time())
+            return
+
+        with self._held_lock:
+            for channel in held:
+                if channel in renewed:
+                    self._held[channel] = expires_at
+        for channel in set(held) - renewed:
+            self._lose(channel, "lease was taken over")
+
+        claimed = []
+        handed_over = []
+        for channel in self.channels:
+            owner = max(nodes, key=lambda node_id: self._score(node_id, nodes[node_id], channel))
+            holding = channel in renewed
+            if holding:
+                if owner == self.node_id or self._is_recording_fn(channel):
+                    continue
+                my_score = self._score(self.node_id, nodes.get(self.node_id, 0), channel)
+                if self._score(owner, nodes[owner], channel) > my_score * self.HANDOVER_MARGIN:
+                    handed_over.append(channel)
+                    with self._held_lock:
+                        self._held.pop(channel, None)
+                    try:
+                        self.store.release(channel, self.node_id)
+                    except Exception as e:
+                        logging.warning(f"Cluster: failed to release {channel}: {e}")
+            elif owner == self.node_id:
+                try:
+                    if self.store.acquire(channel, self.node_id, expires_at, now):
+                        with self._held_lock:
+                            self._held[channel] = expires_at
+                        claimed.append(channel)
+                except Exception as e:
+                    logging.warning(f"Cluster: failed to claim {channel}: {e}")
+
+        if claimed:
+            logging.info(f"Cluster: claimed {len(claimed)} channel(s): {', '.join(claimed)}")
+        if handed_over:
+            logging.info(f"Cluster: handed over {len(handed_over)} channel(s): {', '.join(handed_over)}")
+
+        # Channels removed from the config are released unless still recording
+        for channel in set(renewed) - set(self.channels):
+            if not self._is_recording_fn(channel):
+                with self._held_lock:
+                    self._held.pop(channel, None)
+                try:
+                    self.store.release(channel, self.node_id)
+                except Exception:
+                    pass
+
+    def _expire_unrenewed(self, now):
+        # Stop before the lease runs out so another node can never overlap with us
+        with self._held_lock:
+            expiring = [channel for channel, expires_at in self._held.items() if expires_at - now < self.lease_ttl / 2]
+        for channel in expiring:
+            self._lose(channel, "lease could not be renewed")
+
+    def _lose(self, channel, reason):
+        with self._held_lock:
+            self._held.pop(channel, None)
+        logging.warning(f"Cluster: lost {channel} ({reason})")
+        self._on_lease_lost(channel)
+
+class _NullPhase:
+    """Shared no-op context manager returned while profiling is off"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_PHASE = _NullPhase()
+
+class _PhaseTimer:
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._profiler.add_phase_timing(self._name, time.perf_counter() - self._started)
+        return False
+
+class RuntimeProfiler:
+    """cProfile, tracemalloc and per-phase timings that can be switched on at runtime.
+
+    While inactive, phase() returns a shared no-op context manager and checks are
+    submitted unwrapped, so the hooks cost a single attribute check.
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.active = False
+        self._lock = threading.Lock()
+        self._main_profile = None
+        self._worker_profiles = []
+        self._phases = collections.defaultdict(list)
+        self._started_at = None
+        self._snapshot = None
+
+    def start(self):
+        """Start a session. Must be called from the main loop thread."""
+        if self.active:
+            return
+        with self._lock:
+            self._worker_profiles = []
+            self._phases = collections.defaultdict(list)
+        self._started_at = datetime.datetime.now()
+        tracemalloc.start(25)
+        self._snapshot = tracemalloc.take_snapshot()
+        self._main_profile = cProfile.Profile()
+        try:
+            self._main_profile.enable()
+        except ValueError as e:
+            logging.warning(f"Profiling: cannot profile main loop: {e}")
+            self._main_profile = None
+        self.active = True
+        logging.info("Profiling started")
+
+    def stop(self):
+        """Stop the session and dump results. Returns the output directory."""
+        if not self.active:
+            return None
+        self.active = False
+        if self._main_profile:
+            self._main_profile.disable()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        output_dir = os.path.join(self.output_dir, self._started_at.strftime("%Y%m%d-%H%M%S"))
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            self._dump(output_dir, snapshot)
+            logging.info(f"Profiling stopped, results written to {output_dir}")
+        except Exception as e:
+            logging.error(f"Failed to write profiling results to {output_dir}: {e}")
+        return output_dir
+
+    def toggle(self):
+        return self.stop() if self.active else self.start()
+
+    def phase(self, name):
+        if not self.active:
+            return _NULL_PHASE
+        return _PhaseTimer(self, name)
+
+    def add_phase_timing(self, name, seconds):
+        with self._lock:
+            self._phases[name].append(seconds)
+
+    def run_profiled(self, function, *args):
+        """Run a worker task under its own cProfile (cProfile is per-thread before Python 3.12)"""
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows a single profiler, which already sees all threads
+            return function(*args)
+        try:
+            return function(*args)
+        finally:
+            profile.disable()
+            with self._lock:
+                # Tasks that outlive the session are dropped rather than mixed into the next one
+                if self.active:
+                    self._worker_profiles.append(profile)
+
+    def _dump(self, output_dir, snapshot):
+        if self._main_profile:
+            self._main_profile.dump_stats(os.path.join(output_dir, "main.prof"))
+            with open(os.path.join(output_dir, "main.txt"), "w") as file:
+                pstats.Stats(self._main_profile, stream=file).sort_stats("cumulative").print_stats(50)
+
+        with self._lock:
+            worker_profiles = list(self._worker_profiles)
+            phases = {name: list(timings) for name, timings in self._phases.items()}
+        if worker_profiles:
+            stats = pstats.Stats(worker_profiles[0])
+            for profile in worker_profiles[1:]:
+                stats.add(profile)
+            stats.dump_stats(os.path.join(output_dir, "workers.prof"))
+            with open(os.path.join(output_dir, "workers.txt"), "w") as file:
+                stats.stream = file
+                stats.sort_stats("cumulative").print_stats(50)
+
+        with open(os.path.join(output_dir, "tracemalloc.txt"), "w") as file:
+            file.write("Top allocation growth during the session:\n")
+            for stat in snapshot.compare_to(self._snapshot, "lineno")[:30]:
+                file.write(f"{stat}\n")
+            file.write("\nTop allocations at the end of the session:\n")
+            for stat in snapshot.statistics("lineno")[:30]:
+                file.write(f"{stat}\n")
+
+        summary = {}
+        for name, timings in phases.items():
+            ordered = sorted(timings)
+            summary[name] = {
+                "count": len(ordered),
+                "total_seconds": sum(ordered),
+                "mean_seconds": sum(ordered) / len(ordered),
+                "p50_seconds": ordered[len(ordered) // 2],
+                "p95_seconds": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                "max_seconds": ordered[-1],
+            }
+        with open(os.path.join(output_dir, "phases.json"), "w") as file:
+            json.dump({
+                "started_at": self._started_at.isoformat(),
+                "stopped_at": datetime.datetime.now().isoformat(),
+                "phases": summary,
+            }, file, indent=2)
+
+class HelixRateLimiter:
+    """Client-side token bucket that mirrors the Helix Ratelimit-* headers.
+
+    Helix grants a bucket of Ratelimit-Limit points that refills continuously over
+    a minute. Requests take one point; when the local estimate runs dry callers
+    wait for the refill instead of bursting into 429s. Waiters are served in
+    priority order (lower first), and the last `reserve_fraction` of the bucket is
+    kept for priority-0 requests, so a burst of unlikely channels cannot starve
+    the ones that are about to go live.
+    """
+
+    WINDOW_SECONDS = 60
+
+    def __init__(self, limit=800, reserve_fraction=0.1):
+        self.limit = limit
+        self.reserve_fraction = reserve_fraction
+        self._condition = threading.Condition()
+        self._tokens = float(limit)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0  # monotonic time before which nothing may be sent
+        self._waiters = []  # heap of (priority, sequence)
+        self._sequence = 0
+        self._in_flight = 0
+        self._server_remaining = None
+        self._server_reset_at = None
+        self._metrics = {
+            "requests": 0,
+            "throttled_429": 0,
+            "retries": 0,
+            "gave_up": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "min_remaining": limit,
+        }
+
+    def _refill(self, now):
+        rate = self.limit / self.WINDOW_SECONDS
+        self._tokens = min(self.limit, self._tokens + (now - self._updated) * rate)
+        self._updated = now
+
+    def acquire(self, priority=1, timeout=None):
+        """Wait for a request slot. Returns False if none came up within timeout."""
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        with self._condition:
+            self._sequence += 1
+            entry = (priority, self._sequence)
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    floor = 0 if priority <= 0 else self.limit * self.reserve_fraction
+                    if self._waiters[0] == entry and now >= self._blocked_until and self._tokens - 1 >= floor:
+                        self._tokens -= 1
+                        self._in_flight += 1
+                        self._metrics["requests"] += 1
+                        waited = now - started
+                        self._metrics["wait_seconds_total"] += waited
+                        self._metrics["wait_seconds_max"] = max(self._metrics["wait_seconds_max"], waited)
+                        return True
+                    if self._waiters[0] != entry:
+                        wait = 1.0  # Woken by notify_all when the head is served
+                    else:
+                        refill_wait = (floor + 1 - self._tokens) * self.WINDOW_SECONDS / self.limit
+                        wait = max(self._blocked_until - now, refill_wait, 0.01)
+                    if deadline is not None:
+                        if now >= deadline:
+                            self._metrics["gave_up"] += 1
+                            return False
+                        wait = min(wait, deadline - now)
+                    self._condition.wait(wait)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+    def record_response(self, response):
+        """Release a slot taken by acquire() and sync with the server's view of the bucket"""
+        with self._condition:
+            self._in_flight = max(0, self._in_flight - 1)
+            headers = getattr(response, "headers", None)
+            if not headers:
+                return
+            try:
+                self.limit = int(headers.get("Ratelimit-Limit", self.limit))
+                remaining = headers.get("Ratelimit-Remaining")
+                reset = headers.get("Ratelimit-Reset")
+                if remaining is not None:
+                    self._server_remaining = int(remaining)
+                    self._metrics["min_remaining"] = min(self._metrics["min_remaining"], self._server_remaining)
+                    # Requests still in flight were counted locally but not yet by the server
+                    self._refill(time.monotonic())
+                    self._tokens = max(0.0, min(self.limit, float(self._server_remaining - self._in_flight)))
+                if reset is not None:
+                    self._server_reset_at = float(reset)
+            except (TypeError, ValueError):
+                pass
+            self._condition.notify_all()
+
+    def backoff(self, attempt):
+        """Record a 429 and block sending until the bucket resets. Returns the delay."""
+        with self._condition:
+            self._metrics["throttled_429"] += 1
+            if attempt > 0:
+                self._metrics["retries"] += 1
+            # Full jitter keeps the executor's threads from retrying in lockstep
+            delay = random.uniform(0.5, 1.0) * min(30.0, 2.0 ** attempt)
+            if self._server_reset_at:
+                delay = max(delay, self._server_reset_at - time.time() + random.uniform(0, 1.0))
+            self._tokens = 0.0
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+            return delay
+
+    def snapshot(self):
+        """Budget usage metrics for logging and the metrics file"""
+        with self._condition:
+            self._refill(time.monotonic())
+            remaining = self._server_remaining
+            snapshot = dict(self._metrics)
+            snapshot.update({
+                "limit": self.limit,
+                "remaining_estimate": int(self._tokens),
+                "server_remaining": remaining,
+                "budget_used_percent": round((1 - (remaining if remaining is not None else self._tokens) / self.limit) * 100, 1),
+                "reset_in_seconds": round(max(0.0, self._server_reset_at - time.time()), 1) if self._server_reset_at else None,
+                "waiting": len(self._waiters),
+                "in_flight": self._in_flight,
+            })
+            snapshot["wait_seconds_total"] = round(snapshot["wait_seconds_total"], 3)
+            snapshot["wait_seconds_max"] = round(snapshot["wait_seconds_max"], 3)
+            return snapshot
+
+class TokenCache:
+    """Encrypted on-disk access token shared by every recorder process on the host.
+
+    The file is encrypted and authenticated with keys derived from the client
+    secret, so only processes configured with the same credentials can read it:
+    an HMAC-SHA256 keystream in counter mode plus an HMAC-SHA256 tag over the
+    whole record (standard library only). A sibling .lock file serialises
+    refreshes so concurrent processes fetch one token between them.
+    """
+    MAGIC = b"TRTC1"
+    SALT_SIZE = 16
+    NONCE_SIZE = 16
+    TAG_SIZE = 32
+
+    def __init__(self, path, client_id, client_secret):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self._client_id = client_id
+        self._secret = client_secret.encode()
+
+    def matches(self, path, client_id, client_secret):
+        """Whether this cache reads the given file with the given credentials"""
+        return (self.path, self._client_id, self._secret) == (path, client_id, client_secret.encode())
+
+    def _keys(self, salt):
+        # HKDF-style extract and expand into separate encryption and MAC keys
+        pseudo_random_key = hmac.new(salt, self._secret, hashlib.sha256).digest()
+        encryption_key = hmac.new(pseudo_random_key, b"twitch-recorder token cache encryption\x01", hashlib.sha256).digest()
+        mac_key = hmac.new(pseudo_random_key, b"twitch-recorder token cache mac\x02", hashlib.sha256).digest()
+        return encryption_key, mac_key
+
+    @staticmethod
+    def _keystream_xor(key, nonce, data):
+        output = bytearray(len(data))
+        for block_index in range(0, len(data), 32):
+            block = hmac.new(key, nonce + (block_index // 32).to_bytes(8, "big"), hashlib.sha256).digest()
+            chunk = data[block_index:block_index + 32]
+            output[block_index:block_index + len(chunk)] = bytes(a ^ b for a, b in zip(chunk, block))
+        return bytes(output)
+
+    def _encrypt(self, plaintext):
+        salt = os.urandom(self.SALT_SIZE)
+        nonce = os.urandom(self.NONCE_SIZE)
+        encryption_key, mac_key = self._keys(salt)
+        body = self.MAGIC + salt + nonce + self._keystream_xor(encryption_key, nonce, plaintext)
+        return body + hmac.new(mac_key, body, hashlib.sha256).digest()
+
+    def _decrypt(self, blob):
+        header_size = len(self.MAGIC) + self.SALT_SIZE + self.NONCE_SIZE
+        if len(blob) < header_size + self.TAG_SIZE or not blob.startswith(self.MAGIC):
+            return None
+        body, tag = blob[:-self.TAG_SIZE], blob[-self.TAG_SIZE:]
+        salt = body[len(self.MAGIC):len(self.MAGIC) + self.SALT_SIZE]
+        nonce = body[len(self.MAGIC) + self.SALT_SIZE:header_size]
+        encryption_key, mac_key = self._keys(salt)
+        if not hmac.compare_digest(tag, hmac.new(mac_key, body, hashlib.sha256).digest()):
+            return None  # Tampered, or written with different credentials
+        return self._keystream_xor(encryption_key, nonce, body[header_size:])
+
+    def lock(self, exclusive=True):
+        """Context manager holding the cross-process lock (no-op where fcntl is unavailable)"""
+        return _FileLock(self.lock_path, exclusive)
+
+    def read(self):
+        """Return (access_token, expires_at) or None. Call with the lock held."""
+        try:
+            with open(self.path, "rb") as file:
+                plaintext = self._decrypt(file.read())
+            if plaintext is None:
+                return None
+            record = json.loads(plaintext)
+            if record.get("client_id") != self._client_id:
+                return None
+            return record["access_token"], record["expires_at"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def write(self, access_token, expires_at):
+        """Atomically replace the cached token. Call with the exclusive lock held."""
+        plaintext = json.dumps({
+            "client_id": self._client_id,
+            "access_token": access_token,
+            "expires_at": expires_at,
+        }).encode()
+        temp_file = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as file:
+            file.write(self._encrypt(plaintext))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_file, self.path)
+
+    def invalidate(self, access_token):
+        """Drop the cached token if it is the one that was just rejected"""
+        cached = self.read()
+        if cached and cached[0] == access_token:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+class _FileLock:
+    def __init__(self, path, exclusive):
+        self.path = path
+        self.exclusive = exclusive
+        self._fd = None
+
+    def __enter__(self):
+        if fcntl is None:
+            return self
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH)
+        return self
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        return False
+
+def estimated_bitrate_mbps(quality):
+    """Typical Twitch bitrate of a quality such as "720p60", for qualities nothing was measured at"""
+    wanted = quality.split(",")[0].strip()
+    if wanted in ("best", "source"):
+        wanted = "1080p60"
+    elif wanted == "worst":
+        wanted = "160p"
+    elif wanted == "audio_only":
+        return 0.16
+    match = re.match(r"(\d+)p(\d+)?", wanted)
+    if not match:
+        return estimated_bitrate_mbps("best")
+    height, fps = int(match.group(1)), int(match.group(2) or 30)
+    return 4.5 * (height / 1080) ** 1.6 * (1.5 if fps > 30 else 1.0)
+
+
+class ResourceAccountant:
+    """Per-child-process resource accounting and the cost model built from it.
+
+    Tracks CPU, RSS, disk I/O and network bytes for every streamlink and ffmpeg
+    child. Network bytes are estimated as bytes read through syscalls minus bytes
+    read from storage, which for a capture process is almost all socket traffic.
+    Averaged costs are kept per channel and quality, per quality and per kind
+    of job, and persisted so predictions survive restarts.
+    """
+
+    ALPHA = 0.2  # Weight of a new sample in the moving averages
+    # Prior for a capture nothing is known about: one streamlink process at source quality
+    DEFAULT_COST = {"cpu_percent": 15.0, "rss_mb": 60.0, "disk_write_mbps": 1.0, "net_mbps": 8.0}
+
+    def __init__(self, model_file):
+        self.model_file = model_file
+        self._lock = threading.Lock()
+        self._children = {}
+        self._model = {"channel": {}, "quality": {}, "kind": {}}
+        self._dirty = False
+        try:
+            with open(model_file, "r") as file:
+                self._model.update(json.load(file))
+        except (OSError, ValueError):
+            pass
+
+    def track(self, pid, kind, username, quality=None):
+        try:
+            process = psutil.Process(pid)
+            process.cpu_percent(None)  # Prime; the first reading is meaningless
+        except psutil.Error:
+            return
+        with self._lock:
+            self._children[pid] = {
+                "process": process, "kind": kind, "username": username, "quality": quality,
+                "samples": 0, "io": None, "io_at": None, "latest": {},
+            }
+
+    def untrack(self, pid):
+        with self._lock:
+            self._children.pop(pid, None)
+
+    def sample(self):
+        """Take one sample of every tracked child and fold it into the cost model"""
+        with self._lock:
+            children = list(self._children.items())
+        for pid, child in children:
+            process = child["process"]
+            try:
+                with process.oneshot():
+                    cpu_percent = process.cpu_percent(None)
+                    rss = process.memory_info().rss
+                    io = process.io_counters() if hasattr(process, "io_counters") else None
+            except psutil.NoSuchProcess:
+                self.untrack(pid)
+                continue
+            except psutil.Error:
+                continue
+
+            now = time.monotonic()
+            latest = {"cpu_percent": cpu_percent, "rss_mb": rss / (1024 ** 2)}
+            if io is not None and child["io"] is not None:
+                elapsed = max(now - child["io_at"], 1e-3)
+                previous = child["io"]
+                latest["disk_write_mbps"] = (io.write_bytes - previous.write_bytes) * 8 / elapsed / 1e6
+                if hasattr(io, "read_chars"):
+                    socket_bytes = (io.read_chars - io.read_bytes) - (previous.read_chars - previous.read_bytes)
+                    latest["net_mbps"] = max(0, socket_bytes) * 8 / elapsed / 1e6
+            child["io"], child["io_at"] = io, now
+            child["latest"] = latest
+            child["samples"] += 1
+            if child["samples"] >= 2:
+                self._learn(child, latest)
+
+    def _learn(self, child, latest):
+        keys = [("kind", child["kind"])]
+        if child["kind"] == "capture":
+            keys += [("quality", child["quality"]), ("channel", f"{child['username']}|{child['quality']}")]
+        with self._lock:
+            for table, key in keys:
+                cost = self._model[table].setdefault(key, dict(latest))
+                for metric, value in latest.items():
+                    cost[metric] = cost.get(metric, value) * (1 - self.ALPHA) + value * self.ALPHA
+            self._dirty = True
+
+    def predict(self, username, quality, kind="capture"):
+        """Expected cost of a new job: the most specific model entry there is"""
+        with self._lock:
+            for table, key in (("channel", f"{username}|{quality}"), ("quality", quality)):
+                cost = self._model[table].get(key)
+                if cost:
+                    return dict(self.DEFAULT_COST, **cost)
+            cost = dict(self.DEFAULT_COST, **self._model["kind"].get(kind, {}))
+        if kind == "capture" and quality:
+            # Nothing measured at this quality yet: scale by its typical bitrate relative to source
+            scale = estimated_bitrate_mbps(quality) / estimated_bitrate_mbps("best")
+            for metric in ("cpu_percent", "disk_write_mbps", "net_mbps"):
+                cost[metric] *= scale
+        return cost
+
+    def pending_cost(self):
+        """Predicted cost of captures too new to show up in system-wide usage yet"""
+        with self._lock:
+            pending = [child for child in self._children.values()
+                       if child["kind"] == "capture" and child["samples"] < 2]
+        total = {metric: 0.0 for metric in self.DEFAULT_COST}
+        for child in pending:
+            for metric, value in self.predict(child["username"], child["quality"]).items():
+                total[metric] += value
+        return total
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                str(pid): {"kind": child["kind"], "username": child["username"],
+                           **{metric: round(value, 2) for metric, value in child["latest"].items()}}
+                for pid, child in self._children.items()
+            }
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            model = json.loads(json.dumps(self._model))
+            self._dirty = False
+        temp_file = f"{self.model_file}.tmp"
+        try:
+            with open(temp_file, "w") as file:
+                json.dump(model, file, indent=2)
+            os.replace(temp_file, self.model_file)
+        except OSError as e:
+            logging.warning(f"Could not save cost model to {self.model_file}: {e}")
+
+
+class _RecordingIO:
+    """Preallocation and page-cache release for one file that is still growing"""
+
+    def __init__(self, policy, filename):
+        self._policy = policy
+        self._filename = filename
+        self._allocated_to = 0
+        self._released_to = 0
+
+    def update(self, size):
+        policy = self._policy
+        ahead = policy.preallocate_ahead_bytes
+        if policy.preallocate and ahead and size + ahead // 2 > self._allocated_to:
+            if policy.preallocate_file(self._filename, size, ahead):
+                self._allocated_to = size + ahead
+        # Keep the last chunk cached; the capture may still be writing into it
+        release_to = (size - policy.release_chunk_bytes) // policy.release_chunk_bytes * policy.release_chunk_bytes
+        if policy.drop_cache and release_to > self._released_to:
+            policy.drop_cached_range(self._filename, self._released_to, release_to - self._released_to)
+            self._released_to = release_to
+
+    def finish(self):
+        self._policy.finalize_file(self._filename, trim=self._allocated_to > 0)
+
+
+class IOPolicy:
+    """Disk I/O policy shared by the capture, remux, compress and upload stages.
+
+    - Growing recordings are preallocated ahead of the expected bitrate with
+      fallocate(FALLOC_FL_KEEP_SIZE), so files stay contiguous on USB disks without
+      changing their visible size; the unused tail is trimmed when they finish.
+    - Finished data is flushed and dropped from the page cache with
+      posix_fadvise(DONTNEED), so write-once video does not evict everything else.
+    - Copies use large buffers, and each stage runs at its own I/O priority.
+
+    Every step is best effort: unsupported platforms and filesystems are skipped.
+    """
+
+    FALLOC_FL_KEEP_SIZE = 0x01
+    IONICE_CLASSES = {"realtime": 1, "best-effort": 2, "idle": 3}
+    _libc = None
+
+    def __init__(self, config_data):
+        self.enabled = config_data.get("io_policy_enabled", True)
+        self.preallocate = self.enabled and config_data.get("io_preallocate", True)
+        self.drop_cache = self.enabled and config_data.get("io_drop_cache", True) and hasattr(os, "posix_fadvise")
+        expected_mbps = max(0.5, config_data.get("io_expected_bitrate_mbps", 8))
+        # Ten minutes ahead at the expected bitrate, rounded to whole megabytes
+        self.preallocate_ahead_bytes = int(expected_mbps * 1000 * 1000 / 8 * 600) // (1024 * 1024) * (1024 * 1024)
+        self.release_chunk_bytes = 64 * 1024 * 1024
+        self.write_buffer_bytes = max(64 * 1024, config_data.get("io_write_buffer_bytes", 1024 * 1024))
+        self.priorities = {"capture": "best-effort:0", "remux": "best-effort:7", "compress": "idle", "upload": "idle",
+                           "repair": "idle"}
+        self.priorities.update(config_data.get("io_priorities", {}))
+        self._ionice_path = shutil.which("ionice") if self.enabled else None
+
+    @classmethod
+    def _fallocate(cls):
+        if cls._libc is None:
+            try:
+                cls._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+                cls._libc.fallocate.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64]
+            except (OSError, AttributeError, TypeError):
+                cls._libc = False  # Not glibc/Linux
+        return cls._libc.fallocate if cls._libc else None
+
+    def preallocate_file(self, filename, offset, length):
+        """Reserve blocks past the end of a file without changing its size"""
+        fallocate = self._fallocate()
+        if not fallocate:
+            return False
+        try:
+            fd = os.open(filename, os.O_WRONLY)
+        except OSError:
+            return False
+        try:
+            return fallocate(fd, self.FALLOC_FL_KEEP_SIZE, offset, length) == 0
+        finally:
+            os.close(fd)
+
+    def drop_cached_range(self, filename, offset=0, length=0):
+        """Write back a range and drop it from the page cache (length 0 means to the end)"""
+        if not self.drop_cache:
+            return
+        try:
+            fd = os.open(filename, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fdatasync(fd)  # DONTNEED skips dirty pages
+            os.posix_fadvise(fd, offset, length, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def prefetch_range(self, filename, offset, length):
+        """Ask the kernel to read a byte range ahead, so a reader only waits on that range"""
+        if not self.enabled or not hasattr(os, "posix_fadvise"):
+            return
+        try:
+            fd = os.open(filename, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.posix_fadvise(fd, offset, length, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def finalize_file(self, filename, trim=True):
+        """Release preallocated space past the end and drop the file from the cache"""
+        if not self.enabled:
+            return
+        try:
+            if trim and self.preallocate:
+                os.truncate(filename, os.path.getsize(filename))  # Frees KEEP_SIZE blocks past EOF
+        except OSError:
+            pass
+        self.drop_cached_range(filename)
+
+    def track(self, filename):
+        return _RecordingIO(self, filename)
+
+    def _priority(self, stage):
+        value = str(self.priorities.get(stage, "")).strip()
+        name, _, level = value.partition(":")
+        io_class = self.IONICE_CLASSES.get(name)
+        return (io_class, int(level) if level and io_class != 3 else None) if io_class else None
+
+    def command(self, stage, command):
+        """Prefix a command with ionice for its stage"""
+        priority = self._priority(stage)
+        if not priority or not self._ionice_path:
+            return command
+        io_class, level = priority
+        prefix = [self._ionice_path, "-c", str(io_class)]
+        if level is not None:
+            prefix += ["-n", str(level)]
+        return prefix + command
+
+    def copy_file(self, source, destination):
+        """Copy with large buffers at upload priority, dropping both files from the cache as it goes"""
+        thread_process = None
+        previous_priority = None
+        priority = self._priority("upload")
+        if priority and self.enabled and hasattr(threading, "get_native_id"):
+            try:
+                # I/O priority is per thread on Linux, so this only affects the copying thread
+                thread_process = psutil.Process(threading.get_native_id())
+                previous_priority = thread_process.ionice()
+                thread_process.ionice(priority[0], priority[1])
+            except Exception:
+                thread_process = None
+        try:
+            copied = 0
+            released = 0
+            with open(source, "rb", buffering=0) as reader, open(destination, "wb", buffering=0) as writer:
+                while True:
+                    chunk = reader.read(self.write_buffer_bytes)
+                    if not chunk:
+                        break
+                    # Unbuffered writes may be short; a dropped tail would truncate the archived copy
+                    view = memoryview(chunk)
+                    while view:
+                        view = view[writer.write(view):]
+                    copied += len(chunk)
+                    if self.drop_cache and copied - released >= self.release_chunk_bytes:
+                        os.fdatasync(writer.fileno())
+                        os.posix_fadvise(writer.fileno(), released, copied - released, os.POSIX_FADV_DONTNEED)
+                        os.posix_fadvise(reader.fileno(), released, copied - released, os.POSIX_FADV_DONTNEED)
+                        released = copied
+            shutil.copystat(source, destination)
+            self.drop_cached_range(destination)
+            self.drop_cached_range(source)
+        finally:
+            if thread_process is not None:
+                try:
+                    thread_process.ionice(previous_priority.ioclass, previous_priority.value)
+                except Exception:
+                    pass
+
+
+class HandoffRegistry:
+    """Capture processes that outlive the recorder, kept on disk so the next instance can re-adopt them"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, entries):
+        temp_file = f"{self.path}.tmp"
+        with open(temp_file, "w") as file:
+            json.dump(entries, file, indent=2)
+        os.replace(temp_file, self.path)
+
+    def add(self, username, pid, filename, quality):
+        try:
+            create_time = psutil.Process(pid).create_time()
+        except psutil.Error:
+            return
+        with self._lock:
+            entries = self._load()
+            entries[username] = {
+                "pid": pid, "create_time": create_time, "filename": filename,
+                "quality": quality, "started_at": time.time(),
+            }
+            self._save(entries)
+
+    def remove(self, username):
+        with self._lock:
+            entries = self._load()
+            if entries.pop(username, None) is not None:
+                self._save(entries)
+
+    def entries(self):
+        with self._lock:
+            return self._load()
+
+
+class AdoptedProcess:
+    """Popen-like handle for a capture process started by an earlier recorder instance"""
+
+    def __init__(self, process, args):
+        self._process = process
+        self.pid = process.pid
+        self.args = args
+        self.returncode = None
+
+    @classmethod
+    def adopt(cls, entry):
+        """Return a handle if the registered process is still the capture it was, else None"""
+        try:
+            process = psutil.Process(entry["pid"])
+            # Guard against the pid having been reused by an unrelated process
+            if abs(process.create_time() - entry["create_time"]) > 1:
+                return None
+            if entry["filename"] not in process.cmdline() or process.status() == psutil.STATUS_ZOMBIE:
+                return None
+            return cls(process, process.cmdline())
+        except (psutil.Error, KeyError):
+            return None
+
+    def poll(self):
+        if self.returncode is None:
+            try:
+                if self._process.is_running() and self._process.status() != psutil.STATUS_ZOMBIE:
+                    return None
+            except psutil.NoSuchProcess:
+                pass
+            self.returncode = 0  # The exit status of a process we did not start is not available
+        return self.returncode
+
+    def wait(self, timeout=None):
+        try:
+            self._process.wait(timeout)
+        except psutil.TimeoutExpired:
+            raise subprocess.TimeoutExpired(self.args, timeout)
+        except psutil.NoSuchProcess:
+            pass
+        self.returncode = 0 if self.returncode is None else self.returncode
+        return self.returncode
+
+    def terminate(self):
+        try:
+            self._process.terminate()
+        except psutil.NoSuchProcess:
+            pass
+
+    def kill(self):
+        try:
+            self._process.kill()
+        except psutil.NoSuchProcess:
+            pass
+
+
+_TS_PACKET_SIZE = 188
+_TS_SYNC_BYTE = 0x47
+
+
+def trim_transport_stream(path, max_scan_bytes=64 * 1024 * 1024):
+    """Cut an interrupted MPEG-TS capture back to its last whole packet.
+
+    After a power loss the tail can hold a partial packet or blocks that were
+    allocated but never written (zeros). Returns the number of bytes removed.
+    """
+    size = os.path.getsize(path)
+    end = size - size % _TS_PACKET_SIZE
+    with open(path, "r+b") as file:
+        if file.read(1) != bytes([_TS_SYNC_BYTE]):
+            return 0  # Not a transport stream; leave it alone
+        scan_from = max(0, end - max_scan_bytes)
+        scan_from -= scan_from % _TS_PACKET_SIZE
+        file.seek(scan_from)
+        tail = file.read(end - scan_from)
+        while end > scan_from and tail[end - scan_from - _TS_PACKET_SIZE] != _TS_SYNC_BYTE:
+            end -= _TS_PACKET_SIZE
+        if end < size:
+            file.truncate(end)
+            file.flush()
+            os.fsync(file.fileno())
+    return size - end
+
+
+class JobJournal:
+    """Append-only log of recording, remux, migrate and compress state transitions.
+
+    Each line is one JSON event, synced before the work it announces starts, so
+    after a crash the jobs whose last event is "started" are exactly the ones
+    that were interrupted. Events carry the writer's pid, and a file lock keeps
+    appends and compaction from separate processes (such as --batch-process
+    next to a running recorder) apart.
+    """
+
+    COMPACT_EVERY = 1000
+
+    def __init__(self, path, enabled=True):
+        self.path = path
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._appended = 0
+
+    def record(self, job, event, source, **fields):
+        if not self.enabled:
+            return
+        with self._lock, _FileLock(f"{self.path}.lock", exclusive=True):
+            self._append(job, event, source, fields)
+
+    def claim(self, job, source, **fields):
+        """Record a job as started unless another live process has it running.
+
+        The check and the "started" event happen under one file lock, so the recorder
+        and --batch-process can never both take the same job. Returns False if taken.
+        """
+        if not self.enabled:
+            return True
+        with self._lock, _FileLock(f"{self.path}.lock", exclusive=True):
+            for entry in self._replay().values():
+                if (entry["job"] == job and entry["source"] == source
+                        and entry["event"] in ("started", "committing") and self.writer_alive(entry)):
+                    return False
+            self._append(job, "started", source, fields)
+        return True
+
+    def _append(self, job, event, source, fields):
+        # Callers hold both locks
+        entry = {"time": time.time(), "pid": os.getpid(), "job": job, "event": event, "source": source, **fields}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a") as file:
+            file.write(json.dumps(entry) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        self._appended += 1
+        if self._appended >= self.COMPACT_EVERY:
+            self._compact()
+
+    def _replay(self):
+        """Last event per (job, source), in the order the jobs started"""
+        latest = {}
+        try:
+            with open(self.path, "r") as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                        latest[(entry["job"], entry["source"])] = entry
+                    except (ValueError, KeyError):
+                        continue  # A line torn by the crash
+        except OSError:
+            pass
+        return latest
+
+    def _compact(self):
+        pending = [entry for entry in self._replay().values() if entry["event"] in ("started", "committing")]
+        temp_file = f"{self.path}.tmp"
+        with open(temp_file, "w") as file:
+            for entry in pending:
+                file.write(json.dumps(entry) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_file, self.path)
+        self._appended = 0
+
+    def unfinished(self):
+        """Jobs that were started and never reached finished or failed"""
+        if not self.enabled:
+            return []
+        with self._lock, _FileLock(f"{self.path}.lock", exclusive=True):
+            return [entry for entry in self._replay().values() if entry["event"] in ("started", "committing")]
+
+    def compact(self):
+        if not self.enabled:
+            return
+        with self._lock, _FileLock(f"{self.path}.lock", exclusive=True):
+            self._compact()
+
+    @staticmethod
+    def writer_alive(entry):
+        """Whether the process that wrote an entry is still running (and is not this one)"""
+        if entry.get("pid") in (None, os.getpid()):
+            return False
+        try:
+            # A process created after the entry is an unrelated one that reused the pid
+            return psutil.Process(entry["pid"]).create_time() <= entry["time"]
+        except psutil.Error:
+            return False
+
+
+def resync_transport_stream(source, destination, chunk_bytes=8 * 1024 * 1024):
+    """Copy only the TS packets that sit on a sync byte, skipping garbage between them.
+
+    A packet is kept when it follows a kept packet directly, or when the byte one
+    packet later is also a sync byte (or the file ends there), which is how
+    demuxers regain sync after corruption. Returns the number of bytes dropped.
+    """
+    dropped = 0
+    pending = b""
+    in_sync = False
+    with open(source, "rb") as reader, open(destination, "wb") as writer:
+        while True:
+            chunk = reader.read(chunk_bytes)
+            data = pending + chunk
+            at_end = not chunk
+            position = 0
+            output = bytearray()
+            while position + _TS_PACKET_SIZE <= len(data):
+                next_packet = position + _TS_PACKET_SIZE
+                if data[position] == _TS_SYNC_BYTE and (
+                    in_sync
+                    or (next_packet < len(data) and data[next_packet] == _TS_SYNC_BYTE)
+                    or (at_end and next_packet == len(data))
+                ):
+                    output += data[position:next_packet]
+                    position = next_packet
+                    in_sync = True
+                elif next_packet >= len(data) and not at_end:
+                    break  # Need the next chunk to tell
+                else:
+                    position += 1
+                    dropped += 1
+                    in_sync = False
+            writer.write(output)
+            pending = data[position:]
+            if at_end:
+                dropped += len(pending)
+                return dropped
+
+
+class RepairEngine:
+    """Escalating ffmpeg repairs of broken recordings, run across a worker pool.
+
+    Strategies, tried in order until ffprobe accepts the output:
+    - remux: stream copy into a fresh container
+    - regenerate_timestamps: stream copy with generated PTS, dropping corrupt packets
+    - resync: MPEG-TS only; keep just the packets on a sync byte, then as above
+
+    The original is backed up first with a reflink or hardlink (a full copy only
+    when neither works), and replaced only by a verified result. Results are cached
+    by path, size and mtime, so reruns skip files that have not changed.
+    """
+
+    STRATEGIES = ("remux", "regenerate_timestamps", "resync")
+    FICLONE = 0x40049409
+
+    def __init__(self, backup_dir, cache_file, run_ffmpeg, copy_file, ffmpeg_path="ffmpeg", workers=2):
+        self.backup_dir = backup_dir
+        self.cache_file = cache_file
+        self.ffmpeg_path = ffmpeg_path
+        self.workers = max(1, workers)
+        self._run_ffmpeg = run_ffmpeg
+        self._copy_file = copy_file
+        self._lock = threading.Lock()
+        try:
+            with open(cache_file, "r") as file:
+                self._cache = json.load(file)
+        except (OSError, ValueError):
+            self._cache = {}
+
+    def _save_cache(self):
+        temp_file = f"{self.cache_file}.tmp"
+        with open(temp_file, "w") as file:
+            json.dump(self._cache, file, indent=2)
+        os.replace(temp_file, self.cache_file)
+
+    def _cached(self, path):
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._cache.get(path)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            return entry
+        return None
+
+    def _remember(self, path, status, strategy=None):
+        stat = os.stat(path)
+        entry = {"size": stat.st_size, "mtime": stat.st_mtime, "status": status,
+                 "strategy": strategy, "checked_at": time.time()}
+        with self._lock:
+            self._cache[path] = entry
+            self._save_cache()
+        return dict(entry, cached=False)
+
+    @staticmethod
+    def is_valid(path):
+        """ffprobe finds a video stream and a positive duration"""
+        try:
+            result = subprocess.run([
+                "ffprobe", "-v", "error", "-select_streams", "v:0",
+                "-show_entries", "stream=codec_type:format=duration",
+                "-of", "default=noprint_wrappers=1:nokey=1", path
+            ], capture_output=True, text=True, timeout=60)
+        except (OSError, subprocess.TimeoutExpired):
+            return False
+        values = result.stdout.split()
+        if result.returncode != 0 or "video" not in values:
+            return False
+        try:
+            return float(values[-1]) > 0
+        except ValueError:
+            return False
+
+    def backup(self, path):
+        """Keep the original under backup_dir/<channel>/, sharing blocks with it when possible"""
+        destination_dir = os.path.join(self.backup_dir, Path(path).parent.name)
+        os.makedirs(destination_dir, exist_ok=True)
+        destination = os.path.join(destination_dir, os.path.basename(path))
+        if os.path.exists(destination):
+            os.remove(destination)
+        try:
+            with open(path, "rb") as source, open(destination, "wb") as target:
+                fcntl.ioctl(target.fileno(), self.FICLONE, source.fileno())
+            return destination, "reflink"
+        except (OSError, AttributeError):  # No FICLONE support, or no fcntl at all
+            if os.path.exists(destination):
+                os.remove(destination)
+        try:
+            # The original is only ever replaced, never modified in place, so a hardlink stays intact
+            os.link(path, destination)
+            return destination, "hardlink"
+        except OSError:
+            self._copy_file(path, destination)
+            return destination, "copy"
+
+    def _strategy_command(self, strategy, source, output, output_format):
+        command = [self.ffmpeg_path, "-hide_banner", "-loglevel", "error"]
+        if strategy != "remux":
+            command += ["-fflags", "+genpts+igndts+discardcorrupt"]
+        command += ["-err_detect", "ignore_err", "-i", source, "-map", "0", "-c", "copy", "-ignore_unknown"]
+        if strategy != "remux":
+            command += ["-avoid_negative_ts", "make_zero"]
+        if output_format == "mp4":
+            command += ["-movflags", "+faststart"]
+        return command + ["-f", output_format, "-y", output]
+
+    def repair(self, path, check_first=True, timeout_seconds=5400):
+        """Repair one file in place; returns its cache entry plus whether it came from the cache.
+
+        check_first=False skips the ffprobe check, for files that ffprobe accepts
+        but that still failed to process.
+        """
+        cached = self._cached(path)
+        if cached:
+            return dict(cached, cached=True)
+        if check_first and self.is_valid(path):
+            return self._remember(path, "ok")
+
+        with open(path, "rb") as file:
+            is_transport_stream = file.read(1) == bytes([_TS_SYNC_BYTE])
+        # Recordings stay MPEG-TS so the normal remux still applies to them
+        output_format = "mpegts" if is_transport_stream else "mp4"
+        backup, method = self.backup(path)
+        logging.info(f"Repairing {path} (backup by {method}: {backup})")
+        output = f"{path}.repairing"
+        resynced = f"{path}.resync"
+        try:
+            for strategy in self.STRATEGIES:
+                source = path
+                if strategy == "resync":
+                    if not is_transport_stream:
+                        continue
+                    dropped = resync_transport_stream(path, resynced)
+                    logging.info(f"Resync dropped {dropped} bytes from {path}")
+                    source = resynced
+                try:
+                    result = self._run_ffmpeg(
+                        "repair", path, self._strategy_command(strategy, source, output, output_format), timeout_seconds
+                    )
+                except subprocess.TimeoutExpired:
+                    logging.warning(f"Repair strategy {strategy} timed out for {path}")
+                    continue
+                if result.returncode == 0 and os.path.exists(output) and self.is_valid(output):
+                    os.replace(output, path)
+                    logging.info(f"{Fore.GREEN}Repaired {path} with {strategy}")
+                    return self._remember(path, "repaired", strategy)
+                logging.info(f"Repair strategy {strategy} did not produce a valid file for {path}")
+        finally:
+            for leftover in (output, resynced):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+        logging.error(f"All repair strategies failed for {path}")
+        return self._remember(path, "failed")
+
+    def repair_many(self, paths, check_first=True):
+        """Repair files in parallel; returns {path: result}"""
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="repair") as executor:
+            futures = {executor.submit(self.repair, path, check_first): path for path in paths}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    results[path] = future.result()
+                except Exception as e:
+                    logging.error(f"Repair of {path} failed: {e}")
+                    results[path] = {"status": "error", "cached": False}
+        return results
+
+
+class KeyframeIndex:
+    """Video keyframe times and byte offsets of an MP4, kept in a sidecar next to it.
+
+    Built from the sample tables in the moov box (stss, stts, ctts, stsc, stsz and
+    stco/co64), so no media data is read. The sidecar records the size and mtime
+    of the file it describes, and a stale one is ignored.
+
+    Sidecar layout, little endian: magic, file size (Q), mtime in ns (q), entry
+    count (I), then one (seconds: d, byte offset: Q) pair per keyframe.
+    """
+
+    MAGIC = b"TRKFIDX1"
+    HEADER = struct.Struct("<8sQqI")
+    ENTRY = struct.Struct("<dQ")
+    CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl", b"edts"}
+
+    def __init__(self, entries, file_size=0, mtime_ns=0):
+        self.entries = entries
+        self.times = [seconds for seconds, _ in entries]
+        self.file_size = file_size
+        self.mtime_ns = mtime_ns
+
+    @staticmethod
+    def sidecar(path):
+        return f"{path}.keyframes"
+
+    @classmethod
+    def load(cls, path):
+        """The saved index for path, or None when missing or stale"""
+        try:
+            with open(cls.sidecar(path), "rb") as file:
+                magic, file_size, mtime_ns, count = cls.HEADER.unpack(file.read(cls.HEADER.size))
+                data = file.read(count * cls.ENTRY.size)
+            stat = os.stat(path)
+        except (OSError, struct.error):
+            return None
+        if magic != cls.MAGIC or (file_size, mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+            return None
+        return cls(list(cls.ENTRY.iter_unpack(data)), file_size, mtime_ns)
+
+    def save(self, path):
+        temp_file = f"{self.sidecar(path)}.tmp"
+        with open(temp_file, "wb") as file:
+            file.write(self.HEADER.pack(self.MAGIC, self.file_size, self.mtime_ns, len(self.entries)))
+            for entry in self.entries:
+                file.write(self.ENTRY.pack(*entry))
+        os.replace(temp_file, self.sidecar(path))
+
+    @classmethod
+    def _boxes(cls, file, start, end):
+        """(type, payload offset, payload size) of each box between start and end"""
+        position = start
+        while position + 8 <= end:
+            file.seek(position)
+            size, box_type = struct.unpack(">I4s", file.read(8))
+            header = 8
+            if size == 1:
+                size = struct.unpack(">Q", file.read(8))[0]
+                header = 16
+            elif size == 0:
+                size = end - position
+            if size < header:
+                return
+            yield box_type, position + header, size - header
+            position += size
+
+    @classmethod
+    def _read_tables(cls, file, start, end, tables):
+        for box_type, offset, size in cls._boxes(file, start, end):
+            if box_type in cls.CONTAINERS:
+                cls._read_tables(file, offset, offset + size, tables)
+            elif box_type in (b"hdlr", b"mdhd", b"elst", b"stts", b"ctts", b"stss", b"stsc", b"stsz", b"stco", b"co64"):
+                file.seek(offset)
+                tables[box_type] = file.read(size)
+
+    @staticmethod
+    def _table(data, fields, offset=8):
+        """Rows of a full-box table whose entry count sits just before them"""
+        count = struct.unpack_from(">I", data, offset - 4)[0]
+        row = struct.Struct(">" + fields)
+        return [row.unpack_from(data, offset + index * row.size) for index in range(count)]
+
+    @classmethod
+    def build(cls, path):
+        stat = os.stat(path)
+        with open(path, "rb") as file:
+            moov = next(((offset, size) for box_type, offset, size in cls._boxes(file, 0, stat.st_size)
+                         if box_type == b"moov"), None)
+            if moov is None:
+                raise ValueError(f"No moov box in {path}")
+            video = None
+            for box_type, offset, size in cls._boxes(file, moov[0], moov[0] + moov[1]):
+                if box_type != b"trak":
+                    continue
+                tables = {}
+                cls._read_tables(file, offset, offset + size, tables)
+                if tables.get(b"hdlr", b"")[8:12] == b"vide":
+                    video = tables
+                    break
+        if video is None:
+            raise ValueError(f"No video track in {path}")
+        return cls(cls._keyframes(video), stat.st_size, stat.st_mtime_ns)
+
+    @classmethod
+    def _keyframes(cls, tables):
+        mdhd = tables[b"mdhd"]
+        timescale = struct.unpack_from(">I", mdhd, 20 if mdhd[0] == 1 else 12)[0]
+
+        # Sizes of every sample, in order
+        sample_size, sample_count = struct.unpack_from(">II", tables[b"stsz"], 4)
+        if sample_size:
+            sizes = None
+        else:
+            sizes = array.array("I", tables[b"stsz"][12:12 + 4 * sample_count])
+            if sys.byteorder == "little":
+                sizes.byteswap()
+        if b"co64" in tables:
+            chunk_offsets = [row[0] for row in cls._table(tables[b"co64"], "Q")]
+        else:
+            chunk_offsets = [row[0] for row in cls._table(tables[b"stco"], "I")]
+        # Without stss every sample is a keyframe
+        keyframes = ([row[0] for row in cls._table(tables[b"stss"], "I")] if b"stss" in tables
+                     else list(range(1, sample_count + 1)))
+
+        # First sample number of each chunk, from the run-length stsc table
+        chunk_first_sample = []
+        stsc = cls._table(tables[b"stsc"], "III")
+        sample = 1
+        for index, (first_chunk, samples_per_chunk, _) in enumerate(stsc):
+            last_chunk = stsc[index + 1][0] - 1 if index + 1 < len(stsc) else len(chunk_offsets)
+            for _ in range(first_chunk, last_chunk + 1):
+                chunk_first_sample.append(sample)
+                sample += samples_per_chunk
+
+        # Presentation offset from ctts and the edit list, applied to every keyframe
+        composition = cls._table(tables[b"ctts"], "Ii") if b"ctts" in tables else []
+        media_start = 0
+        if b"elst" in tables:
+            elst = tables[b"elst"]
+            fields = "QqHH" if elst[0] == 1 else "IiHH"
+            for _, media_time, _, _ in cls._table(elst, fields):
+                if media_time >= 0:
+                    media_start = media_time
+                    break
+
+        entries = []
+        run_index = 0
+        run_first_sample = 1
+        run_first_dts = 0
+        runs = cls._table(tables[b"stts"], "II")
+        ctts_index = 0
+        ctts_first_sample = 1
+        for sample in keyframes:
+            while run_index < len(runs) and sample >= run_first_sample + runs[run_index][0]:
+                run_first_dts += runs[run_index][0] * runs[run_index][1]
+                run_first_sample += runs[run_index][0]
+                run_index += 1
+            delta = runs[run_index][1] if run_index < len(runs) else 0
+            dts = run_first_dts + (sample - run_first_sample) * delta
+            while ctts_index < len(composition) and sample >= ctts_first_sample + composition[ctts_index][0]:
+                ctts_first_sample += composition[ctts_index][0]
+                ctts_index += 1
+            pts = dts + (composition[ctts_index][1] if ctts_index < len(composition) else 0)
+
+            chunk = bisect.bisect_right(chunk_first_sample, sample) - 1
+            first = chunk_first_sample[chunk]
+            if sizes is None:
+                before = (sample - first) * sample_size
+            else:
+                before = sum(sizes[first - 1:sample - 1])
+            entries.append((max(0.0, (pts - media_start) / timescale), chunk_offsets[chunk] + before))
+        return entries
+
+    def at_or_before(self, seconds):
+        """The last keyframe at or before seconds (the first one for earlier times)"""
+        return self.entries[max(0, bisect.bisect_right(self.times, seconds) - 1)]
+
+    def at_or_after(self, seconds):
+        """The first keyframe at or after seconds, or None past the last one"""
+        index = bisect.bisect_left(self.times, seconds)
+        return self.entries[index] if index < len(self.entries) else None
+
+
+class StreamlinkCapture:
+    """In-process capture through the streamlink library, shaped like subprocess.Popen.
+
+    Each capture is a thread in the recorder reading the HLS stream from a shared
+    streamlink session, instead of a separate streamlink interpreter of 40-60MB.
+    Mirrors the CLI's `--twitch-disable-ads --retry-streams <delay>`: ads are
+    filtered and stream resolution is retried until the channel has a stream.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+    _session = None
+    _session_lock = threading.Lock()
+
+    def __init__(self, username, quality, output, retry_streams=5, write_buffer_bytes=1024 * 1024):
+        self.args = ["streamlink-library", f"twitch.tv/{username}", quality, "-o", output]
+        self.pid = None  # Runs inside the recorder process
+        self.returncode = None
+        self._url = f"twitch.tv/{username}"
+        self._qualities = [value.strip() for value in quality.split(",") if value.strip()]
+        self._output = output
+        self._retry_streams = retry_streams
+        self._write_buffer_bytes = write_buffer_bytes
+        self._stopping = threading.Event()
+        self._stream_fd = None
+        self._thread = threading.Thread(target=self._run, name=f"capture-{username}", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def session(cls):
+        with cls._session_lock:
+            if cls._session is None:
+                cls._session = importlib.import_module("streamlink").Streamlink()
+                if hasattr(cls._session, "set_plugin_option"):
+                    cls._session.set_plugin_option("twitch", "disable-ads", True)  # streamlink < 6
+            return cls._session
+
+    def _resolve_streams(self):
+        session = self.session()
+        if hasattr(session, "set_plugin_option"):
+            return session.streams(self._url)
+        options = importlib.import_module("streamlink.options").Options({"disable-ads": True})
+        return session.streams(self._url, options=options)
+
+    def _select_stream(self):
+        while not self._stopping.is_set():
+            try:
+                streams = self._resolve_streams()
+            except Exception as e:
+                logging.warning(f"streamlink could not resolve {self._url}: {e}")
+                streams = {}
+            for quality in self._qualities:
+                if quality in streams:
+                    return streams[quality]
+            if self._stopping.wait(self._retry_streams):
+                break
+        return None
+
+    def _run(self):
+        returncode = 1
+        try:
+            stream = self._select_stream()
+            if stream is None:
+                return
+            self._stream_fd = stream.open()
+            with open(self._output, "wb", buffering=self._write_buffer_bytes) as output:
+                while not self._stopping.is_set():
+                    data = self._stream_fd.read(self.CHUNK_SIZE)
+                    if not data:
+                        break
+                    output.write(data)
+            returncode = 0
+        except Exception as e:
+            if not self._stopping.is_set():
+                logging.error(f"streamlink capture of {self._url} failed: {e}")
+        finally:
+            self._close_stream()
+            # A terminated capture reports SIGTERM like a terminated streamlink process
+            self.returncode = -signal.SIGTERM if self._stopping.is_set() else returncode
+
+    def _close_stream(self):
+        stream_fd, self._stream_fd = self._stream_fd, None
+        if stream_fd:
+            try:
+                stream_fd.close()
+            except Exception:
+                pass
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            raise subprocess.TimeoutExpired(self.args, timeout)
+        return self.returncode
+
+    def terminate(self):
+        self._stopping.set()
+        self._close_stream()  # Unblocks a read waiting on the next segment
+
+    kill = terminate
+
+_HLS_ATTRIBUTE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+# Public web player client ID and persisted query the Twitch player uses for playback tokens
+_TWITCH_GQL_URL = "https://gql.twitch.tv/gql"
+_TWITCH_WEB_CLIENT_ID = "kimne78kx3ncx6brgo4mv6wki5h1ko"
+_TWITCH_PLAYBACK_TOKEN_HASH = "0828119ded1c13477966434e15800ff57ddacf13ba1911c129dc2200705b0712"
+_TWITCH_USHER_URL = "https://usher.ttvnw.net/api/channel/hls/{username}.m3u8"
+
+
+def _hls_attributes(text):
+    return {key: value.strip('"') for key, value in _HLS_ATTRIBUTE.findall(text)}
+
+
+def _hls_datetime(value):
+    try:
+        return datetime.datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+def parse_master_playlist(text, base_url):
+    """Variants of an HLS master playlist as dicts with name, bandwidth and url"""
+    media_names = {}
+    variants = []
+    pending = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#EXT-X-MEDIA:"):
+            attributes = _hls_attributes(line[len("#EXT-X-MEDIA:"):])
+            if attributes.get("TYPE") == "VIDEO":
+                media_names[attributes.get("GROUP-ID")] = attributes.get("NAME", "")
+        elif line.startswith("#EXT-X-STREAM-INF:"):
+            pending = _hls_attributes(line[len("#EXT-X-STREAM-INF:"):])
+        elif line and not line.startswith("#") and pending is not None:
+            group = pending.get("VIDEO", "")
+            name = media_names.get(group) or pending.get("RESOLUTION", "").split("x")[-1] + "p"
+            variants.append({
+                "name": name.split(" ")[0],  # "1080p60 (source)" -> "1080p60"
+                "group": group,
+                "bandwidth": int(pending.get("BANDWIDTH", 0) or 0),
+                "audio_only": group == "audio_only" or "RESOLUTION" not in pending,
+                "url": urllib.parse.urljoin(base_url, line),
+            })
+            pending = None
+    return variants
+
+
+def select_hls_variant(variants, quality):
+    """Pick a variant for a streamlink-style quality list such as "720p60,best" """
+    video = [variant for variant in variants if not variant["audio_only"]] or variants
+    for wanted in (value.strip() for value in quality.split(",")):
+        if wanted == "best" and video:
+            return max(video, key=lambda variant: variant["bandwidth"])
+        if wanted == "worst" and video:
+            return min(video, key=lambda variant: variant["bandwidth"])
+        for variant in variants:
+            if wanted in (variant["name"], variant["group"]):
+                return variant
+    return None
+
+
+def parse_media_playlist(text, base_url):
+    """Segments of an HLS media playlist with sequence numbers and ad/discontinuity flags.
+
+    Ads are recognised the way Twitch marks stitched ads: an EXT-X-DATERANGE with
+    CLASS="twitch-stitched-ad" covering the segment's program date time, or an
+    "Amazon" segment title.
+    """
+    playlist = {"media_sequence": 0, "target_duration": 2.0, "ended": False, "segments": []}
+    ad_ranges = []
+    sequence = None
+    duration = 0.0
+    title = ""
+    discontinuity = False
+    program_time = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#EXT-X-MEDIA-SEQUENCE:"):
+            playlist["media_sequence"] = int(line.split(":", 1)[1])
+        elif line.startswith("#EXT-X-TARGETDURATION:"):
+            playlist["target_duration"] = float(line.split(":", 1)[1])
+        elif line.startswith("#EXT-X-ENDLIST"):
+            playlist["ended"] = True
+        elif line.startswith("#EXT-X-DISCONTINUITY") and not line.startswith("#EXT-X-DISCONTINUITY-"):
+            discontinuity = True
+        elif line.startswith("#EXT-X-PROGRAM-DATE-TIME:"):
+            program_time = _hls_datetime(line.split(":", 1)[1])
+        elif line.startswith("#EXT-X-DATERANGE:"):
+            attributes = _hls_attributes(line[len("#EXT-X-DATERANGE:"):])
+            if attributes.get("CLASS") == "twitch-stitched-ad" or attributes.get("ID", "").startswith("stitched-ad"):
+                start = _hls_datetime(attributes.get("START-DATE"))
+                if start is not None:
+                    ad_ranges.append((start, start + float(attributes.get("DURATION", 0) or 0)))
+        elif line.startswith("#EXTINF:"):
+            duration_text, _, title = line[len("#EXTINF:"):].partition(",")
+            duration = float(duration_text or 0)
+        elif line and not line.startswith("#"):
+            if sequence is None:
+                sequence = playlist["media_sequence"]
+            in_ad_range = program_time is not None and any(start <= program_time < end for start, end in ad_ranges)
+            playlist["segments"].append({
+                "sequence": sequence,
+                "url": urllib.parse.urljoin(base_url, line),
+                "duration": duration,
+                "discontinuity": discontinuity,
+                "ad": in_ad_range or "Amazon" in title,
+            })
+            sequence += 1
+            if program_time is not None:
+                program_time += duration
+            discontinuity = False
+            title = ""
+    return playlist
+
+
+class HTTPConnectionPool:
+    """Keep-alive HTTP/1.1 client for asyncio, with a bounded pool per host.
+
+    Segments are small and frequent, so reusing connections saves a TCP and TLS
+    handshake per segment, which is most of the fetch time on a slow uplink.
+    """
+
+    def __init__(self, max_per_host=12, timeout=10):
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self._idle = {}
+        self._slots = {}
+        self._ssl_context = None
+
+    async def request(self, method, url, headers=None, body=None, timeout=None):
+        """Return (status, headers, body) for a request. Headers are lower-cased."""
+        parts = urllib.parse.urlsplit(url)
+        secure = parts.scheme == "https"
+        key = (parts.hostname, parts.port or (443 if secure else 80), secure)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        request_lines = [f"{method} {path} HTTP/1.1", f"Host: {parts.netloc}", "Connection: keep-alive",
+                         "Accept-Encoding: identity"]
+        request_lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        if body is not None:
+            request_lines.append(f"Content-Length: {len(body)}")
+        payload = ("\r\n".join(request_lines) + "\r\n\r\n").encode() + (body or b"")
+
+        slots = self._slots.setdefault(key, asyncio.Semaphore(self.max_per_host))
+        async with slots:
+            idle = self._idle.setdefault(key, [])
+            while True:
+                reused = bool(idle)
+                reader, writer = idle.pop() if reused else await asyncio.wait_for(
+                    self._connect(key), timeout or self.timeout
+                )
+                try:
+                    writer.write(payload)
+                    await writer.drain()
+                    status, response_headers, data, keep_alive = await asyncio.wait_for(
+                        self._read_response(reader, method), timeout or self.timeout
+                    )
+                except (ConnectionError, asyncio.IncompleteReadError, OSError):
+                    writer.close()
+                    if reused:
+                        continue  # The server closed an idle connection; retry on a fresh one
+                    raise
+                except BaseException:
+                    writer.close()
+                    raise
+                if keep_alive:
+                    idle.append((reader, writer))
+                else:
+                    writer.close()
+                return status, response_headers, data
+
+    async def _connect(self, key):
+        host, port, secure = key
+        if secure and self._ssl_context is None:
+            self._ssl_context = ssl.create_default_context()
+        return await asyncio.open_connection(host, port, ssl=self._ssl_context if secure else None)
+
+    @staticmethod
+    async def _read_response(reader, method):
+        status_line = (await reader.readline()).decode("latin-1")
+        if not status_line:
+            raise ConnectionError("connection closed")
+        version, status = status_line.split(" ", 2)[:2]
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        if method == "HEAD" or status in ("204", "304"):
+            data = b""
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    while (await reader.readline()).strip():
+                        pass  # Trailers
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            data = b"".join(chunks)
+        elif "content-length" in headers:
+            data = await reader.readexactly(int(headers["content-length"]))
+        else:
+            data = await reader.read()
+            keep_alive = False
+        return int(status), headers, data, keep_alive
+
+    def close(self):
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+        self._idle.clear()
+
+
+class HLSCapture:
+    """Native asyncio HLS capture, shaped like subprocess.Popen.
+
+    All captures share one event loop thread and keep-alive connection pools; playlists
+    have their own pool so reloads never queue behind slow segments. The playlist is
+    polled every target duration; new segments are fetched up to `prefetch` at a time
+    and written in sequence order through a large buffer, so a slow segment delays the
+    write but not the fetches behind it. Ad segments are skipped, and sequence gaps are
+    counted in `stats`.
+    """
+
+    _loop = None
+    _playlist_pool = None
+    _segment_pool = None
+    _loop_lock = threading.Lock()
+
+    def __init__(self, username, quality, output, master_url=None, prefetch=4,
+                 write_buffer_bytes=1024 * 1024, retry_streams=5, max_connections_per_host=12):
+        self.args = ["hls", f"twitch.tv/{username}", quality, "-o", output]
+        self.pid = None  # Runs inside the recorder process
+        self.returncode = None
+        self.stats = {"segments": 0, "bytes": 0, "ads_skipped": 0, "gaps": 0,
+                      "failed_segments": 0, "discontinuities": 0, "playlist_reloads": 0}
+        self._username = username
+        self._quality = quality
+        self._output = output
+        self._master_url = master_url.format(username=username) if master_url else None
+        self._prefetch = max(1, prefetch)
+        self._write_buffer_bytes = write_buffer_bytes
+        self._retry_streams = retry_streams
+        self._stopping = threading.Event()
+        self._finished = threading.Event()
+        self._task = None
+        self._queue = None
+        self._pending_write = None
+        loop = self._event_loop(max_connections_per_host)
+        asyncio.run_coroutine_threadsafe(self._capture(), loop)
+
+    @classmethod
+    def _event_loop(cls, max_connections_per_host):
+        with cls._loop_lock:
+            if cls._loop is None:
+                cls._loop = asyncio.new_event_loop()
+                cls._playlist_pool = HTTPConnectionPool(max_per_host=max_connections_per_host)
+                cls._segment_pool = HTTPConnectionPool(max_per_host=max_connections_per_host)
+                threading.Thread(target=cls._loop.run_forever, name="hls-capture", daemon=True).start()
+            return cls._loop
+
+    async def _fetch(self, url, timeout=None, method="GET", headers=None, body=None, segment=False):
+        pool = self._segment_pool if segment else self._playlist_pool
+        status, _, data = await pool.request(method, url, headers=headers, body=body, timeout=timeout)
+        if status >= 400:
+            raise OSError(f"HTTP {status} for {url.split('?')[0]}")
+        return data
+
+    async def _twitch_master_url(self):
+        """Resolve the channel's master playlist URL through a playback access token"""
+        query = {
+            "operationName": "PlaybackAccessToken",
+            "extensions": {"persistedQuery": {"version": 1, "sha256Hash": _TWITCH_PLAYBACK_TOKEN_HASH}},
+            "variables": {"isLive": True, "login": self._username, "isVod": False, "vodID": "", "playerType": "embed"},
+        }
+        data = await self._fetch(
+            _TWITCH_GQL_URL, method="POST", body=json.dumps(query).encode(),
+            headers={"Client-ID": _TWITCH_WEB_CLIENT_ID, "Content-Type": "application/json"}
+        )
+        access_token = json.loads(data)["data"]["streamPlaybackAccessToken"]
+        if not access_token:
+            return None
+        parameters = urllib.parse.urlencode({
+            "player": "twitchweb", "type": "any", "allow_source": "true", "allow_audio_only": "true",
+            "p": random.randint(0, 999999), "sig": access_token["signature"], "token": access_token["value"],
+        })
+        return f"{_TWITCH_USHER_URL.format(username=self._username)}?{parameters}"
+
+    async def _media_playlist_url(self):
+        """Find the variant playlist, retrying every retry_streams seconds like --retry-streams"""
+        while not self._stopping.is_set():
+            try:
+                master_url = self._master_url or await self._twitch_master_url()
+                if master_url:
+                    text = (await self._fetch(master_url)).decode("utf-8", "replace")
+                    if "#EXTINF" in text:
+                        return master_url  # Already a media playlist
+                    variant = select_hls_variant(parse_master_playlist(text, master_url), self._quality)
+                    if variant:
+                        return variant["url"]
+                    logging.warning(f"No {self._quality} variant for {self._username}")
+            except Exception as e:
+                logging.debug(f"HLS playlist for {self._username} not available: {e}")
+            await asyncio.sleep(self._retry_streams)
+        return None
+
+    async def _fetch_segment(self, segment, timeout):
+        for attempt in range(3):
+            try:
+                return await self._fetch(segment["url"], timeout=timeout, segment=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.debug(f"Segment {segment['sequence']} for {self._username} failed: {e}")
+                await asyncio.sleep(0.5 * (attempt + 1))
+        return None
+
+    async def _capture(self):
+        self._task = asyncio.current_task()
+        returncode = 1
+        output = None
+        writer_task = None
+        try:
+            media_url = await self._media_playlist_url()
+            if media_url is None:
+                return
+            loop = asyncio.get_running_loop()
+            output = open(self._output, "wb", buffering=self._write_buffer_bytes)
+            self._queue = asyncio.Queue()
+            writer_task = asyncio.ensure_future(self._write_segments(self._queue, output, loop))
+            await self._poll_playlist(media_url, self._queue)
+            await self._queue.put(None)
+            await writer_task
+            returncode = 0
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logging.error(f"HLS capture of {self._username} failed: {e}")
+        finally:
+            if writer_task and not writer_task.done():
+                writer_task.cancel()
+            while self._queue is not None and not self._queue.empty():
+                fetch_task = self._queue.get_nowait()
+                if fetch_task is not None:
+                    fetch_task.cancel()
+            if self._pending_write is not None and not self._pending_write.done():
+                await asyncio.wait([self._pending_write])  # Never close the file under a running write
+            if output:
+                output.close()
+            if self.stats["gaps"] or self.stats["failed_segments"]:
+                logging.warning(f"HLS capture of {self._username} has gaps: {self.stats}")
+            else:
+                logging.info(f"HLS capture of {self._username} finished: {self.stats}")
+            # A terminated capture reports SIGTERM like a terminated streamlink process
+            self.returncode = -signal.SIGTERM if self._stopping.is_set() else returncode
+            self._finished.set()
+
+    async def _poll_playlist(self, media_url, queue):
+        """Queue a fetch task for every new segment until the stream ends"""
+        fetch_slots = asyncio.Semaphore(self._prefetch)
+        last_sequence = None
+        last_new_segment = time.monotonic()
+        failures = 0
+
+        async def fetch(segment, timeout):
+            async with fetch_slots:
+                return await self._fetch_segment(segment, timeout)
+
+        while not self._stopping.is_set():
+            try:
+                playlist = parse_media_playlist((await self._fetch(media_url)).decode("utf-8", "replace"), media_url)
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                if failures >= 10:
+                    logging.info(f"HLS playlist for {self._username} unavailable, stream ended: {e}")
+                    return
+                await asyncio.sleep(min(5, failures))
+                continue
+
+            self.stats["playlist_reloads"] += 1
+            target = playlist["target_duration"]
+            new_segments = [segment for segment in playlist["segments"]
+                            if last_sequence is None or segment["sequence"] > last_sequence]
+            for segment in new_segments:
+                if last_sequence is not None and segment["sequence"] > last_sequence + 1:
+                    missed = segment["sequence"] - last_sequence - 1
+                    self.stats["gaps"] += missed
+                    logging.warning(f"HLS capture of {self._username} missed {missed} segments")
+                last_sequence = segment["sequence"]
+                if segment["discontinuity"]:
+                    self.stats["discontinuities"] += 1
+                if segment["ad"]:
+                    self.stats["ads_skipped"] += 1
+                    continue
+                await queue.put(asyncio.ensure_future(fetch(segment, max(5.0, 2 * target))))
+
+            if playlist["ended"]:
+                return
+            now = time.monotonic()
+            if new_segments:
+                last_new_segment = now
+            elif now - last_new_segment > max(30.0, 3 * target):
+                logging.info(f"HLS playlist for {self._username} stopped updating, stream ended")
+                return
+            # Reload after a full target duration when the playlist moved, half otherwise
+            await asyncio.sleep(target if new_segments else target / 2)
+
+    async def _write_segments(self, queue, output, loop):
+        while True:
+            fetch_task = await queue.get()
+            if fetch_task is None:
+                return
+            data = await fetch_task
+            if data is None:
+                self.stats["failed_segments"] += 1
+                continue
+            # Buffered writes are mostly memory copies; flushes run off the event loop
+            self._pending_write = loop.run_in_executor(None, output.write, data)
+            await self._pending_write
+            self.stats["segments"] += 1
+            self.stats["bytes"] += len(data)
+
+    def poll(self):
+        return self.returncode if self._finished.is_set() else None
+
+    def wait(self, timeout=None):
+        if not self._finished.wait(timeout):
+            raise subprocess.TimeoutExpired(self.args, timeout)
+        return self.returncode
+
+    def terminate(self):
+        self._stopping.set()
+        task = self._task
+        if task is not None:
+            self._loop.call_soon_threadsafe(task.cancel)
+
+    kill = terminate
+
+
+def state_socket_path(config_data):
+    return config_data.get(
+        "state_socket_path", os.path.join(config_data.get("root_path", "./recordings"), ".recorder.sock")
+    )
+
+
+class StateServer:
+    """Pushes the recorder's state to dashboards over a local Unix socket.
+
+    Every connected client gets one JSON line per interval. The snapshot is only
+    built while a client is connected, so with nobody watching the server is a
+    thread blocked in select(). Clients may send a line with a command
+    ("profile" toggles profiling); a client that stops reading is dropped.
+    """
+
+    SEND_TIMEOUT = 0.5
+
+    def __init__(self, path, snapshot, interval=2.0, commands=None):
+        self.path = path
+        self._snapshot = snapshot
+        self.interval = interval
+        self._commands = commands or {}
+        self._selector = None
+        self._listener = None
+        self._clients = {}  # socket -> unparsed command bytes
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Bind the socket and start serving; False if it could not be bound"""
+        if not hasattr(socket, "AF_UNIX"):
+            return False
+        try:
+            if os.path.exists(self.path):
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                    try:
+                        probe.connect(self.path)
+                        logging.warning(f"Another recorder is serving {self.path}, dashboard socket disabled")
+                        return False
+                    except OSError:
+                        os.remove(self.path)  # Left behind by a recorder that did not shut down cleanly
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            listener.bind(self.path)
+            os.chmod(self.path, 0o660)
+            listener.listen(8)
+        except OSError as e:
+            logging.warning(f"Could not open dashboard socket {self.path}: {e}")
+            return False
+        listener.setblocking(False)
+        self._listener = listener
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(listener, selectors.EVENT_READ)
+        threading.Thread(target=self._serve, name="state-server", daemon=True).start()
+        return True
+
+    def stop(self):
+        self._stopped.set()
+        if self._listener:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def _serve(self):
+        next_push = time.monotonic()
+        while not self._stopped.is_set():
+            # Without clients there is nothing to push, so only wake up for a connection
+            timeout = max(0.0, next_push - time.monotonic()) if self._clients else 1.0
+            for key, _ in self._selector.select(timeout):
+                if key.fileobj is self._listener:
+                    self._accept()
+                else:
+                    self._read(key.fileobj)
+            if self._clients and time.monotonic() >= next_push:
+                self._push()
+                next_push = time.monotonic() + self.interval
+            elif not self._clients:
+                next_push = time.monotonic()  # A new client gets its first update right away
+        for client in list(self._clients):
+            self._drop(client)
+        self._selector.close()
+        self._listener.close()
+
+    def _accept(self):
+        try:
+            client, _ = self._listener.accept()
+        except OSError:
+            return
+        client.settimeout(self.SEND_TIMEOUT)
+        self._clients[client] = b""
+        self._selector.register(client, selectors.EVENT_READ)
+
+    def _read(self, client):
+        try:
+            data = client.recv(1024)
+        except OSError:
+            data = b""
+        if not data:
+            self._drop(client)
+            return
+        buffered = self._clients[client] + data
+        *lines, self._clients[client] = buffered.split(b"\n")
+        for line in lines:
+            command = self._commands.get(line.decode(errors="replace").strip())
+            if command:
+                command()
+        if len(self._clients[client]) > 1024:
+            self._drop(client)
+
+    def _push(self):
+        try:
+            message = (json.dumps(self._snapshot(), separators=(",", ":")) + "\n").encode()
+        except Exception as e:
+            logging.debug(f"Could not build dashboard state: {e}")
+            return
+        for client in list(self._clients):
+            try:
+                client.sendall(message)
+            except OSError:
+                self._drop(client)
+
+    def _drop(self, client):
+        self._clients.pop(client, None)
+        try:
+            self._selector.unregister(client)
+        except (KeyError, ValueError):
+            pass
+        client.close()
+
+
+class _ProgressLog:
+    """Stand-in for the tqdm bar when stdout is not a terminal (journald, files, pipes).
+
+    Takes the same total/n/refresh() updates, but only logs a line every
+    interval seconds; with no interval it stays silent.
+    """
+
+    def __init__(self, desc, interval):
+        self.desc = desc
+        self.interval = interval
+        self.total = 0
+        self.n = 0
+        self._logged_at = time.monotonic()
+        self._logged_n = 0
+
+    def refresh(self):
+        now = time.monotonic()
+        if not self.interval or now - self._logged_at < self.interval:
+            return
+        rate = (self.n - self._logged_n) / (now - self._logged_at)
+        logging.info(f"{self.desc}: {self.n / (1024**2):.1f}MB recorded ({rate * 8 / 1e6:.1f} Mbps)")
+        self._logged_at = now
+        self._logged_n = self.n
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
 
 class TwitchRecorder:
-    def __init__(self):
+    # The background refresher renews tokens this long before they expire
+    TOKEN_REFRESH_MARGIN = 900
+
+    def __init__(self, maintenance=False):
+        """maintenance=True is for one-off jobs like --repair: no Twitch API, streamlink or signal handlers"""
         # Load configuration with error handling
         try:
-            # Try config/config.json first, fall back to config.json
-            config_path = "config/config.json" if os.path.exists("config/config.json") else "config.json"
-            with open(config_path, "r") as config_file:
-                config_data = json.load(config_file)
+            config_data = self._read_config()
         except FileNotFoundError:
             logging.error("config.json not found. Please create a configuration file.")
             sys.exit(1)
@@ -44,114 +2643,496 @@ class TwitchRecorder:
             logging.error(f"Error loading config.json: {e}")
             sys.exit(1)
 
+        # Validate required fields
+        config_error = self._validate_config(config_data)
+        if config_error:
+            logging.error(config_error)
+            sys.exit(1)
+
+        # Thread-safe counter and locks
+        self._active_recordings_lock = threading.Lock()
+        self._active_recordings = 0
+        self._recording_processes = {}  # Track active processes
+        self._recording_processes_lock = threading.Lock()  # Separate lock for processes dict
+        self._shutdown_event = threading.Event()
+        self._reload_requested = threading.Event()
+        self._profile_toggle_requested = threading.Event()
+        self._handoff_requested = threading.Event()
+        self._executor = None  # Store executor reference for cleanup
+        self._token_refresh_lock = threading.Lock()  # Lock for token refresh
+        self._offline_backoff_lock = threading.Lock()
+        self._offline_check_counts = {}
+        self._next_user_check_at = {}
+        self._go_live_schedule = None
+        self._schedule_constant_cache = None
+        self._clock = time.time  # Check scheduling reads time through this; the backoff simulator replaces it
+        self._paths = {}
+        self._cli_overrides = {}
+        self._ffmpeg_available = True
+        self._busy_users = set()  # Channels with a check or recording in flight
+        self._live_stream_ids = {}  # Helix stream id per channel last seen online
+        self._last_checked = {}  # Channel -> (status name, time) of its last check
+        self._recording_stats = {}  # Channel -> size and ingest rate of its running capture
+        self._running_jobs = {}  # ffmpeg pid -> kind, file and start time
+        self._queue_counts = (0, {})  # (monotonic time, counts), refreshed at most every 30s
+        self._state_server = None
+        self._started_at = time.time()
+        self._admission_lock = threading.Lock()  # Admission and preemption, one channel at a time
+        self._capture_qualities = {}  # Channel -> quality of its running capture
+        self._quality_changes = {}  # Channel -> quality its capture is being restarted at
+        self._adopted_captures = set()  # Re-adopted captures, which cannot be restarted
+        self._last_quality_change = 0  # Monotonic time a running capture last changed rung
+        self._link_ingress = (None, None, 0.0)  # (bytes received, monotonic time, Mbps) on ingress_interface
+        self._ingress_freed = []  # (monotonic time, Mbps) freed by preemption but still in the link sample
+        self._ingress_freed_lock = threading.Lock()
+        self._busy_users_lock = threading.Lock()
+        self._cluster = None
+        self._token_refresher_running = False
+        self._rate_limiter = HelixRateLimiter()
+        self._accountant = None
+        self._handoff_registry = None
+        self._journal = None
+        self._repair = None
+        self._token_cache = None
+        self.check_cycle_durations = collections.deque(maxlen=1000)  # Seconds per check cycle
+        self._check_done_at = {}  # Channel -> when its latest check answered or handed off to recording
+
+        self._apply_config(config_data)
+        self._profiler = RuntimeProfiler(self.profile_output_dir)
+        self._profile_started_at = 0
+        self.access_token = None
+        self.token_expires_at = 0
+        if maintenance:
+            self._ffmpeg_available = self._check_ffmpeg()
+            return
+
+        # Setup signal handlers for graceful shutdown
+        signal.signal(signal.SIGINT, self._signal_handler)
+        signal.signal(signal.SIGTERM, self._signal_handler)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, self._reload_signal_handler)
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, self._profile_signal_handler)
+        if hasattr(signal, "SIGUSR2"):
+            signal.signal(signal.SIGUSR2, self._handoff_signal_handler)
+
+        self._load_cached_token()
+        if self.fast_start:
+            self._fast_start()
+        else:
+            if not self.access_token:
+                self.fetch_access_token()
+            # Validate dependencies
+            self._validate_dependencies()
+
+    def _fast_start(self):
+        """Fetch the token and check dependencies concurrently instead of back to back"""
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="startup") as pool:
+            token_future = None if self.access_token else pool.submit(self.fetch_access_token)
+            streamlink_future = pool.submit(self._check_streamlink)
+            ffmpeg_future = None if self.disable_ffmpeg else pool.submit(self._check_ffmpeg)
+
+            if not streamlink_future.result():
+                sys.exit(1)
+            if ffmpeg_future:
+                self._ffmpeg_available = ffmpeg_future.result()
+                self.disable_ffmpeg = not self._ffmpeg_available
+            if token_future:
+                token_future.result()  # Re-raise fetch errors like the serial path does
+
+    def _load_cached_token(self):
+        """Reuse an access token from the shared cache if it is still valid"""
+        if not self._token_cache:
+            return
+        with self._token_cache.lock(exclusive=False):
+            cached = self._token_cache.read()
+        if cached and time.time() < cached[1] - 300:
+            self.access_token, self.token_expires_at = cached
+            logging.info(f"Reusing cached access token, expires in {int(self.token_expires_at - time.time())} seconds")
+
+    def _read_config(self):
+        """Read config/config.json, falling back to config.json"""
+        self.config_path = config_file_path()
+        # Taken before parsing, so a file saved with a syntax error is only tried once
+        self._config_mtime = os.path.getmtime(self.config_path)
+        with open(self.config_path, "r") as config_file:
+            return json.load(config_file)
+
+    @staticmethod
+    def _validate_config(config_data):
+        """Return an error message if the config cannot be used, otherwise None"""
+        if not config_data.get("usernames"):
+            return "No usernames specified in config.json"
+        if not config_data.get("client_id") or not config_data.get("client_secret"):
+            return "Missing client_id or client_secret in config.json"
+        return None
+
+    def _apply_config(self, config_data):
+        """Set configuration attributes. Safe to call again on a running recorder."""
+        self._config_data = config_data
+
         # Global configuration with validation
         self.ffmpeg_path = config_data.get("ffmpeg_path", "ffmpeg")
-        self.disable_ffmpeg = config_data.get("disable_ffmpeg", False)
+        self.streamlink_path = config_data.get("streamlink_path", "streamlink")
+        self.capture_backend = config_data.get("capture_backend", "subprocess")
+        self.hls_master_url = config_data.get("hls_master_url")
+        self.hls_prefetch_segments = max(1, config_data.get("hls_prefetch_segments", 4))
+        self.io_policy = IOPolicy(config_data)
+        self.hls_write_buffer_bytes = max(
+            64 * 1024, config_data.get("hls_write_buffer_bytes", self.io_policy.write_buffer_bytes)
+        )
+        self.hls_max_connections_per_host = max(1, config_data.get("hls_max_connections_per_host", 12))
+        if self.capture_backend not in ("subprocess", "library", "hls"):
+            logging.warning(f"Unknown capture_backend {self.capture_backend}, using subprocess")
+            self.capture_backend = "subprocess"
+        self.disable_ffmpeg = config_data.get("disable_ffmpeg", False) or not self._ffmpeg_available
         self.refresh = max(10, config_data.get("refresh_interval", 60))  # Minimum 10 seconds
         self.idle_compress_enabled = config_data.get("idle_compress_enabled", True)
         self.idle_compress_crf = config_data.get("idle_compress_crf", 28)
         self.idle_compress_preset = config_data.get("idle_compress_preset", "medium")
         self.idle_compress_audio_bitrate = config_data.get("idle_compress_audio_bitrate", "128k")
         self.root_path = config_data.get("root_path", "./recordings")
+        # Live captures and remuxes go to the scratch tier, finished files to the archive tier
+        self.scratch_path = config_data.get("scratch_path", self.root_path)
+        self.archive_path = config_data.get("archive_path", self.root_path)
+        self.scratch_min_free_gb = max(0, config_data.get("scratch_min_free_gb", 1))
+        self.archive_min_free_gb = max(0, config_data.get("archive_min_free_gb", 1))
         self.max_concurrent_recordings = max(1, config_data.get("max_concurrent_recordings", 2))
+        self.handoff_enabled = config_data.get("handoff_enabled", False)
+        self.handoff_registry_file = config_data.get(
+            "handoff_registry_file", os.path.join(self.root_path, ".recordings.json")
+        )
+        # Running captures and jobs hold on to these, so a reload only replaces them when the path changes
+        if not self._handoff_registry or self._handoff_registry.path != self.handoff_registry_file:
+            self._handoff_registry = HandoffRegistry(self.handoff_registry_file)
+        self.journal_enabled = config_data.get("journal_enabled", True)
+        self.journal_file = config_data.get("journal_file", os.path.join(self.root_path, ".journal.jsonl"))
+        if not self._journal or self._journal.path != self.journal_file:
+            self._journal = JobJournal(self.journal_file, self.journal_enabled)
+        self._journal.enabled = self.journal_enabled
+        self.cost_admission_enabled = config_data.get("cost_admission_enabled", True)
+        self.resource_sample_interval = max(1, config_data.get("resource_sample_interval_seconds", 5))
+        self.cost_model_file = config_data.get("cost_model_file", os.path.join(self.root_path, ".cost-model.json"))
+        if not self._accountant or self._accountant.model_file != self.cost_model_file:
+            self._accountant = ResourceAccountant(self.cost_model_file)
         self.cpu_threshold = config_data.get("cpu_threshold", 80)
         self.memory_threshold = config_data.get("memory_threshold", 80)
         self.check_cpu_threshold = config_data.get("check_cpu_threshold", 50)
+        self.config_watch_enabled = config_data.get("config_watch_enabled", False)
+        self.fast_start = config_data.get("fast_start", True)
+        self.profile_output_dir = config_data.get("profile_output_dir", os.path.join("logs", "profiles"))
+        self.profile_duration_seconds = max(0, config_data.get("profile_duration_seconds", 0))
+        if getattr(self, "_profiler", None):
+            self._profiler.output_dir = self.profile_output_dir
         self.offline_backoff_enabled = config_data.get("offline_backoff_enabled", True)
         self.offline_backoff_base_seconds = max(30, config_data.get("offline_backoff_base_seconds", self.refresh))
         self.offline_backoff_max_seconds = max(
             self.offline_backoff_base_seconds,
             config_data.get("offline_backoff_max_seconds", 600)
         )
-        
-        # Thread-safe counter and locks
-        self._active_recordings_lock = threading.Lock()
-        self._active_recordings = 0
-        self._recording_processes = {}  # Track active processes
-        self._recording_processes_lock = threading.Lock()  # Separate lock for processes dict
-        self._shutdown_event = threading.Event()
-        self._executor = None  # Store executor reference for cleanup
-        self._token_refresh_lock = threading.Lock()  # Lock for token refresh
-        self._offline_backoff_lock = threading.Lock()
-        self._offline_check_counts = {}
-        self._next_user_check_at = {}
+        self.learned_schedule_enabled = config_data.get("learned_schedule_enabled", False)
+        self.learned_schedule_api_budget_per_hour = max(1, config_data.get("learned_schedule_api_budget_per_hour", 600))
+        self.learned_schedule_min_events = max(1, config_data.get("learned_schedule_min_events", 5))
+        self.learned_schedule_max_interval_seconds = max(
+            self.refresh,
+            config_data.get("learned_schedule_max_interval_seconds", 1800)
+        )
+        self.learned_schedule_file = config_data.get(
+            "learned_schedule_file", os.path.join(self.root_path, ".golive-schedule.json")
+        )
+        if not self.learned_schedule_enabled:
+            self._go_live_schedule = None
+        elif not self._go_live_schedule or self._go_live_schedule.state_file != self.learned_schedule_file:
+            self._go_live_schedule = GoLiveSchedule(self.learned_schedule_file)
+        self._schedule_constant_cache = None
+
+        # User configuration
+        self.prune_after_days = config_data.get("prune_after_days", 30)
+        self.upload_to_network_drive_enabled = config_data.get("upload_to_network_drive", False)
+        self.network_drive_path = config_data.get("network_drive_path", "")
+        self.usernames = config_data.get("usernames", [])
+        self.quality = config_data.get("stream_quality", "best")
+        self.channel_priorities = config_data.get("channel_priorities", {})
+        self.default_channel_priority = config_data.get("default_channel_priority", 0)
+        self.preemption_enabled = config_data.get("preemption_enabled", True)
+        self.preemption_downgrade_quality = config_data.get("preemption_downgrade_quality", "")
+        self.quality_ladder = config_data.get("quality_ladder")
+        self.channel_quality_ladders = config_data.get("channel_quality_ladders", {})
+        self.quality_storage_horizon_hours = config_data.get("quality_storage_horizon_hours", 4)
+        self.quality_adapt_running = config_data.get("quality_adapt_running", False)
+        self.quality_adapt_interval = max(60, config_data.get("quality_adapt_interval_seconds", 300))
+        self.ingress_budget_mbps = config_data.get("ingress_budget_mbps", 0)
+        self.ingress_headroom_fraction = min(1.0, max(0.1, config_data.get("ingress_headroom_fraction", 0.85)))
+        self.ingress_interface = config_data.get("ingress_interface")
+        self.max_processing_attempts = max(1, config_data.get("max_processing_attempts", 3))
+        self.batch_workers = max(1, config_data.get("batch_workers", 2))
+        self.keyframe_index_enabled = config_data.get("keyframe_index_enabled", True)
+        self.progress_mode = config_data.get("progress_mode", "auto")
+        self.progress_log_interval = config_data.get("progress_log_interval", 60)
+        self.repair_enabled = config_data.get("repair_enabled", True)
+        self.repair_backup_path = config_data.get("repair_backup_path", os.path.join(self.scratch_path, "backup"))
+        repair_cache_file = config_data.get("repair_cache_file", os.path.join(self.root_path, ".repair-cache.json"))
+        if not self._repair or self._repair.cache_file != repair_cache_file:
+            self._repair = RepairEngine(
+                self.repair_backup_path, repair_cache_file,
+                self._run_ffmpeg, lambda source, destination: self.io_policy.copy_file(source, destination),
+                ffmpeg_path=self.ffmpeg_path, workers=config_data.get("repair_workers", 2)
+            )
+        else:
+            self._repair.backup_dir = self.repair_backup_path
+            self._repair.ffmpeg_path = self.ffmpeg_path
+            self._repair.workers = max(1, config_data.get("repair_workers", 2))
+
+        # Dashboard socket (read once at startup)
+        self.state_socket_enabled = config_data.get("state_socket_enabled", True)
+        self.state_socket_path = state_socket_path(config_data)
+        self.state_push_interval = max(0.5, config_data.get("state_push_interval", 2))
+
+        # Cluster configuration (read once at startup)
+        self.cluster_enabled = config_data.get("cluster_enabled", False)
+        self.cluster_node_id = config_data.get("cluster_node_id", socket.gethostname())
+        self.cluster_lease_ttl = max(15, config_data.get("cluster_lease_ttl_seconds", 90))
+
+        # Twitch configuration
+        self.client_id = config_data.get("client_id", "")
+        self.client_secret = config_data.get("client_secret", "")
+        # Endpoints are overridable so the recorder can run against a local mock API
+        oauth_token_url = config_data.get("oauth_token_url", "https://id.twitch.tv/oauth2/token")
+        self.token_url = f"{oauth_token_url}?client_id={self.client_id}&client_secret={self.client_secret}&grant_type=client_credentials"
+        self.url = config_data.get("helix_api_url", "https://api.twitch.tv/helix").rstrip("/") + "/streams"
+        self.token_cache_enabled = config_data.get("token_cache_enabled", True)
+        self.token_cache_file = config_data.get("token_cache_file", os.path.join(self.root_path, ".token-cache"))
+        self.token_background_refresh = config_data.get("token_background_refresh", True)
+        self.helix_rate_limit_enabled = config_data.get("helix_rate_limit_enabled", True)
+        self.helix_rate_limit_reserve = min(0.5, max(0.0, config_data.get("helix_rate_limit_reserve", 0.1)))
+        self.helix_max_retries = max(0, config_data.get("helix_max_retries", 3))
+        self.helix_metrics_file = config_data.get("helix_metrics_file")
+        if getattr(self, "_rate_limiter", None):
+            self._rate_limiter.reserve_fraction = self.helix_rate_limit_reserve
+        if not self.token_cache_enabled:
+            self._token_cache = None
+        elif not self._token_cache or not self._token_cache.matches(
+                self.token_cache_file, self.client_id, self.client_secret):
+            self._token_cache = TokenCache(self.token_cache_file, self.client_id, self.client_secret)
+
+        # Command-line options win over the config file, including after a reload
+        for name, value in self._cli_overrides.items():
+            setattr(self, name, value)
+
+    def set_override(self, name, value):
+        """Apply a command-line override that survives config reloads"""
+        self._cli_overrides[name] = value
+        setattr(self, name, value)
+
+    def _reload_signal_handler(self, signum, frame):
+        """Handle SIGHUP by scheduling a config reload on the main loop"""
+        logging.info("Reload signal received: SIGHUP. Reloading configuration...")
+        self._reload_requested.set()
+
+    def _profile_signal_handler(self, signum, frame):
+        """Handle SIGUSR1 by toggling profiling on the main loop"""
+        logging.info("Profiling signal received: SIGUSR1")
+        self._profile_toggle_requested.set()
+
+    def _handle_profiling_requests(self):
+        """Start or stop profiling from the main loop thread, where the main profile must run"""
+        if self._profile_toggle_requested.is_set():
+            self._profile_toggle_requested.clear()
+            self._profiler.toggle()
+            self._profile_started_at = time.time()
+        elif (self._profiler.active and self.profile_duration_seconds and
+              time.time() - self._profile_started_at >= self.profile_duration_seconds):
+            self._profiler.stop()
+
+    def _config_file_changed(self):
+        try:
+            return os.path.getmtime(self.config_path) != self._config_mtime
+        except OSError:
+            return False
+
+    def reload_config(self):
+        """Re-read the config file and apply it without touching running recordings.
+
+        Channels are added or removed, thresholds and quality apply to the next
+        check or recording, and the check pool is resized. Streamlink processes
+        that are already recording are left alone.
+        """
+        try:
+            config_data = self._read_config()
+        except Exception as e:
+            logging.error(f"Config reload failed, keeping current configuration: {e}")
+            return False
+
+        config_error = self._validate_config(config_data)
+        if config_error:
+            logging.error(f"Config reload rejected, keeping current configuration: {config_error}")
+            return False
+
+        old_config = self._config_data
+        old_usernames = list(self.usernames)
+        old_ffmpeg_path = self.ffmpeg_path
+        old_client = (self.client_id, self.client_secret)
+        old_workers = self._check_pool_size()
+
+        self._apply_config(config_data)
+
+        changed_keys = sorted(
+            key for key in set(old_config) | set(config_data)
+            if old_config.get(key) != config_data.get(key)
+        )
+        if not changed_keys:
+            logging.info("Config reloaded: no changes")
+            return True
+        logging.info(
+            f"Config reloaded, changed: {', '.join(changed_keys)} "
+            f"(running recordings keep their original settings)"
+        )
+
+        added = [username for username in self.usernames if username not in old_usernames]
+        removed = [username for username in old_usernames if username not in self.usernames]
+        if added:
+            logging.info(f"Now monitoring: {', '.join(added)}")
+        if removed:
+            with self._recording_processes_lock:
+                still_recording = [username for username in removed if username in self._recording_processes]
+            logging.info(f"No longer monitoring: {', '.join(removed)}")
+            if still_recording:
+                logging.info(f"Letting in-progress recordings finish for: {', '.join(still_recording)}")
+            with self._offline_backoff_lock:
+                for username in removed:
+                    self._offline_check_counts.pop(username, None)
+                    self._next_user_check_at.pop(username, None)
 
-        # User configuration
-        self.prune_after_days = config_data.get("prune_after_days", 30)
-        self.upload_to_network_drive_enabled = config_data.get("upload_to_network_drive", False)
-        self.network_drive_path = config_data.get("network_drive_path", "")
-        self.usernames = config_data.get("usernames", [])
-        self.quality = config_data.get("stream_quality", "best")
-        self.max_processing_attempts = max(1, config_data.get("max_processing_attempts", 3))
+        try:
+            self._paths = self.create_directories()
+        except SystemExit:
+            # create_directories exits on failure, which is only right at startup
+            logging.error("Keeping previous recording directories")
+        if self._go_live_schedule and added:
+            self._bootstrap_go_live_history(self._paths)
 
-        # Validate required fields
-        if not self.usernames:
-            logging.error("No usernames specified in config.json")
-            sys.exit(1)
+        if (self.client_id, self.client_secret) != old_client:
+            logging.info("Twitch credentials changed, fetching a new access token")
+            with self._token_refresh_lock:
+                self.access_token = None
+                self.token_expires_at = 0
+            try:
+                self.fetch_access_token()
+            except Exception:
+                pass  # Retried by the next check
 
-        # Twitch configuration
-        self.client_id = config_data.get("client_id", "")
-        self.client_secret = config_data.get("client_secret", "")
-        if not self.client_id or not self.client_secret:
-            logging.error("Missing client_id or client_secret in config.json")
-            sys.exit(1)
+        if self.ffmpeg_path != old_ffmpeg_path and not self.disable_ffmpeg:
+            self._ffmpeg_available = self._check_ffmpeg()
+            self.disable_ffmpeg = not self._ffmpeg_available
 
-        self.token_url = f"https://id.twitch.tv/oauth2/token?client_id={self.client_id}&client_secret={self.client_secret}&grant_type=client_credentials"
-        self.url = "https://api.twitch.tv/helix/streams"
-        self.access_token = None
-        self.token_expires_at = 0
-        self.fetch_access_token()
+        if self.capture_backend == "library":
+            self._check_streamlink()  # Falls back to the command if the library is missing
 
-        # Setup signal handlers for graceful shutdown
-        signal.signal(signal.SIGINT, self._signal_handler)
-        signal.signal(signal.SIGTERM, self._signal_handler)
-        
-        # Validate dependencies
-        self._validate_dependencies()
+        if self._cluster:
+            self._cluster.channels = list(self.usernames)
+
+        if self._executor and self._check_pool_size() != old_workers:
+            self._resize_check_pool()
+        return True
+
+    def _check_pool_size(self):
+        return min(len(self.usernames), 5)
+
+    def _resize_check_pool(self):
+        """Swap in a check pool sized for the current channel list.
+
+        The old pool is shut down without waiting: threads that are busy recording
+        keep running to the end of their stream and then exit.
+        """
+        old_executor = self._executor
+        self._executor = ThreadPoolExecutor(max_workers=self._check_pool_size())
+        old_executor.shutdown(wait=False)
+        logging.info(f"Check pool resized to {self._check_pool_size()} workers")
 
     def _validate_dependencies(self):
         """Validate required external dependencies"""
-        # Check streamlink
+        if not self._check_streamlink():
+            sys.exit(1)
+        
+        # Check ffmpeg if enabled
+        if not self.disable_ffmpeg:
+            self._ffmpeg_available = self._check_ffmpeg()
+            self.disable_ffmpeg = not self._ffmpeg_available
+
+    def _check_streamlink(self):
+        """Return False only if streamlink is not installed at all"""
+        if self.capture_backend == "hls":
+            return True  # The native HLS capture does not use streamlink
+        if self.capture_backend == "library":
+            try:
+                version = importlib.import_module("streamlink").__version__
+                logging.info(f"Capturing in-process with streamlink {version}")
+                return True
+            except ImportError:
+                logging.warning("streamlink library not importable, falling back to the streamlink command")
+                self.capture_backend = "subprocess"
         try:
-            result = subprocess.run(['streamlink', '--version'], capture_output=True, timeout=5)
+            result = subprocess.run([self.streamlink_path, '--version'], capture_output=True, timeout=5)
             if result.returncode != 0:
                 logging.warning("Streamlink not found or not working properly")
         except FileNotFoundError:
             logging.error("Streamlink is not installed. Please install: pip install streamlink")
-            sys.exit(1)
+            return False
         except Exception as e:
             logging.warning(f"Could not verify streamlink: {e}")
-        
-        # Check ffmpeg if enabled
-        if not self.disable_ffmpeg:
-            try:
-                result = subprocess.run([self.ffmpeg_path, '-version'], capture_output=True, timeout=5)
-                if result.returncode != 0:
-                    logging.warning(f"FFmpeg not found at {self.ffmpeg_path}")
-                    logging.warning("Processing will be disabled")
-                    self.disable_ffmpeg = True
-            except FileNotFoundError:
-                logging.error(f"FFmpeg not found at {self.ffmpeg_path}")
+        return True
+
+    def _check_ffmpeg(self):
+        """Return False if ffmpeg is missing so processing can be disabled"""
+        try:
+            result = subprocess.run([self.ffmpeg_path, '-version'], capture_output=True, timeout=5)
+            if result.returncode != 0:
+                logging.warning(f"FFmpeg not found at {self.ffmpeg_path}")
                 logging.warning("Processing will be disabled")
-                self.disable_ffmpeg = True
-            except Exception as e:
-                logging.warning(f"Could not verify ffmpeg: {e}")
+                return False
+        except FileNotFoundError:
+            logging.error(f"FFmpeg not found at {self.ffmpeg_path}")
+            logging.warning("Processing will be disabled")
+            return False
+        except Exception as e:
+            logging.warning(f"Could not verify ffmpeg: {e}")
+        return True
 
     def _signal_handler(self, signum, frame):
         """Handle shutdown signals safely"""
         signal_name = signal.Signals(signum).name
+        if self.handoff_enabled and signum == signal.SIGTERM:
+            # A service restart: leave captures running for the next instance
+            self._handoff_signal_handler(signum, frame)
+            return
         logging.info(f"Shutdown signal received: {signal_name}. Cleaning up...")
         self._shutdown_event.set()
         
         # Don't call cleanup here - let the main loop handle it
         # This avoids race conditions with the main thread
 
+    def _handoff_signal_handler(self, signum, frame):
+        """Shut down for a restart, leaving capture processes to be re-adopted"""
+        if not self.handoff_enabled:
+            logging.warning("Handoff requested but handoff_enabled is off, shutting down normally")
+        else:
+            logging.info(f"Handoff signal received: {signal.Signals(signum).name}. Leaving recordings running...")
+            self._handoff_requested.set()
+        self._shutdown_event.set()
+
+    def _handing_off(self, process):
+        # Only separate processes outlive the recorder; in-process captures cannot be handed off
+        return self._handoff_requested.is_set() and bool(process.pid)
+
     def _cleanup_processes(self):
         """Clean up any running recording processes"""
         with self._recording_processes_lock:
             processes_to_cleanup = list(self._recording_processes.items())
             
         for username, process in processes_to_cleanup:
+            if process and self._handing_off(process):
+                logging.info(f"Leaving recording process for {username} running for the next instance")
+                continue
             if process and process.poll() is None:
                 logging.info(f"Terminating recording process for {username}")
                 try:
@@ -180,86 +3161,471 @@ class TwitchRecorder:
         with self._active_recordings_lock:
             self._active_recordings = max(0, self._active_recordings - 1)
 
-    def can_start_new_recording(self):
+    def _admission_refusal(self, username=None, quality=None, usage=None, project_storage=False):
+        """Why another recording cannot start now: "slots", "resources", "bandwidth" or "disk", else None.
+
+        usage is a (CPU %, memory %) sample to reuse when several qualities are tried.
+        project_storage also refuses when scratch cannot hold horizon hours at this quality.
+        """
         if self.active_recordings >= self.max_concurrent_recordings:
-            return False
+            return "slots"
         
-        cpu_usage = psutil.cpu_percent(interval=1)
-        memory_usage = psutil.virtual_memory().percent
+        quality = quality or self.quality
+        cpu_usage, memory_usage = usage or (psutil.cpu_percent(interval=1), psutil.virtual_memory().percent)
         
-        if cpu_usage > self.cpu_threshold or memory_usage > self.memory_threshold:
+        if self.cost_admission_enabled and username:
+            # Admit on predicted headroom: current usage, captures still ramping up, and this one
+            cost = self._accountant.predict(username, quality)
+            pending = self._accountant.pending_cost()
+            total_memory_mb = psutil.virtual_memory().total / (1024 ** 2)
+            cpu_per_core = 1 / (psutil.cpu_count() or 1)
+            predicted_cpu = cpu_usage + (cost["cpu_percent"] + pending["cpu_percent"]) * cpu_per_core
+            predicted_memory = memory_usage + (cost["rss_mb"] + pending["rss_mb"]) / total_memory_mb * 100
+            if predicted_cpu > self.cpu_threshold or predicted_memory > self.memory_threshold:
+                logging.warning(
+                    f"Not enough headroom for {username} at {quality}: predicted CPU {predicted_cpu:.1f}%, "
+                    f"memory {predicted_memory:.1f}% (now {cpu_usage}%, {memory_usage}%)"
+                )
+                return "resources"
+        elif cpu_usage > self.cpu_threshold or memory_usage > self.memory_threshold:
             logging.warning(f"High resource usage: CPU {cpu_usage}%, Memory {memory_usage}%")
-            return False
+            return "resources"
+
+        if self.ingress_budget_mbps and username:
+            # Past the link's capacity every capture loses segments, not just the new one
+            available = self.ingress_budget_mbps * self.ingress_headroom_fraction
+            in_use = self._ingress_mbps()
+            needed = self._accountant.predict(username, quality)["net_mbps"]
+            if in_use + needed > available:
+                logging.warning(
+                    f"Not enough bandwidth for {username} at {quality}: {in_use:.1f} Mbps in use, "
+                    f"{needed:.1f} Mbps needed, {available:.1f} Mbps usable"
+                )
+                return "bandwidth"
         
-        # Check available disk space (require at least 1GB free)
+        # Check available disk space on each storage tier
         try:
-            disk_usage = psutil.disk_usage(self.root_path)
-            free_gb = disk_usage.free / (1024**3)
-            if free_gb < 1:
-                logging.warning(f"Low disk space: {free_gb:.2f}GB available")
-                return False
+            for tier, free_gb, needed_gb in self._tier_space():
+                if free_gb < needed_gb:
+                    logging.warning(f"Low disk space on {tier} tier: {free_gb:.2f}GB available, {needed_gb:.2f}GB needed")
+                    return "disk"
+                if project_storage and tier == "scratch":
+                    projected_gb = self._projected_capture_gb(username, quality)
+                    if free_gb - needed_gb < projected_gb:
+                        logging.info(
+                            f"{username} at {quality} would need {projected_gb:.1f}GB over "
+                            f"{self.quality_storage_horizon_hours}h, scratch has {free_gb - needed_gb:.1f}GB to spare"
+                        )
+                        return "disk"
         except Exception as e:
             logging.error(f"Error checking disk space: {e}")
-            return False
+            return "disk"
         
+        return None
+
+    def _projected_capture_gb(self, username, quality):
+        cost = self._accountant.predict(username, quality)
+        megabits_per_second = max(cost["disk_write_mbps"], cost["net_mbps"])
+        return megabits_per_second / 8 * 3600 * self.quality_storage_horizon_hours / 1000
+
+    def _quality_ladder(self, username):
+        """(rungs, fallback): qualities to try, best first, and a trailing "best"/"worst" for streamlink"""
+        ladder = self.channel_quality_ladders.get(username, self.quality_ladder)
+        if not ladder:
+            return [self.quality], None  # stream_quality as given, commas and all
+        if isinstance(ladder, str):
+            ladder = ladder.split(",")
+        rungs = [rung.strip() for rung in ladder if rung.strip()]
+        if len(rungs) > 1 and rungs[-1] in ("best", "worst"):
+            return rungs[:-1], rungs[-1]
+        return rungs, None
+
+    def _quality_argument(self, username, quality):
+        """What streamlink is asked for: this rung, then the ones below it in case the stream lacks it"""
+        rungs, fallback = self._quality_ladder(username)
+        if quality not in rungs:
+            return quality
+        return ",".join(rungs[rungs.index(quality):] + ([fallback] if fallback else []))
+
+    def _next_rung(self, username, quality, step):
+        """The rung step places below (+1) or above (-1) quality on username's ladder, or None"""
+        rungs, _ = self._quality_ladder(username)
+        if quality not in rungs:
+            return None
+        index = rungs.index(quality) + step
+        return rungs[index] if 0 <= index < len(rungs) else None
+
+    def _channel_priority(self, username):
+        return self.channel_priorities.get(username, self.default_channel_priority)
+
+    def _admit_recording(self, username):
+        """Take a recording slot for username and return the quality to record at, or None.
+
+        Starts at the best rung of the channel's quality ladder that fits the
+        predicted CPU and memory headroom, the ingress budget and the projected
+        scratch space. If not even the lowest rung fits, makes room by preemption:
+        when the limit is slots, the lowest-priority capture below username's
+        priority is stopped; when it is CPU, memory or bandwidth, such captures are
+        first moved down a rung (or to preemption_downgrade_quality). Full disks
+        are not solved by preemption. After each preemption the ladder is tried
+        again from the top. Runs under the admission lock, so a slot freed for
+        username cannot be taken by another channel. The caller releases the slot
+        with _decrement_recordings().
+        """
+        with self._admission_lock:
+            rungs, _ = self._quality_ladder(username)
+            quality, refusal = self._fit_quality_ladder(username, rungs)
+            # Each capture can be moved down every rung, then stopped
+            longest_ladder = max((len(self._quality_ladder(user)[0]) for user in list(self._capture_qualities)), default=1)
+            attempts = len(self._capture_qualities) * (longest_ladder + 1)
+            while quality is None and refusal in ("slots", "resources", "bandwidth") and self.preemption_enabled \
+                    and attempts > 0:
+                attempts -= 1
+                if not self._preempt_for(username, refusal):
+                    break
+                # The freed room may fit a better rung than the one that was refused
+                quality, refusal = self._fit_quality_ladder(username, rungs)
+            if quality is None:
+                return None
+            if quality != rungs[0]:
+                logging.info(f"{Fore.YELLOW}Not enough room for {username} at {rungs[0]}, recording at {quality}")
+            self._increment_recordings()
+            return quality
+
+    def _fit_quality_ladder(self, username, rungs):
+        """(rung, None) for the best rung admissible now, else (None, refusal of the lowest rung or "slots")"""
+        usage = (psutil.cpu_percent(interval=1), psutil.virtual_memory().percent)
+        refusal = None
+        for index, rung in enumerate(rungs):
+            # The lowest rung is the last resort; recording something beats recording nothing
+            refusal = self._admission_refusal(username, rung, usage, project_storage=index < len(rungs) - 1)
+            if refusal is None:
+                return rung, None
+            if refusal == "slots":
+                break
+        return None, refusal
+
+    def _preempt_for(self, username, refusal):
+        """Downgrade or stop one lower-priority capture for username; False if there is none"""
+        priority = self._channel_priority(username)
+        running = [
+            (self._channel_priority(victim), -self._recording_stats.get(victim, {}).get("started_at", 0), victim)
+            for victim in list(self._capture_qualities) if self._channel_priority(victim) < priority
+        ]
+        # Lowest priority first; among equals the newest capture, which loses the least by being cut
+        running.sort()
+        if refusal in ("resources", "bandwidth"):
+            for victim_priority, _, victim in running:
+                current = self._capture_qualities.get(victim)
+                downgrade = self.preemption_downgrade_quality or self._next_rung(victim, current, 1)
+                if downgrade and current != downgrade and victim not in self._adopted_captures:
+                    logging.info(
+                        f"{Fore.YELLOW}Restarting {victim} (priority {victim_priority}) at {downgrade} "
+                        f"to make room for {username} (priority {priority})"
+                    )
+                    freed_mbps = self._capture_ingress_mbps().get(victim, 0) * (
+                        1 - estimated_bitrate_mbps(downgrade) / estimated_bitrate_mbps(current or self.quality)
+                    )
+                    if self.change_capture_quality(victim, downgrade):
+                        changed = self._wait_until(lambda: self._capture_qualities.get(victim) == downgrade, 30)
+                        if changed:
+                            self._credit_freed_ingress(freed_mbps)
+                        return changed
+        if not running:
+            return False
+        victim_priority, _, victim = running[0]
+        logging.info(
+            f"{Fore.YELLOW}Preempting {victim} (priority {victim_priority}) for {username} (priority {priority})"
+        )
+        active_before = self.active_recordings
+        freed_mbps = self._capture_ingress_mbps().get(victim, 0)
+        # A pending quality change would restart the victim instead of freeing its slot
+        self._quality_changes.pop(victim, None)
+        self._stop_recording(victim)
+        stopped = self._wait_until(lambda: self.active_recordings < active_before, 30)
+        if stopped:
+            self._credit_freed_ingress(freed_mbps)
+        return stopped
+
+    def _credit_freed_ingress(self, mbps):
+        """Take bandwidth a preemption just freed off the link rate until the next sample shows it"""
+        if self.ingress_interface and mbps > 0:
+            with self._ingress_freed_lock:
+                self._ingress_freed.append((time.monotonic(), mbps))
+
+    def _wait_until(self, condition, timeout):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() >= deadline or self._shutdown_event.wait(0.2):
+                return False
+        return True
+
+    def change_capture_quality(self, username, quality):
+        """Restart a running capture at another quality; the stream continues in a new file"""
+        with self._recording_processes_lock:
+            process = self._recording_processes.get(username)
+        if username in self._adopted_captures or not process or process.poll() is not None:
+            return False
+        self._quality_changes[username] = quality
+        process.terminate()
         return True
 
-    def fetch_access_token(self):
-        """Fetch or refresh access token with proper error handling and thread safety"""
+    def _adapt_capture_qualities(self):
+        """Move one running capture down its ladder under pressure, or back up when there is room.
+
+        Pressure is CPU, memory, disk space or ingress beyond the usable bandwidth.
+        At most one change per quality_adapt_interval, since each one restarts a
+        capture: the lowest-priority capture steps down first, the highest steps up first.
+        """
+        if time.monotonic() - self._last_quality_change < self.quality_adapt_interval:
+            return
+        cpu_usage, memory_usage = psutil.cpu_percent(None), psutil.virtual_memory().percent
+        try:
+            tiers = self._tier_space()
+        except Exception:
+            return
+        scratch_spare_gb = tiers[0][1] - tiers[0][2]
+        running = sorted(
+            (self._channel_priority(username), username, quality)
+            for username, quality in list(self._capture_qualities.items())
+            if username not in self._adopted_captures and username not in self._quality_changes
+        )
+        projected_gb = sum(self._projected_capture_gb(username, quality) for _, username, quality in running)
+        usable_mbps = self.ingress_budget_mbps * self.ingress_headroom_fraction if self.ingress_budget_mbps else None
+        ingress_mbps = self._ingress_mbps()
+        under_pressure = (
+            cpu_usage > self.cpu_threshold or memory_usage > self.memory_threshold or
+            any(free_gb < needed_gb for _, free_gb, needed_gb in tiers) or
+            (usable_mbps is not None and ingress_mbps > usable_mbps)
+        )
+        stepping_down = under_pressure or scratch_spare_gb < projected_gb
+        if stepping_down:
+            candidates = [(username, quality, self._next_rung(username, quality, 1)) for _, username, quality in running]
+        else:
+            candidates = [(username, quality, self._next_rung(username, quality, -1)) for _, username, quality in reversed(running)]
+        cpu_per_core = 1 / (psutil.cpu_count() or 1)
+        total_memory_mb = psutil.virtual_memory().total / (1024 ** 2)
+        for username, quality, target in candidates:
+            if not target:
+                continue
+            if not stepping_down:
+                # Step up only with a margin, so a capture does not bounce between two rungs
+                current_cost = self._accountant.predict(username, quality)
+                target_cost = self._accountant.predict(username, target)
+                extra_cpu = (target_cost["cpu_percent"] - current_cost["cpu_percent"]) * cpu_per_core
+                extra_memory = (target_cost["rss_mb"] - current_cost["rss_mb"]) / total_memory_mb * 100
+                extra_gb = self._projected_capture_gb(username, target) - self._projected_capture_gb(username, quality)
+                extra_mbps = target_cost["net_mbps"] - current_cost["net_mbps"]
+                if (cpu_usage + extra_cpu > self.cpu_threshold * 0.8 or
+                        memory_usage + extra_memory > self.memory_threshold * 0.8 or
+                        scratch_spare_gb < projected_gb + extra_gb or
+                        (usable_mbps is not None and ingress_mbps + extra_mbps > usable_mbps * 0.8)):
+                    continue
+            logging.info(f"Moving {username} from {quality} to {target}")
+            if self.change_capture_quality(username, target):
+                self._last_quality_change = time.monotonic()
+                return
+
+    def _tier_space(self):
+        """(tier, free GB, GB needed to start another recording) for each storage tier.
+
+        Scratch must hold the minimum plus the space preallocated for every running
+        capture; archive must be able to take everything still waiting on scratch.
+        On a single disk both checks apply to the same free space.
+        """
+        gigabyte = 1024 ** 3
+        reserved = self.active_recordings * self.io_policy.preallocate_ahead_bytes if self.io_policy.preallocate else 0
+        backlog = 0
+        for recorded_path, _ in self._paths.values():
+            try:
+                backlog += sum(entry.stat().st_size for entry in os.scandir(recorded_path) if entry.is_file())
+            except OSError:
+                pass
+        scratch_free = psutil.disk_usage(self.scratch_path).free
+        if self._same_filesystem(self.scratch_path, self.archive_path):
+            needed = self.scratch_min_free_gb * gigabyte + reserved
+            return [("scratch", scratch_free / gigabyte, needed / gigabyte)]
+        archive_free = psutil.disk_usage(self.archive_path).free
+        return [
+            ("scratch", scratch_free / gigabyte, (self.scratch_min_free_gb * gigabyte + reserved) / gigabyte),
+            ("archive", archive_free / gigabyte, (self.archive_min_free_gb * gigabyte + backlog) / gigabyte),
+        ]
+
+    @staticmethod
+    def _same_filesystem(first, second):
+        try:
+            return os.stat(first).st_dev == os.stat(second).st_dev
+        except OSError:
+            return os.path.abspath(first) == os.path.abspath(second)
+
+    def _migrate_file(self, source, destination):
+        """Move a file between tiers: a rename on the same filesystem, else copy, sync and delete"""
+        destination_dir = os.path.dirname(destination)
+        os.makedirs(destination_dir, exist_ok=True)
+        if self._same_filesystem(os.path.dirname(source), destination_dir):
+            os.replace(source, destination)
+            return
+        partial = f"{destination}.partial"
+        self._journal.record("migrate", "started", source, target=destination)
+        self.io_policy.copy_file(source, partial)
+        with open(partial, "rb") as file:
+            os.fsync(file.fileno())
+        os.replace(partial, destination)  # Never leave a truncated file under the final name
+        os.remove(source)
+        self._journal.record("migrate", "finished", source)
+        logging.info(f"Migrated {os.path.basename(source)} to archive")
+
+    def fetch_access_token(self, min_validity=300):
+        """Fetch or refresh access token with proper error handling and thread safety
+
+        A token is refreshed once it expires within min_validity seconds. With the
+        token cache enabled, a token another process already refreshed is picked
+        up from the cache instead of requesting a new one.
+        """
         try:
             current_time = time.time()
-            # Refresh token if it expires in the next 5 minutes
-            if self.access_token and current_time < (self.token_expires_at - 300):
+            if self.access_token and current_time < (self.token_expires_at - min_validity):
                 return self.access_token
 
             # Use lock to prevent multiple threads from refreshing simultaneously
             with self._token_refresh_lock:
                 # Double-check after acquiring lock (another thread may have refreshed)
                 current_time = time.time()
-                if self.access_token and current_time < (self.token_expires_at - 300):
+                if self.access_token and current_time < (self.token_expires_at - min_validity):
+                    return self.access_token
+
+                if not self._token_cache:
+                    return self._request_access_token()
+
+                # The exclusive lock makes other processes wait for this refresh
+                with self._token_cache.lock(exclusive=True):
+                    cached = self._token_cache.read()
+                    if cached and current_time < cached[1] - min_validity and cached[0] != self.access_token:
+                        self.access_token, self.token_expires_at = cached
+                        logging.info("Using access token refreshed by another process")
+                        return self.access_token
+                    self._request_access_token()
+                    try:
+                        self._token_cache.write(self.access_token, self.token_expires_at)
+                    except Exception as e:
+                        logging.warning(f"Could not write token cache {self.token_cache_file}: {e}")
                     return self.access_token
-                    
-                logging.info("Fetching new access token")
-                token_response = requests.post(self.token_url, timeout=15)
-                token_response.raise_for_status()
-                token_data = token_response.json()
-                
-                self.access_token = token_data["access_token"]
-                expires_in = token_data.get("expires_in", 3600)
-                self.token_expires_at = current_time + expires_in
-                
-                logging.info(f"Access token refreshed, expires in {expires_in} seconds")
-                return self.access_token
         except Exception as e:
             logging.error(f"Failed to fetch access token: {e}")
             raise
 
+    def _request_access_token(self):
+        logging.info("Fetching new access token")
+        current_time = time.time()
+        with self._profiler.phase("token_fetch"):
+            token_response = requests.post(self.token_url, timeout=15)
+        token_response.raise_for_status()
+        token_data = token_response.json()
+        
+        self.access_token = token_data["access_token"]
+        expires_in = token_data.get("expires_in", 3600)
+        self.token_expires_at = current_time + expires_in
+        
+        logging.info(f"Access token refreshed, expires in {expires_in} seconds")
+        return self.access_token
+
+    def invalidate_access_token(self, rejected_token):
+        """Forget a token the API rejected so the next fetch requests a new one"""
+        with self._token_refresh_lock:
+            if self.access_token != rejected_token:
+                return  # Another thread already replaced it
+            self.token_expires_at = 0
+            if self._token_cache:
+                with self._token_cache.lock(exclusive=True):
+                    self._token_cache.invalidate(rejected_token)
+
+    def _token_refresh_loop(self):
+        """Refresh the token ahead of expiry so checks never wait on a token fetch"""
+        while not self._shutdown_event.is_set():
+            wait_seconds = max(5, self.token_expires_at - time.time() - self.TOKEN_REFRESH_MARGIN)
+            if self._shutdown_event.wait(timeout=min(wait_seconds, 3600)):
+                return
+            try:
+                self.fetch_access_token(min_validity=self.TOKEN_REFRESH_MARGIN)
+            except Exception:
+                self._shutdown_event.wait(timeout=60)  # Logged by fetch_access_token; retry shortly
+
     def run(self):
         """Main run loop with proper threading"""
-        paths = self.create_directories()
-        
-        # Don't process old recordings at startup - do it during idle time
-        # Just prune old files
-        for username in self.usernames:
-            recorded_path, processed_path = paths[username]
-            self.prune_old_files(recorded_path)
-            self.prune_old_files(processed_path)
+        self._paths = self.create_directories()
+        # Before anything can start new jobs, so every unfinished one in the journal is from the last run
+        self._recover_from_journal()
+        if self.fast_start:
+            # Get the first check out immediately; housekeeping catches up in the background
+            threading.Thread(
+                target=self._startup_housekeeping, args=(dict(self._paths),),
+                name="startup-housekeeping", daemon=True
+            ).start()
+        else:
+            self._startup_housekeeping(self._paths)
+
+        if self.cluster_enabled:
+            self._start_cluster()
+
+        # After joining the cluster, so adopted captures can take their leases back
+        if self.handoff_enabled:
+            self._adopt_recordings()
+
+        if self.token_background_refresh:
+            threading.Thread(target=self._token_refresh_loop, name="token-refresh", daemon=True).start()
+            self._token_refresher_running = True
+        threading.Thread(target=self._resource_sampling_loop, name="resource-sampler", daemon=True).start()
+        if self.state_socket_enabled:
+            self._state_server = StateServer(
+                self.state_socket_path, self._dashboard_state, self.state_push_interval,
+                commands={"profile": self._profile_toggle_requested.set}
+            )
+            if not self._state_server.start():
+                self._state_server = None
 
         # Use ThreadPoolExecutor for concurrent recording checks
-        self._executor = ThreadPoolExecutor(max_workers=min(len(self.usernames), 5))
+        self._executor = ThreadPoolExecutor(max_workers=self._check_pool_size())
+        first_cycle = True
         try:
             while not self._shutdown_event.is_set():
-                cpu_usage = psutil.cpu_percent(interval=1)
+                if self._reload_requested.is_set():
+                    self._reload_requested.clear()
+                    self.reload_config()
+                self._handle_profiling_requests()
+
+                # A fast-start first cycle samples CPU without the 1 second blocking window
+                cpu_usage = psutil.cpu_percent(interval=None if first_cycle and self.fast_start else 1)
+                first_cycle = False
                 
                 if cpu_usage < self.check_cpu_threshold:
                     # Submit tasks for each username
                     future_to_username = {}
                     current_time = time.time()
-                    for username in self.usernames:
-                        if not self._should_check_user_now(username, current_time):
-                            continue
-                        recorded_path, processed_path = paths[username]
-                        future = self._executor.submit(self.check_and_record_user, username, recorded_path, processed_path)
+                    cycle_started = current_time
+                    due = [
+                        username for username in self.usernames
+                        if (not self._cluster or self._cluster.holds(username))
+                        and self._should_check_user_now(username, current_time)
+                    ]
+                    priorities = {username: self._check_priority(username, current_time) for username in due}
+                    # The executor runs checks in submission order, so likely go-lives go first
+                    for username in sorted(due, key=priorities.get):
+                        # Never start a second check while this channel is still being checked or recorded
+                        with self._busy_users_lock:
+                            if username in self._busy_users:
+                                continue
+                            self._busy_users.add(username)
+                        self._check_done_at.pop(username, None)
+                        recorded_path, processed_path = self._paths[username]
+                        if self._profiler.active:
+                            future = self._executor.submit(
+                                self._profiler.run_profiled, self.check_and_record_user,
+                                username, recorded_path, processed_path, priorities[username]
+                            )
+                        else:
+                            future = self._executor.submit(
+                                self.check_and_record_user, username, recorded_path, processed_path, priorities[username]
+                            )
                         future_to_username[future] = username
                     
                     # Wait for all tasks to complete with proper timeout handling
@@ -279,33 +3645,42 @@ class TwitchRecorder:
                         for future in incomplete:
                             username = future_to_username[future]
                             logging.warning(f"Task for {username} did not complete in time")
-                            future.cancel()  # Attempt to cancel
+                            self._cancel_check(future, username)
                     except FuturesTimeoutError:
                         # Handle futures that didn't complete in time  
                         incomplete = set(future_to_username.keys()) - completed_futures
                         for future in incomplete:
                             username = future_to_username[future]
                             logging.warning(f"Task for {username} timed out")
-                            future.cancel()
+                            self._cancel_check(future, username)
+
+                    if future_to_username:
+                        # A check that became a recording counts until its hand-off, not until the
+                        # wait above times out; checks that never answered count until now
+                        now = time.time()
+                        cycle_seconds = max(
+                            self._check_done_at.get(username, now) for username in future_to_username.values()
+                        ) - cycle_started
+                        self.check_cycle_durations.append(cycle_seconds)
+                        logging.debug(f"Check cycle for {len(future_to_username)} channels took {cycle_seconds:.2f}s")
+                        self._publish_helix_metrics()
                     
                     # Process old recordings ONLY when idle (no active recordings)
                     if self._active_recordings == 0 and not self.disable_ffmpeg:
                         for username in self.usernames:
-                            recorded_path, processed_path = paths[username]
+                            recorded_path, processed_path = self._paths[username]
                             self.process_previous_recordings(recorded_path, processed_path)
                     
                     # Compress already-processed files when idle to save space
                     if self._active_recordings == 0 and self.idle_compress_enabled and not self.disable_ffmpeg:
                         for username in self.usernames:
-                            _, processed_path = paths[username]
+                            _, processed_path = self._paths[username]
                             self.compress_processed_file(processed_path)
                 else:
                     logging.warning(f"High CPU usage ({cpu_usage}%). Pausing new checks.")
                 
                 # Wait for next cycle
-                if not self._shutdown_event.wait(timeout=self.refresh):
-                    continue
-                else:
+                if self._wait_for_next_cycle():
                     break
         finally:
             # Graceful shutdown of executor
@@ -315,29 +3690,358 @@ class TwitchRecorder:
                 self._executor.shutdown(wait=False)
             logging.info("Cleaning up processes...")
             self._cleanup_processes()  # This already handles process termination properly
+            if self._cluster:
+                # Handed-off captures keep their leases for the next instance
+                handed_off = self._handoff_registry.entries() if self._handoff_requested.is_set() else {}
+                self._cluster.stop(keep=set(handed_off))
+            if self._state_server:
+                self._state_server.stop()
+            if self._profiler.active:
+                self._profiler.stop()
+            self._accountant.save()
+
+    def _resource_sampling_loop(self):
+        """Sample every child process and save the cost model every few minutes"""
+        last_saved = time.monotonic()
+        while not self._shutdown_event.wait(timeout=self.resource_sample_interval):
+            accountant = self._accountant  # Replaced when cost_model_file changes on reload
+            accountant.sample()
+            if self.ingress_interface:
+                self._sample_link_ingress()
+            if self.quality_adapt_running:
+                try:
+                    self._adapt_capture_qualities()
+                except Exception as e:
+                    logging.error(f"Error adapting capture qualities: {e}")
+            if time.monotonic() - last_saved >= 300:
+                accountant.save()
+                last_saved = time.monotonic()
+
+    def _sample_link_ingress(self):
+        """Receive rate of ingress_interface, which also sees traffic from outside the recorder"""
+        counters = psutil.net_io_counters(pernic=True).get(self.ingress_interface)
+        if counters is None:
+            return
+        previous_bytes, previous_at, mbps = self._link_ingress
+        now = time.monotonic()
+        if previous_bytes is not None and counters.bytes_recv >= previous_bytes:
+            mbps = (counters.bytes_recv - previous_bytes) * 8 / max(now - previous_at, 1e-3) / 1e6
+            # A window that started after a preemption no longer contains what it freed
+            with self._ingress_freed_lock:
+                self._ingress_freed = [(at, freed) for at, freed in self._ingress_freed if at > previous_at]
+        self._link_ingress = (counters.bytes_recv, now, mbps)
+
+    def _capture_ingress_mbps(self):
+        """Download rate per running capture.
+
+        Socket reads of the capture process where the accountant tracks it, else
+        the growth of the file. Captures younger than 30s count at least their
+        predicted rate, since neither measurement has caught up with them yet.
+        """
+        network = collections.Counter()
+        for child in self._accountant.snapshot().values():
+            if child["kind"] == "capture":
+                network[child["username"]] += child.get("net_mbps", 0)
+        ingress = {}
+        for username, stats in list(self._recording_stats.items()):
+            mbps = max(network[username], stats["mbps"])
+            if time.time() - stats["started_at"] < 30:
+                quality = self._capture_qualities.get(username, self.quality)
+                mbps = max(mbps, self._accountant.predict(username, quality)["net_mbps"])
+            ingress[username] = mbps
+        return ingress
+
+    def _ingress_mbps(self):
+        """Download rate in use: the captures, or the whole link when ingress_interface is measured.
+
+        The link rate is an average over the last sample window, so bandwidth freed
+        by a preemption since then is taken off until a window without it is measured.
+        """
+        with self._ingress_freed_lock:
+            freed_mbps = sum(freed for _, freed in self._ingress_freed)
+        link_mbps = max(0.0, self._link_ingress[2] - freed_mbps)
+        return max(sum(self._capture_ingress_mbps().values()), link_mbps)
+
+    def _dashboard_state(self):
+        """Snapshot of the recorder for the dashboard; only built while one is connected"""
+        now = time.time()
+        with self._recording_processes_lock:
+            recording = set(self._recording_processes)
+        channels = []
+        for username in self.usernames:
+            status, checked_at = self._last_checked.get(username, (None, None))
+            if username in recording:
+                state = "recording"
+            elif username in self._live_stream_ids:
+                state = "live"
+            else:
+                state = status or "unchecked"
+            channels.append({
+                "name": username, "state": state, "checked_at": checked_at,
+                "next_check_at": self._next_user_check_at.get(username),
+                "leased": self._cluster.holds(username) if self._cluster else True,
+            })
+        captures = [dict(stats, channel=username) for username, stats in list(self._recording_stats.items())]
+        costs = self._accountant.snapshot()
+        jobs = [
+            dict(job, pid=pid, cpu_percent=costs.get(str(pid), {}).get("cpu_percent"))
+            for pid, job in list(self._running_jobs.items())
+        ]
+
+        storage = []
+        for tier, path in (("scratch", self.scratch_path), ("archive", self.archive_path)):
+            if tier == "archive" and self._same_filesystem(self.scratch_path, self.archive_path):
+                break
+            try:
+                usage = psutil.disk_usage(path)
+            except OSError:
+                continue
+            storage.append({"tier": tier, "path": path, "total": usage.total, "used": usage.used, "free": usage.free})
+
+        return {
+            "time": now,
+            "pid": os.getpid(),
+            "uptime": now - self._started_at,
+            "node": self.cluster_node_id if self._cluster else None,
+            "profiling": self._profiler.active,
+            "recordings": {"active": self.active_recordings, "max": self.max_concurrent_recordings},
+            "channels": channels,
+            "captures": captures,
+            "jobs": jobs,
+            "queues": self._dashboard_queue_counts(recording),
+            "storage": storage,
+            "system": {
+                "cpu_percent": psutil.cpu_percent(None),
+                "memory_percent": psutil.virtual_memory().percent,
+                "load": os.getloadavg() if hasattr(os, "getloadavg") else None,
+                "ingest_mbps": round(sum(capture["mbps"] for capture in captures), 2),
+                "ingress_mbps": round(self._ingress_mbps(), 2),
+                "ingress_budget_mbps": self.ingress_budget_mbps or None,
+            },
+        }
+
+    def _dashboard_queue_counts(self, recording):
+        """Files waiting for remux and compression; directory scans, so cached for 30s"""
+        counted_at, counts = self._queue_counts
+        if time.monotonic() - counted_at < 30:
+            return counts
+        counts = {"remux": 0, "compress": 0 if self.idle_compress_enabled else None}
+        for username, (recorded_path, processed_path) in list(self._paths.items()):
+            try:
+                waiting = sum(1 for entry in os.scandir(recorded_path) if entry.name.endswith(".mp4"))
+                # The file being captured is not waiting yet
+                counts["remux"] += max(0, waiting - (username in recording))
+                if self.idle_compress_enabled:
+                    counts["compress"] += len(self._compress_candidates(processed_path))
+            except OSError:
+                pass
+        self._queue_counts = (time.monotonic(), counts)
+        return counts
+
+    def _startup_housekeeping(self, paths):
+        """Seed the learned schedule, clear interrupted remuxes and prune old files"""
+        if self._go_live_schedule:
+            self._bootstrap_go_live_history(paths)
+
+        if not self.journal_enabled:
+            # A remux interrupted before migration is redone from the recording, which is still on scratch
+            staging_dir = os.path.join(self.scratch_path, "processing")
+            if os.path.isdir(staging_dir):
+                for filename in os.listdir(staging_dir):
+                    try:
+                        os.remove(os.path.join(staging_dir, filename))
+                        logging.info(f"Removed interrupted remux output: {filename}")
+                    except OSError as e:
+                        logging.warning(f"Could not remove {filename} from {staging_dir}: {e}")
+            for _, processed_path in paths.values():
+                for partial in Path(processed_path).glob("*.partial"):
+                    partial.unlink()  # Half-copied migration; the source is still on scratch
+
+        # Don't process old recordings at startup - do it during idle time
+        # Just prune old files
+        for username, (recorded_path, processed_path) in paths.items():
+            if self._shutdown_event.is_set():
+                return
+            self.prune_old_files(recorded_path)
+            self.prune_old_files(processed_path)
+            self.prune_old_files(os.path.join(self.repair_backup_path, username))
+
+    def _recover_from_journal(self):
+        """Clean up after the jobs an unclean shutdown interrupted, as listed in the journal"""
+        self._journal.compact()  # Also drops a line torn by the crash, so new events start on a fresh line
+        unfinished = self._journal.unfinished()
+        if not unfinished:
+            return
+        handed_off = {
+            entry["filename"] for entry in self._handoff_registry.entries().values()
+            if self.handoff_enabled and AdoptedProcess.adopt(entry)
+        }
+        logging.info(f"Recovering {len(unfinished)} interrupted job(s) from {self.journal_file}")
+        for entry in unfinished:
+            job, source = entry["job"], entry["source"]
+            if job == "recording" and source in handed_off:
+                continue  # Still running; _adopt_recordings picks it up
+            if JobJournal.writer_alive(entry):
+                continue  # In progress in another recorder process
+            try:
+                getattr(self, f"_recover_{job}")(entry)
+            except Exception as e:
+                logging.error(f"Could not recover interrupted {job} of {source}: {e}")
+                continue
+            self._journal.record(job, "recovered", source)
+        self._journal.compact()
+
+    def _remove_if_exists(self, filename, reason):
+        if filename and os.path.exists(filename):
+            os.remove(filename)
+            logging.info(f"Removed {reason}: {filename}")
+
+    def _recover_recording(self, entry):
+        # Salvage the capture; it is remuxed at idle time like any other recording
+        source = entry["source"]
+        if not os.path.exists(source):
+            return
+        removed = trim_transport_stream(source)
+        if os.path.getsize(source) == 0:
+            self._remove_if_exists(source, "empty interrupted recording")
+        elif removed:
+            logging.info(f"Salvaged interrupted recording {source} (trimmed {removed} bytes)")
+
+    def _recover_remux(self, entry):
+        # With the recording still there the remux is simply redone; its outputs may be partial
+        if os.path.exists(entry["source"]):
+            self._remove_if_exists(entry["target"], "interrupted remux output")
+            if entry.get("destination") != entry["target"]:
+                self._remove_if_exists(entry.get("destination"), "interrupted remux output")
+                self._remove_if_exists(f"{entry.get('destination')}.partial", "interrupted migration")
+
+    def _recover_migrate(self, entry):
+        source, destination = entry["source"], entry["target"]
+        self._remove_if_exists(f"{destination}.partial", "interrupted migration")
+        if os.path.exists(source) and os.path.exists(destination):
+            os.remove(source)  # The copy completed; only the source removal was lost
+
+    def _recover_compress(self, entry):
+        source, temp_output = entry["source"], entry["target"]
+        if entry["event"] == "committing":
+            # The compressed file was complete; finish replacing the original and mark it
+            if os.path.exists(temp_output):
+                os.replace(temp_output, source)
+            with open(f"{source}.compressed", "w") as f:
+                f.write(f"compressed {datetime.datetime.now().isoformat()} savings={entry.get('savings')}% (recovered)")
+            logging.info(f"Completed interrupted compression of {source}")
+        else:
+            self._remove_if_exists(temp_output, "interrupted compression output")
+
+    def _cancel_check(self, future, username):
+        # A check that never started will not clear its own busy flag
+        if future.cancel():
+            with self._busy_users_lock:
+                self._busy_users.discard(username)
+
+    def _wait_for_next_cycle(self):
+        """Sleep until the next check cycle. Returns True if shutdown was requested.
+
+        Wakes early when a reload is requested by SIGHUP or, with
+        config_watch_enabled, when the config file is modified.
+        """
+        deadline = time.time() + self.refresh
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            if self._shutdown_event.wait(timeout=min(1.0, remaining)):
+                return True
+            if self.config_watch_enabled and self._config_file_changed():
+                logging.info(f"Config file {self.config_path} changed, reloading")
+                self._reload_requested.set()
+            if self._reload_requested.is_set() or self._profile_toggle_requested.is_set():
+                return False
 
-    def check_and_record_user(self, username, recorded_path, processed_path):
+    def check_and_record_user(self, username, recorded_path, processed_path, priority=1):
         """Check and potentially record a single user"""
         try:
             logging.info(f"Checking {username}")
-            status, info = self.check_user(username)
+            status, info = self.check_user(username, priority)
+            self._last_checked[username] = (status.name.lower(), time.time())
             
             if status == TwitchResponseStatus.NOT_FOUND:
                 logging.error(f"{Fore.RED}Username {username} not found")
             elif status == TwitchResponseStatus.OFFLINE:
+                self._live_stream_ids.pop(username, None)
                 logging.info(f"{Fore.YELLOW}{username} currently offline")
+            elif status == TwitchResponseStatus.RATE_LIMITED:
+                logging.warning(f"{Fore.YELLOW}Helix rate limit reached, {username} will be checked next cycle")
             elif status == TwitchResponseStatus.UNAUTHORIZED:
                 logging.info(f"{Fore.RED}Unauthorized, refreshing access token")
+                self.invalidate_access_token(self.access_token)
                 self.fetch_access_token()
             elif status == TwitchResponseStatus.ONLINE:
-                if self.can_start_new_recording():
-                    self.record_stream(username, info, recorded_path, processed_path)
+                self._live_stream_ids[username] = info["data"][0].get("id")
+                self._observe_go_live(username, info)
+                if self._cluster and not self._cluster.holds(username):
+                    logging.info(f"{username} online but its cluster lease has moved, not recording")
                 else:
-                    logging.info(f"{Fore.YELLOW}Cannot start recording for {username} - resource limits")
+                    with self._profiler.phase("admission_check"):
+                        quality = self._admit_recording(username)
+                    if quality:
+                        self._check_done_at[username] = time.time()
+                        try:
+                            self.record_stream(username, info, recorded_path, processed_path, quality)
+                        finally:
+                            self._decrement_recordings()
+                    else:
+                        logging.info(f"{Fore.YELLOW}Cannot start recording for {username} - resource limits")
             return status
         except Exception as e:
             logging.error(f"Error checking {username}: {e}")
             return TwitchResponseStatus.ERROR
+        finally:
+            self._check_done_at.setdefault(username, time.time())
+            with self._busy_users_lock:
+                self._busy_users.discard(username)
+
+    def _start_cluster(self):
+        """Join the cluster and start claiming channel leases"""
+        try:
+            store = create_lease_store(self._config_data)
+        except Exception as e:
+            logging.error(f"Cluster mode enabled but the coordination store failed to open: {e}")
+            sys.exit(1)
+        self._cluster = ClusterCoordinator(
+            store, self.cluster_node_id, self.cluster_lease_ttl,
+            capacity_fn=self._cluster_capacity,
+            is_recording_fn=self._is_recording,
+            on_lease_lost=self._stop_recording
+        )
+        self._cluster.start(self.usernames)
+        logging.info(
+            f"Cluster mode: node {self.cluster_node_id} holds {len(self._cluster.held_channels())} "
+            f"of {len(self.usernames)} channels"
+        )
+
+    def _cluster_capacity(self):
+        """Free capacity advertised to other nodes: free recording slots, zero when disk is low"""
+        free_slots = max(0, self.max_concurrent_recordings - self.active_recordings)
+        try:
+            if any(free_gb < needed_gb for _, free_gb, needed_gb in self._tier_space()):
+                return 0
+        except Exception:
+            pass
+        # Half a slot keeps a full node in the rotation for polling offline channels
+        return free_slots + 0.5
+
+    def _is_recording(self, username):
+        with self._recording_processes_lock:
+            return username in self._recording_processes or username in self._adopted_captures
+
+    def _stop_recording(self, username):
+        """Cleanly end one channel's recording, leaving the captured file in place"""
+        with self._recording_processes_lock:
+            process = self._recording_processes.get(username)
+        if process and process.poll() is None:
+            logging.info(f"Stopping recording for {username}")
+            process.terminate()
 
     def _should_check_user_now(self, username, current_time):
         if not self.offline_backoff_enabled:
@@ -352,41 +4056,214 @@ class TwitchRecorder:
             self._offline_check_counts[username] = 0
             self._next_user_check_at[username] = 0
 
-    def _update_user_check_schedule(self, username, status):
-        if not self.offline_backoff_enabled:
-            return
+    def _update_user_check_schedule(self, username, status):
+        if not self.offline_backoff_enabled or status == TwitchResponseStatus.RATE_LIMITED:
+            return
+
+        if status == TwitchResponseStatus.OFFLINE:
+            with self._offline_backoff_lock:
+                offline_count = self._offline_check_counts.get(username, 0) + 1
+                self._offline_check_counts[username] = offline_count
+
+            current_time = self._clock()
+            delay_seconds = self._learned_check_delay(username, current_time)
+            if delay_seconds is not None:
+                with self._offline_backoff_lock:
+                    self._next_user_check_at[username] = current_time + delay_seconds
+                logging.info(f"{username} learned schedule: next check in {int(delay_seconds)}s")
+                return
+
+            delay_seconds = min(
+                self.offline_backoff_max_seconds,
+                self.offline_backoff_base_seconds * (2 ** (offline_count - 1))
+            )
+            with self._offline_backoff_lock:
+                self._next_user_check_at[username] = current_time + delay_seconds
+
+            logging.info(
+                f"{username} offline backoff: next check in {int(delay_seconds)}s "
+                f"(offline count: {offline_count})"
+            )
+            return
+
+        self._reset_user_backoff(username)
+
+    def _check_priority(self, username, current_time):
+        """Rate limiter priority for a check: 0 for channels likely to be live, up to 1 otherwise"""
+        if self._has_learned_schedule(username):
+            rate = self._go_live_schedule.intensity(username, current_time, current_time)
+            typical = self._go_live_schedule.mean_sqrt_intensity(username, current_time) ** 2
+            if typical <= 0:
+                return 1.0
+            return max(0.0, 1.0 - rate / (2 * typical))
+        with self._offline_backoff_lock:
+            offline_count = self._offline_check_counts.get(username, 0)
+        # Recently live or freshly added channels first; long-offline ones last
+        return min(1.0, offline_count / 10)
+
+    def _publish_helix_metrics(self):
+        """Log Helix budget usage and write it to helix_metrics_file if configured"""
+        if not self.helix_rate_limit_enabled:
+            return
+        snapshot = self._rate_limiter.snapshot()
+        logging.debug(
+            f"Helix budget: {snapshot['budget_used_percent']}% used, {snapshot['server_remaining']} remaining, "
+            f"{snapshot['throttled_429']} throttled, {snapshot['wait_seconds_total']}s waited"
+        )
+        if not self.helix_metrics_file:
+            return
+        snapshot["updated_at"] = datetime.datetime.now().isoformat()
+        temp_file = f"{self.helix_metrics_file}.tmp"
+        try:
+            with open(temp_file, "w") as file:
+                json.dump(snapshot, file, indent=2)
+            os.replace(temp_file, self.helix_metrics_file)
+        except OSError as e:
+            logging.warning(f"Could not write Helix metrics to {self.helix_metrics_file}: {e}")
+
+    def _has_learned_schedule(self, username):
+        return (
+            self._go_live_schedule is not None and
+            self._go_live_schedule.event_count(username) >= self.learned_schedule_min_events
+        )
+
+    def _observe_go_live(self, username, info):
+        """Feed a go-live event from the Helix response into the learned schedule"""
+        if not self._go_live_schedule:
+            return
+        try:
+            started_at = info["data"][0].get("started_at")
+            go_live_time = datetime.datetime.strptime(started_at, "%Y-%m-%dT%H:%M:%SZ").replace(
+                tzinfo=datetime.timezone.utc
+            ).timestamp()
+        except Exception:
+            go_live_time = self._clock()
+
+        if self._go_live_schedule.record_go_live(username, go_live_time, observed_at=self._clock()):
+            self._schedule_constant_cache = None
+            self._go_live_schedule.save()
+
+    def _bootstrap_go_live_history(self, paths):
+        """Seed the learned schedule from timestamps in existing recording filenames"""
+        added = 0
+        for username in self.usernames:
+            if self._go_live_schedule.event_count(username) > 0:
+                continue
+            directories = list(paths.get(username, ()))
+            directories.append(os.path.join(self.archive_path, "failed", username))
+            for directory in directories:
+                try:
+                    filenames = os.listdir(directory)
+                except OSError:
+                    continue
+                for filename in filenames:
+                    parts = filename.split(" - ")
+                    if len(parts) < 3 or parts[0] != username:
+                        continue
+                    try:
+                        started = datetime.datetime.strptime(parts[1], '%Y-%m-%d %Hh%Mm%Ss').timestamp()
+                    except ValueError:
+                        continue
+                    if self._go_live_schedule.record_go_live(username, started):
+                        added += 1
+        if added:
+            logging.info(f"Learned schedule seeded with {added} go-live events from existing recordings")
+            self._go_live_schedule.save()
+
+    def _learned_schedule_constant(self, current_time):
+        """Scale factor C for poll intervals of C / sqrt(go-live rate).
+
+        Spacing polls proportionally to 1/sqrt(rate) minimises the expected detection
+        delay for a fixed number of calls. Intervals are clamped to refresh_interval and
+        learned_schedule_max_interval_seconds, so C is solved by bisection for the value
+        at which the clamped call rate across all learned channels matches the
+        configured hourly budget.
+        """
+        cached = self._schedule_constant_cache
+        # Intensities are rebuilt hourly and a new go-live clears the cache, so this is fresh enough
+        if cached and current_time - cached[0] < 3600:
+            return cached[1]
+
+        learned = [username for username in self.usernames if self._has_learned_schedule(username)]
+        # Channels without enough history still poll on plain backoff; reserve budget for them
+        unlearned_calls = (len(self.usernames) - len(learned)) * 3600 / self.offline_backoff_max_seconds
+        budget_per_second = max(
+            len(learned) * 3600 / self.learned_schedule_max_interval_seconds,
+            self.learned_schedule_api_budget_per_hour - unlearned_calls
+        ) / 3600
+        roots = sorted(
+            root for username in learned
+            for root in self._go_live_schedule.sqrt_intensities(username, current_time) if root > 0
+        )
+        if not roots:
+            self._schedule_constant_cache = (current_time, 0)
+            return 0
+
+        min_interval = self.refresh
+        max_interval = self.learned_schedule_max_interval_seconds
+        prefix = [0.0]
+        for root in roots:
+            prefix.append(prefix[-1] + root)
+        bucket_count = GoLiveSchedule.BUCKETS
+        empty_buckets = len(learned) * bucket_count - len(roots)
+
+        def calls_per_second(constant):
+            # Buckets polled at the max interval, at C / sqrt(rate), and at refresh_interval
+            slow = bisect.bisect_right(roots, constant / max_interval)
+            fast = bisect.bisect_left(roots, constant / min_interval)
+            total = (slow + empty_buckets) / max_interval + (prefix[fast] - prefix[slow]) / constant
+            total += (len(roots) - fast) / min_interval
+            return total / bucket_count
 
-        if status == TwitchResponseStatus.OFFLINE:
-            with self._offline_backoff_lock:
-                offline_count = self._offline_check_counts.get(username, 0) + 1
-                self._offline_check_counts[username] = offline_count
+        low = roots[0] * min_interval / 2
+        high = roots[-1] * max_interval * 2
+        for _ in range(60):
+            constant = (low * high) ** 0.5
+            if calls_per_second(constant) > budget_per_second:
+                low = constant
+            else:
+                high = constant
+        constant = high
+        self._schedule_constant_cache = (current_time, constant)
+        return constant
 
-                delay_seconds = min(
-                    self.offline_backoff_max_seconds,
-                    self.offline_backoff_base_seconds * (2 ** (offline_count - 1))
-                )
-                self._next_user_check_at[username] = time.time() + delay_seconds
+    def _learned_check_delay(self, username, current_time):
+        """Delay until the next check from the learned schedule, or None without enough history.
 
-            logging.info(
-                f"{username} offline backoff: next check in {int(delay_seconds)}s "
-                f"(offline count: {offline_count})"
-            )
-            return
+        Walks forward in time accumulating poll rate so that a likely go-live window
+        starting before the current interval elapses still gets polled on time.
+        """
+        if not self._has_learned_schedule(username):
+            return None
 
-        self._reset_user_backoff(username)
+        constant = self._learned_schedule_constant(current_time)
+        min_interval = self.refresh
+        max_interval = self.learned_schedule_max_interval_seconds
+        step = 60
+        accumulated = 0.0
+        elapsed = 0
+        while elapsed < max_interval:
+            rate = self._go_live_schedule.intensity(username, current_time + elapsed, current_time)
+            interval = constant / (rate ** 0.5) if rate > 0 else max_interval
+            interval = min(max_interval, max(min_interval, interval))
+            accumulated += step / interval
+            if accumulated >= 1:
+                return max(min_interval, elapsed + step * (1 - (accumulated - 1) * interval / step))
+            elapsed += step
+        return max_interval
 
     def create_directories(self):
         """Create necessary directories with proper error handling"""
         paths = {}
         try:
             for username in self.usernames:
-                recorded_path = os.path.join(self.root_path, "recorded", username)
-                processed_path = os.path.join(self.root_path, "processed", username)
+                recorded_path = os.path.join(self.scratch_path, "recorded", username)
+                processed_path = os.path.join(self.archive_path, "processed", username)
                 os.makedirs(recorded_path, exist_ok=True)
                 os.makedirs(processed_path, exist_ok=True)
                 paths[username] = (recorded_path, processed_path)
         except PermissionError:
-            logging.error(f"Permission denied creating directories in {self.root_path}")
+            logging.error(f"Permission denied creating directories in {self.scratch_path} or {self.archive_path}")
             sys.exit(1)
         except Exception as e:
             logging.error(f"Error creating directories: {e}")
@@ -416,36 +4293,86 @@ class TwitchRecorder:
     def process_previous_recordings(self, recorded_path, processed_path):
         """Process ONE existing recording per call (called during idle time only)"""
         try:
-            video_files = [f for f in os.listdir(recorded_path) 
-                          if os.path.isfile(os.path.join(recorded_path, f)) and f.endswith('.mp4')]
+            # Sorted so the oldest capture comes first and fragments stay in capture order
+            video_files = sorted(f for f in os.listdir(recorded_path) 
+                                 if os.path.isfile(os.path.join(recorded_path, f)) and f.endswith('.mp4'))
             
-            # Only process ONE file at a time to avoid blocking for too long
+            # Only process ONE file (or one broadcast's fragments) at a time to avoid blocking for too long
             if video_files:
                 filename = video_files[0]  # Just process the first one
                 recorded_filename = os.path.join(recorded_path, filename)
                 processed_filename = os.path.join(processed_path, filename)
-                logging.info(f"Processing {filename} ({len(video_files)-1} remaining)")
-                self.process_recorded_file(recorded_filename, processed_filename)
+                fragments = self._broadcast_fragments(recorded_path, video_files)
+                if not fragments:
+                    return
+                logging.info(f"Processing {filename} ({len(video_files)-len(fragments)} remaining)")
+                self.process_recorded_file(recorded_filename, processed_filename, fragments)
         except Exception as e:
             logging.error(f"Error processing previous recordings: {e}")
 
-    def process_recorded_file(self, recorded_filename, processed_filename):
-        """Process a single recorded file with proper error handling"""
+    def _stream_id_file(self, recorded_filename):
+        return f"{recorded_filename}.stream-id"
+
+    def _read_stream_id(self, recorded_filename):
+        return self._read_stream_sidecar(recorded_filename)[0]
+
+    def _read_stream_sidecar(self, recorded_filename):
+        """(stream id, quality) of a capture; quality is None for captures from older versions"""
         try:
-            # Wait a moment to ensure file is not being written to
-            time.sleep(3)
-            
-            # Check if file is still being written (multiple size checks)
-            sizes = []
-            for i in range(3):
-                sizes.append(os.path.getsize(recorded_filename))
-                if i < 2:  # Don't sleep after last check
-                    time.sleep(2)
-            
-            # If file size is still changing, it's being written to
-            if len(set(sizes)) > 1:
-                logging.warning(f"File {recorded_filename} still being written (sizes: {sizes}), skipping")
-                return
+            with open(self._stream_id_file(recorded_filename), "r") as file:
+                lines = file.read().split()
+        except OSError:
+            return None, None
+        return (lines[0] if lines else None), (lines[1] if len(lines) > 1 else None)
+
+    def _clear_stream_id(self, recorded_filename):
+        try:
+            os.remove(self._stream_id_file(recorded_filename))
+        except FileNotFoundError:
+            pass
+
+    def _broadcast_fragments(self, recorded_path, video_files):
+        """The oldest capture plus any later captures of the same broadcast, in order.
+
+        Returns an empty list while that broadcast is still live, since streamlink
+        may be restarted into another fragment of it. Fragments captured at another
+        quality are left for a separate file; they cannot be joined without re-encoding.
+        """
+        first = os.path.join(recorded_path, video_files[0])
+        broadcast = self._read_stream_sidecar(first)
+        stream_id = broadcast[0]
+        if not stream_id:
+            return [first]
+        if self._live_stream_ids.get(Path(recorded_path).name) == stream_id:
+            logging.debug(f"Broadcast {stream_id} is still live, holding its captures for merging")
+            return []
+        candidates = [os.path.join(recorded_path, filename) for filename in video_files]
+        return [filename for filename in candidates if self._read_stream_sidecar(filename) == broadcast]
+
+    def process_recorded_file(self, recorded_filename, processed_filename, fragments=None, wait_until_settled=True):
+        """Process a single recorded file with proper error handling; returns True on success.
+
+        fragments lists every capture of the same broadcast, recorded_filename first;
+        they are joined into processed_filename in the same ffmpeg run as the remux.
+        wait_until_settled=False skips the check that the capture stopped growing.
+        """
+        fragments = fragments or [recorded_filename]
+        try:
+            if wait_until_settled:
+                # Wait a moment to ensure file is not being written to
+                time.sleep(3)
+                
+                # Check if file is still being written (multiple size checks)
+                sizes = []
+                for i in range(3):
+                    sizes.append(os.path.getsize(fragments[-1]))
+                    if i < 2:  # Don't sleep after last check
+                        time.sleep(2)
+                
+                # If file size is still changing, it's being written to
+                if len(set(sizes)) > 1:
+                    logging.warning(f"File {recorded_filename} still being written (sizes: {sizes}), skipping")
+                    return False
             
             # Additional check: ensure file isn't locked by another process
             try:
@@ -453,38 +4380,63 @@ class TwitchRecorder:
                     pass  # Just try to open, don't read
             except IOError as e:
                 logging.warning(f"File {recorded_filename} is locked or inaccessible: {e}")
-                return
+                return False
             
             if self.disable_ffmpeg:
+                # Without ffmpeg fragments cannot be joined; each is moved as it is, the oldest first
                 logging.info(f"Moving: {recorded_filename}")
-                shutil.move(recorded_filename, processed_filename)
+                self._migrate_file(recorded_filename, processed_filename)
                 self._clear_processing_attempts(recorded_filename)
+                self._clear_stream_id(recorded_filename)
             else:
                 # Double check we're still idle before starting ffmpeg
                 if self._active_recordings > 0:
                     logging.info(f"Stream recording started, postponing ffmpeg processing")
-                    return
+                    return False
                     
+                remux_target = self._remux_target(recorded_filename, processed_filename)
+                if not self._journal.claim("remux", recorded_filename,
+                                           target=remux_target, destination=processed_filename, fragments=fragments):
+                    logging.info(f"{recorded_filename} is being processed by another recorder process, skipping")
+                    return False
                 logging.info(f"Processing with ffmpeg: {recorded_filename}")
-                if self.ffmpeg_copy_and_fix_errors(recorded_filename, processed_filename):
-                    self._clear_processing_attempts(recorded_filename)
-                    try:
-                        os.remove(recorded_filename)
-                    except Exception as e:
-                        logging.error(f"Failed to remove {recorded_filename} after processing: {e}")
-                        # Continue anyway - processed file was created successfully
+                if self.ffmpeg_copy_and_fix_errors(recorded_filename, remux_target, fragments):
+                    if remux_target != processed_filename:
+                        self._migrate_file(remux_target, processed_filename)
+                    self._write_keyframe_index(processed_filename)
+                    self._journal.record("remux", "finished", recorded_filename)
+                    for fragment in fragments:
+                        self._clear_processing_attempts(fragment)
+                        self._clear_stream_id(fragment)
+                        try:
+                            os.remove(fragment)
+                        except Exception as e:
+                            logging.error(f"Failed to remove {fragment} after processing: {e}")
+                            # Continue anyway - processed file was created successfully
                 else:
                     logging.error(f"FFmpeg processing failed for {recorded_filename}")
-                    self._record_processing_failure(recorded_filename)
-                    return
+                    self._journal.record("remux", "failed", recorded_filename)
+                    for fragment in fragments:
+                        self._record_processing_failure(fragment)
+                    return False
             
             if self.upload_to_network_drive_enabled:
                 self.upload_to_network_drive(processed_filename)
+            return True
                 
         except Exception as e:
             logging.error(f"Error processing file {recorded_filename}: {e}")
             if os.path.exists(recorded_filename):
                 self._record_processing_failure(recorded_filename)
+            return False
+
+    def _remux_target(self, recorded_filename, processed_filename):
+        """Remux on scratch when the archive is another disk, so ffmpeg never writes to the archive"""
+        if self._same_filesystem(os.path.dirname(recorded_filename), os.path.dirname(processed_filename)):
+            return processed_filename
+        staging_dir = os.path.join(self.scratch_path, "processing")
+        os.makedirs(staging_dir, exist_ok=True)
+        return os.path.join(staging_dir, os.path.basename(processed_filename))
 
     def _processing_attempts_file(self, recorded_filename):
         return f"{recorded_filename}.attempts"
@@ -514,7 +4466,7 @@ class TwitchRecorder:
 
     def _quarantine_failed_recording(self, recorded_filename):
         username = Path(recorded_filename).parent.name
-        failed_dir = os.path.join(self.root_path, "failed", username)
+        failed_dir = os.path.join(self.archive_path, "failed", username)
         os.makedirs(failed_dir, exist_ok=True)
 
         destination = os.path.join(failed_dir, os.path.basename(recorded_filename))
@@ -523,8 +4475,9 @@ class TwitchRecorder:
             stem, ext = os.path.splitext(os.path.basename(recorded_filename))
             destination = os.path.join(failed_dir, f"{stem}.failed-{timestamp}{ext}")
 
-        shutil.move(recorded_filename, destination)
+        self._migrate_file(recorded_filename, destination)
         self._clear_processing_attempts(recorded_filename)
+        self._clear_stream_id(recorded_filename)
         logging.error(
             f"Quarantined recording after {self.max_processing_attempts} failed processing attempts: {destination}"
         )
@@ -538,36 +4491,208 @@ class TwitchRecorder:
         )
 
         if attempts >= self.max_processing_attempts:
+            if self.repair_enabled and not self.disable_ffmpeg:
+                # ffprobe may accept a file ffmpeg cannot remux, so repair without checking first
+                result = self._repair.repair(recorded_filename, check_first=False)
+                if result["status"] == "repaired" and not result["cached"]:
+                    logging.info(f"Repaired {recorded_filename}, processing it again")
+                    self._clear_processing_attempts(recorded_filename)
+                    return
             try:
                 self._quarantine_failed_recording(recorded_filename)
             except Exception as e:
                 logging.error(f"Failed to quarantine recording {recorded_filename}: {e}")
 
-    def ffmpeg_copy_and_fix_errors(self, recorded_filename, processed_filename):
-        """Remux recorded stream into a proper MP4 container (stream copy, no re-encoding)."""
+    def repair_recordings(self, usernames=None):
+        """Check and repair every recording in recorded/, in parallel; returns a count per status"""
+        recorded_root = os.path.join(self.scratch_path, "recorded")
+        if not usernames:
+            usernames = sorted(os.listdir(recorded_root)) if os.path.isdir(recorded_root) else []
+        paths = [
+            str(path) for username in usernames
+            for path in sorted(Path(recorded_root, username).glob("*.mp4"))
+            if time.time() - path.stat().st_mtime > 60  # Leave captures that are still being written
+        ]
+        logging.info(f"Checking {len(paths)} recording(s) with {self._repair.workers} worker(s)")
+        summary = collections.Counter()
+        for path, result in self._repair.repair_many(paths).items():
+            summary[("cached " if result["cached"] else "") + result["status"]] += 1
+        logging.info("Repair summary: " + ", ".join(f"{count} {status}" for status, count in sorted(summary.items())))
+        return summary
+
+    def _write_keyframe_index(self, processed_filename):
+        """Save the keyframe index sidecar for a processed file; failures only cost clip speed"""
+        if not self.keyframe_index_enabled:
+            return None
+        try:
+            index = KeyframeIndex.build(processed_filename)
+            index.save(processed_filename)
+            return index
+        except Exception as e:
+            logging.warning(f"Could not index keyframes of {processed_filename}: {e}")
+            return None
+
+    def extract_clip(self, source, start, end, output=None):
+        """Cut [start, end] seconds out of a processed file without re-encoding.
+
+        The cut is widened to keyframes (back to the one at or before start, on to
+        the one at or after end), so stream copy needs no decoding, and only that
+        byte range of the source is read ahead. Returns (output, clip start, clip end).
+        """
+        index = KeyframeIndex.load(source) or self._write_keyframe_index(source) or KeyframeIndex.build(source)
+        if not index.entries:
+            raise ValueError(f"No keyframes in {source}")
+        clip_start, start_offset = index.at_or_before(start)
+        following = index.at_or_after(end)
+        clip_end, end_offset = following if following else (None, os.path.getsize(source))
+        self.io_policy.prefetch_range(source, start_offset, end_offset - start_offset)
+
+        if output is None:
+            clips_dir = os.path.join(self.archive_path, "clips", Path(source).parent.name)
+            os.makedirs(clips_dir, exist_ok=True)
+            output = os.path.join(clips_dir, f"{Path(source).stem} - clip {int(clip_start)}-{int(clip_end or end)}.mp4")
+        command = [self.ffmpeg_path, "-hide_banner", "-loglevel", "error", "-ss", f"{clip_start:.3f}", "-i", source]
+        if clip_end is not None:
+            command += ["-t", f"{clip_end - clip_start:.3f}"]
+        command += ["-map", "0", "-c", "copy", "-avoid_negative_ts", "make_zero", "-movflags", "+faststart", "-y", output]
+        result = self._run_ffmpeg("clip", source, command, 600)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed cutting {source}: {result.stderr.strip()}")
+        until = f"{clip_end:.2f}s" if clip_end is not None else "the end"
+        logging.info(f"Clip {clip_start:.2f}s to {until} of {source} saved to {output}")
+        return output, clip_start, clip_end
+
+    def batch_process(self, usernames=None):
+        """Work through the whole backlog in this process: remux every recording, then compress.
+
+        Runs batch_workers jobs at a time. Finished work is already recorded on disk
+        (recordings are removed once remuxed, compressed files get a .compressed
+        marker, and the journal covers interrupted jobs), so a rerun resumes where
+        the last one stopped. Returns throughput per stage.
+        """
+        self._recover_from_journal()
+        recorded_root = os.path.join(self.scratch_path, "recorded")
+        processed_root = os.path.join(self.archive_path, "processed")
+        if not usernames:
+            usernames = sorted(set(
+                name for root in (recorded_root, processed_root) if os.path.isdir(root) for name in os.listdir(root)
+            ))
+
+        remux_jobs = []
+        for username in usernames:
+            recorded_path = os.path.join(recorded_root, username)
+            processed_path = os.path.join(processed_root, username)
+            if not os.path.isdir(recorded_path):
+                continue
+            os.makedirs(processed_path, exist_ok=True)
+            video_files = sorted(
+                f for f in os.listdir(recorded_path) if f.endswith('.mp4')
+                # Leave captures a running recorder is still writing
+                and time.time() - os.path.getmtime(os.path.join(recorded_path, f)) > 60
+            )
+            while video_files:
+                if self.disable_ffmpeg:
+                    fragments = [os.path.join(recorded_path, video_files[0])]
+                else:
+                    fragments = self._broadcast_fragments(recorded_path, video_files)
+                remux_jobs.append((fragments, os.path.join(processed_path, os.path.basename(fragments[0]))))
+                video_files = [f for f in video_files if os.path.join(recorded_path, f) not in fragments]
+
+        summary = {"remux": self._run_batch_stage(
+            "remux", remux_jobs,
+            lambda job: self.process_recorded_file(job[0][0], job[1], job[0], wait_until_settled=False),
+            lambda job: sum(os.path.getsize(fragment) for fragment in job[0])
+        )}
+        if self.idle_compress_enabled and not self.disable_ffmpeg:
+            compress_jobs = [
+                os.path.join(processed_root, username, filename) for username in usernames
+                if os.path.isdir(os.path.join(processed_root, username))
+                for filename in self._compress_candidates(os.path.join(processed_root, username))
+            ]
+            summary["compress"] = self._run_batch_stage("compress", compress_jobs, self.compress_file, os.path.getsize)
+        return summary
+
+    def _run_batch_stage(self, stage, jobs, work, job_bytes):
+        """Run one batch stage across the worker pool and log its throughput"""
+        if not jobs:
+            logging.info(f"Batch {stage}: nothing to do")
+            return {"files": 0, "failed": 0, "gigabytes": 0, "hours": 0}
+        logging.info(f"Batch {stage}: {len(jobs)} file(s) with {self.batch_workers} worker(s)")
+        sizes = {index: job_bytes(job) for index, job in enumerate(jobs)}
+        started = time.time()
+        done_bytes = 0
+        failed = 0
+        with ThreadPoolExecutor(max_workers=self.batch_workers, thread_name_prefix=f"batch-{stage}") as executor:
+            futures = {executor.submit(work, job): index for index, job in enumerate(jobs)}
+            for completed, future in enumerate(as_completed(futures), 1):
+                try:
+                    succeeded = future.result()
+                except Exception as e:
+                    logging.error(f"Batch {stage} job failed: {e}")
+                    succeeded = False
+                if succeeded:
+                    done_bytes += sizes[futures[future]]
+                else:
+                    failed += 1
+                logging.info(f"Batch {stage}: {completed}/{len(jobs)} done, {failed} failed")
+
+        hours = max(time.time() - started, 1e-6) / 3600
+        gigabytes = done_bytes / (1024 ** 3)
+        result = {"files": len(jobs) - failed, "failed": failed, "gigabytes": round(gigabytes, 2), "hours": round(hours, 3)}
+        logging.info(
+            f"{Fore.GREEN}Batch {stage}: {result['files']} file(s), {gigabytes:.2f}GB in {hours * 60:.1f} min "
+            f"({gigabytes / hours:.1f} GB/h, {result['files'] / hours:.1f} files/h), {failed} failed"
+        )
+        return result
+
+    def ffmpeg_copy_and_fix_errors(self, recorded_filename, processed_filename, fragments=None):
+        """Remux recorded stream into a proper MP4 container (stream copy, no re-encoding).
+
+        With several fragments, the concat demuxer joins them in the same pass.
+        """
+        fragments = fragments or [recorded_filename]
+        concat_list = None
         try:
-            file_size_gb = os.path.getsize(recorded_filename) / (1024**3)
-            timeout_seconds = self._calculate_ffmpeg_timeout(recorded_filename, file_size_gb)
+            file_size_gb = sum(os.path.getsize(fragment) for fragment in fragments) / (1024**3)
+            timeout_seconds = sum(
+                self._calculate_ffmpeg_timeout(fragment, os.path.getsize(fragment) / (1024**3))
+                for fragment in fragments
+            )
             
             logging.info(f"Processing {recorded_filename} ({file_size_gb:.2f}GB, timeout: {timeout_seconds}s)")
+            if len(fragments) > 1:
+                logging.info(f"Merging {len(fragments)} captures of the same broadcast")
+                concat_list = os.path.join(os.path.dirname(recorded_filename),
+                                           f".{os.path.basename(recorded_filename)}.concat")
+                with open(concat_list, "w") as file:
+                    for fragment in fragments:
+                        escaped = fragment.replace("'", "'\\''")
+                        file.write(f"file '{escaped}'\n")
+                input_args = ["-f", "concat", "-safe", "0", "-i", concat_list]
+            else:
+                input_args = ["-i", recorded_filename]
             
             # Stream copy: remux MPEG-TS into proper MP4 container without re-encoding
             # This is fast, preserves original quality, and produces player-compatible files
-            result = subprocess.run([
-                self.ffmpeg_path, 
-                "-err_detect", "ignore_err",
-                "-i", recorded_filename,
-                "-c", "copy",                # Copy all streams without re-encoding
-                "-movflags", "+faststart",   # Optimize for streaming/seeking
-                "-y",                        # Overwrite output file
-                processed_filename
-            ], capture_output=True, text=True, timeout=timeout_seconds)
+            with self._profiler.phase("ffmpeg_remux"):
+                result = self._run_ffmpeg("remux", recorded_filename, [
+                    self.ffmpeg_path, 
+                    "-err_detect", "ignore_err",
+                    *input_args,
+                    "-c", "copy",                # Copy all streams without re-encoding
+                    "-movflags", "+faststart",   # Optimize for streaming/seeking
+                    "-y",                        # Overwrite output file
+                    processed_filename
+                ], timeout_seconds)
+            for fragment in fragments:
+                self.io_policy.drop_cached_range(fragment)
 
             if result.returncode != 0:
                 logging.error(f"FFmpeg failed for {recorded_filename}")
                 logging.error(f"FFmpeg stderr: {result.stderr}")
                 logging.error(f"FFmpeg stdout: {result.stdout}")
                 return False
+            self.io_policy.finalize_file(processed_filename, trim=False)
             logging.info(f"Successfully processed: {recorded_filename}")
             return True
         except subprocess.TimeoutExpired:
@@ -576,6 +4701,31 @@ class TwitchRecorder:
         except Exception as e:
             logging.error(f"FFmpeg error: {e}")
             return False
+        finally:
+            if concat_list and os.path.exists(concat_list):
+                os.remove(concat_list)
+
+    def _run_ffmpeg(self, kind, input_filename, command, timeout_seconds):
+        """Run an ffmpeg job at its stage's I/O priority with its resource use accounted.
+
+        Like subprocess.run(capture_output=True, text=True, timeout=...), but through
+        Popen so the child's pid is known while it runs.
+        """
+        process = subprocess.Popen(
+            self.io_policy.command(kind, command), stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        )
+        self._accountant.track(process.pid, kind, Path(input_filename).parent.name)
+        self._running_jobs[process.pid] = {"kind": kind, "file": os.path.basename(input_filename), "started_at": time.time()}
+        try:
+            stdout, stderr = process.communicate(timeout=timeout_seconds)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise
+        finally:
+            self._accountant.untrack(process.pid)
+            self._running_jobs.pop(process.pid, None)
+        return subprocess.CompletedProcess(process.args, process.returncode, stdout, stderr)
 
     def compress_processed_file(self, processed_path):
         """Compress ONE processed file per call using H.264 re-encoding to save space.
@@ -584,19 +4734,26 @@ class TwitchRecorder:
         Only runs when the system is idle (no active recordings).
         """
         try:
-            video_files = [f for f in os.listdir(processed_path)
-                          if os.path.isfile(os.path.join(processed_path, f))
-                          and f.endswith('.mp4')
-                          and not os.path.exists(os.path.join(processed_path, f + '.compressed'))]
-            
-            if not video_files:
-                return
-            
-            filename = video_files[0]
-            source = os.path.join(processed_path, filename)
-            temp_output = source + '.compressing'
+            video_files = self._compress_candidates(processed_path)
+            if video_files:
+                self.compress_file(os.path.join(processed_path, video_files[0]))
+        except Exception as e:
+            logging.error(f"Idle compress error: {e}")
+
+    def _compress_candidates(self, processed_path):
+        return sorted(f for f in os.listdir(processed_path)
+                      if os.path.isfile(os.path.join(processed_path, f))
+                      and f.endswith('.mp4')
+                      and not os.path.exists(os.path.join(processed_path, f + '.compressed')))
+
+    def compress_file(self, source):
+        """Compress one processed file in place; returns True once it is marked as done"""
+        journaled_source = None
+        outcome = "failed"
+        filename = os.path.basename(source)
+        temp_output = source + '.compressing'
+        try:
             marker = source + '.compressed'
-            
             file_size_gb = os.path.getsize(source) / (1024**3)
             timeout_seconds = self._calculate_ffmpeg_timeout(source, file_size_gb)
             
@@ -605,26 +4762,32 @@ class TwitchRecorder:
             # Bail out if a recording starts
             if self._active_recordings > 0:
                 logging.info("Recording started, postponing idle compression")
-                return
+                return False
+            if not self._journal.claim("compress", source, target=temp_output):
+                logging.info(f"{filename} is being compressed by another recorder process, skipping")
+                return False
             
-            result = subprocess.run([
-                self.ffmpeg_path,
-                "-i", source,
-                "-c:v", "libx264",
-                "-crf", str(self.idle_compress_crf),
-                "-preset", self.idle_compress_preset,
-                "-c:a", "aac",
-                "-b:a", self.idle_compress_audio_bitrate,
-                "-movflags", "+faststart",
-                "-y",
-                temp_output
-            ], capture_output=True, text=True, timeout=timeout_seconds)
+            journaled_source = source
+            with self._profiler.phase("ffmpeg_compress"):
+                result = self._run_ffmpeg("compress", source, [
+                    self.ffmpeg_path,
+                    "-i", source,
+                    "-c:v", "libx264",
+                    "-crf", str(self.idle_compress_crf),
+                    "-preset", self.idle_compress_preset,
+                    "-c:a", "aac",
+                    "-b:a", self.idle_compress_audio_bitrate,
+                    "-movflags", "+faststart",
+                    "-y",
+                    temp_output
+                ], timeout_seconds)
+            self.io_policy.drop_cached_range(source)
             
             if result.returncode != 0:
                 logging.error(f"Idle compress failed for {filename}: {result.stderr}")
                 if os.path.exists(temp_output):
                     os.remove(temp_output)
-                return
+                return False
             
             # Verify compressed file is valid and smaller
             if os.path.exists(temp_output) and os.path.getsize(temp_output) > 0:
@@ -633,10 +4796,14 @@ class TwitchRecorder:
                 savings = (1 - compressed_size / original_size) * 100 if original_size > 0 else 0
                 
                 if compressed_size < original_size:
+                    self.io_policy.finalize_file(temp_output, trim=False)
+                    # From here a crash is finished forward: recovery completes the replace and the marker
+                    self._journal.record("compress", "committing", source, target=temp_output, savings=round(savings, 1))
                     os.replace(temp_output, source)
                     # Mark as compressed so we don't re-process
                     with open(marker, 'w') as f:
                         f.write(f"compressed {datetime.datetime.now().isoformat()} savings={savings:.1f}%")
+                    self._write_keyframe_index(source)  # Re-encoding moved every keyframe
                     logging.info(f"Compressed {filename}: {original_size/(1024**2):.1f}MB -> {compressed_size/(1024**2):.1f}MB ({savings:.1f}% saved)")
                 else:
                     os.remove(temp_output)
@@ -644,16 +4811,21 @@ class TwitchRecorder:
                     with open(marker, 'w') as f:
                         f.write(f"skipped {datetime.datetime.now().isoformat()} already-small")
                     logging.info(f"Skipped compressing {filename} (already efficient)")
+                outcome = "finished"
             else:
                 if os.path.exists(temp_output):
                     os.remove(temp_output)
                     
         except subprocess.TimeoutExpired:
-            logging.error(f"Idle compress timeout for {processed_path}")
+            logging.error(f"Idle compress timeout for {source}")
             if os.path.exists(temp_output):
                 os.remove(temp_output)
         except Exception as e:
             logging.error(f"Idle compress error: {e}")
+        finally:
+            if journaled_source:
+                self._journal.record("compress", outcome, journaled_source)
+        return outcome == "finished"
 
     def _probe_media_duration_seconds(self, filename):
         """Get media duration in seconds using ffprobe when available."""
@@ -694,21 +4866,54 @@ class TwitchRecorder:
         )
         return timeout_seconds
 
-    def check_user(self, username):
+    def _helix_get(self, url, headers, priority):
+        """GET a Helix URL through the rate limiter, retrying 429s with jittered backoff.
+
+        Returns None if no request slot came up within one refresh interval or the
+        retries ran out.
+        """
+        if not self.helix_rate_limit_enabled:
+            with self._profiler.phase("helix_request"):
+                return requests.get(url, headers=headers, timeout=15)
+
+        for attempt in range(self.helix_max_retries + 1):
+            if not self._rate_limiter.acquire(priority, timeout=self.refresh):
+                return None
+            response = None
+            try:
+                with self._profiler.phase("helix_request"):
+                    response = requests.get(url, headers=headers, timeout=15)
+            finally:
+                self._rate_limiter.record_response(response)
+            if response.status_code != 429:
+                return response
+            delay = self._rate_limiter.backoff(attempt)
+            logging.warning(f"Helix returned 429, retrying in {delay:.1f}s (attempt {attempt + 1})")
+            if self._shutdown_event.wait(timeout=delay):
+                break
+        return None
+
+    def check_user(self, username, priority=1):
         """Check if user is streaming with token refresh"""
-        # Proactively refresh token if needed
-        self.fetch_access_token()
+        # Without the background refresher, refresh proactively here
+        if not self._token_refresher_running:
+            self.fetch_access_token()
         
-        headers = {"Client-ID": self.client_id, "Authorization": f"Bearer {self.access_token}"}
+        access_token = self.access_token
+        headers = {"Client-ID": self.client_id, "Authorization": f"Bearer {access_token}"}
+        url = f"{self.url}?user_login={username}"
         try:
-            response = requests.get(f"{self.url}?user_login={username}", headers=headers, timeout=15)
+            response = self._helix_get(url, headers, priority)
             
-            if response.status_code == 401:
+            if response is not None and response.status_code == 401:
                 # Try refreshing token once
+                self.invalidate_access_token(access_token)
                 self.fetch_access_token()
                 headers["Authorization"] = f"Bearer {self.access_token}"
-                response = requests.get(f"{self.url}?user_login={username}", headers=headers, timeout=15)
+                response = self._helix_get(url, headers, priority)
             
+            if response is None:
+                return TwitchResponseStatus.RATE_LIMITED, None
             response.raise_for_status()
             info = response.json()
             # Validate response has expected structure
@@ -741,7 +4946,7 @@ class TwitchRecorder:
                 os.makedirs(dest_dir, exist_ok=True)
             
             # Copy file
-            shutil.copy2(processed_filename, destination)
+            self.io_policy.copy_file(processed_filename, destination)
             
             # Verify upload
             if os.path.exists(destination):
@@ -757,80 +4962,192 @@ class TwitchRecorder:
         except Exception as e:
             logging.error(f"Failed to upload to network drive: {e}")
 
-    def record_stream(self, username, info, recorded_path, processed_path):
-        """Record a stream with proper process management"""
+    def record_stream(self, username, info, recorded_path, processed_path, quality=None):
+        """Record a stream with proper process management.
+
+        The caller holds the recording slot. If change_capture_quality() is called
+        while the capture runs, it is restarted at that quality in a new file.
+        """
         try:
-            self._increment_recordings()
-            
             channel = info["data"][0]
-            timestamp = datetime.datetime.now().strftime('%Y-%m-%d %Hh%Mm%Ss')
             title = channel.get('title', 'Unknown')
             # Sanitize filename
             safe_title = "".join(c for c in title if c.isalnum() or c in [" ", "-", "_"])[:100].strip()
             # Ensure we have a valid title (fallback if all characters were stripped)
             if not safe_title:
                 safe_title = "stream"
-            filename = f"{username} - {timestamp} - {safe_title}.mp4"
-            
-            recorded_filename = os.path.join(recorded_path, filename)
-            processed_filename = os.path.join(processed_path, filename)
-
+            quality = quality or self.quality
             logging.info(f"{Fore.GREEN}{username} online, starting recording")
 
-            # Start streamlink process
-            streamlink_cmd = [
-                "streamlink", "--twitch-disable-ads", "--retry-streams", "5",
-                f"twitch.tv/{username}", self.quality, "-o", recorded_filename
-            ]
-            
-            # Use DEVNULL to prevent buffer overflow from unread pipes
-            streamlink_process = subprocess.Popen(
-                streamlink_cmd, 
-                stdout=subprocess.DEVNULL, 
-                stderr=subprocess.DEVNULL
+            while True:
+                timestamp = datetime.datetime.now().strftime('%Y-%m-%d %Hh%Mm%Ss')
+                filename = f"{username} - {timestamp} - {safe_title}.mp4"
+                recorded_filename = os.path.join(recorded_path, filename)
+
+                if channel.get("id"):
+                    # Lets fragments of this broadcast (at the same quality) be merged once it ends
+                    with open(self._stream_id_file(recorded_filename), "w") as file:
+                        file.write(f"{channel['id']}\n{quality}\n")
+
+                with self._profiler.phase("process_spawn"):
+                    streamlink_process = self._start_capture(
+                        username, recorded_filename, self._quality_argument(username, quality)
+                    )
+                self._capture_qualities[username] = quality
+                self._journal.record("recording", "started", recorded_filename)
+                if self.handoff_enabled and streamlink_process.pid:
+                    self._handoff_registry.add(username, streamlink_process.pid, recorded_filename, quality)
+
+                self._follow_recording(username, streamlink_process, recorded_filename)
+
+                quality = self._quality_changes.pop(username, None)
+                if quality is None or self._shutdown_event.is_set():
+                    break
+                logging.info(f"Restarting recording of {username} at {quality}")
+
+        except Exception as e:
+            logging.error(f"Error recording {username}: {e}")
+        finally:
+            self._capture_qualities.pop(username, None)
+            self._quality_changes.pop(username, None)
+
+    def _follow_recording(self, username, streamlink_process, recorded_filename, started_at=None):
+        """Monitor a running capture until it ends, then leave the file for idle processing"""
+        # Store process for cleanup (with proper lock)
+        with self._recording_processes_lock:
+            self._recording_processes[username] = streamlink_process
+        if streamlink_process.pid:
+            self._accountant.track(
+                streamlink_process.pid, "capture", username, self._capture_qualities.get(username, self.quality)
             )
-            
-            # Store process for cleanup (with proper lock)
+        stats = {
+            "file": os.path.basename(recorded_filename), "started_at": started_at or time.time(), "bytes": 0,
+            "mbps": 0.0, "quality": self._capture_qualities.get(username, self.quality),
+        }
+        self._recording_stats[username] = stats
+
+        # Monitor recording with improved progress tracking
+        try:
+            self._monitor_recording(
+                streamlink_process, recorded_filename, os.path.basename(recorded_filename), started_at, stats
+            )
+        finally:
+            # Always clean up process reference even if monitoring fails
             with self._recording_processes_lock:
-                self._recording_processes[username] = streamlink_process
+                self._recording_processes.pop(username, None)
+            self._recording_stats.pop(username, None)
+            if streamlink_process.pid:
+                self._accountant.untrack(streamlink_process.pid)
+            
+            if self._handing_off(streamlink_process) and streamlink_process.poll() is None:
+                logging.info(f"Handing off recording of {username} (pid {streamlink_process.pid})")
+                return
 
-            # Monitor recording with improved progress tracking
-            try:
-                self._monitor_recording(streamlink_process, recorded_filename, filename)
-            finally:
-                # Always clean up process reference even if monitoring fails
-                with self._recording_processes_lock:
-                    self._recording_processes.pop(username, None)
-                
-                # Ensure process is terminated if still running
-                if streamlink_process.poll() is None:
-                    logging.warning(f"Streamlink process still running for {username}, terminating")
-                    try:
-                        streamlink_process.terminate()
-                        streamlink_process.wait(timeout=5)
-                    except:
-                        streamlink_process.kill()
-
-            # Don't process immediately - let it happen during idle time in main loop
-            if os.path.exists(recorded_filename) and os.path.getsize(recorded_filename) > 0:
-                logging.info(f"Recording completed for {username}, will process when idle")
-            else:
-                logging.warning(f"Recording file for {username} not found or empty")
+            # Ensure process is terminated if still running
+            if streamlink_process.poll() is None:
+                logging.warning(f"Streamlink process still running for {username}, terminating")
+                try:
+                    streamlink_process.terminate()
+                    streamlink_process.wait(timeout=5)
+                except:
+                    streamlink_process.kill()
+            self._handoff_registry.remove(username)
+            self._journal.record("recording", "finished", recorded_filename)
+
+        # Don't process immediately - let it happen during idle time in main loop
+        if os.path.exists(recorded_filename) and os.path.getsize(recorded_filename) > 0:
+            logging.info(f"Recording completed for {username}, will process when idle")
+        else:
+            logging.warning(f"Recording file for {username} not found or empty")
+
+    def _adopt_recordings(self):
+        """Resume monitoring captures a previous instance handed off"""
+        for username, entry in self._handoff_registry.entries().items():
+            process = AdoptedProcess.adopt(entry)
+            if process is None:
+                logging.info(f"Handed-off recording of {username} ended while restarting, will process when idle")
+                self._handoff_registry.remove(username)
+                continue
+            if self._cluster and not self._cluster.adopt(username):
+                # Another node holds the channel now; keeping the capture would record it twice
+                logging.warning(f"Cluster: {username} is leased elsewhere, stopping its handed-off recording")
+                process.terminate()
+                self._handoff_registry.remove(username)
+                continue
+            logging.info(f"{Fore.GREEN}Re-adopted recording of {username} (pid {process.pid})")
+            with self._busy_users_lock:
+                self._busy_users.add(username)
+            self._increment_recordings()
+            self._capture_qualities[username] = entry.get("quality", self.quality)
+            self._adopted_captures.add(username)
+            threading.Thread(
+                target=self._resume_recording, args=(username, process, entry["filename"], entry.get("started_at")),
+                name=f"adopted-{username}", daemon=True
+            ).start()
 
+    def _resume_recording(self, username, process, recorded_filename, started_at):
+        try:
+            self._follow_recording(username, process, recorded_filename, started_at)
         except Exception as e:
-            logging.error(f"Error recording {username}: {e}")
+            logging.error(f"Error following adopted recording of {username}: {e}")
         finally:
             self._decrement_recordings()
+            self._capture_qualities.pop(username, None)
+            self._adopted_captures.discard(username)
+            with self._busy_users_lock:
+                self._busy_users.discard(username)
+
+    def _start_capture(self, username, recorded_filename, quality=None):
+        """Start capturing a stream; both backends return a Popen-like object"""
+        quality = quality or self.quality
+        if self.capture_backend == "library":
+            return StreamlinkCapture(
+                username, quality, recorded_filename, retry_streams=5,
+                write_buffer_bytes=self.io_policy.write_buffer_bytes
+            )
+        if self.capture_backend == "hls":
+            return HLSCapture(
+                username, quality, recorded_filename, master_url=self.hls_master_url,
+                prefetch=self.hls_prefetch_segments, write_buffer_bytes=self.hls_write_buffer_bytes,
+                retry_streams=5, max_connections_per_host=self.hls_max_connections_per_host
+            )
+
+        streamlink_cmd = [
+            self.streamlink_path, "--twitch-disable-ads", "--retry-streams", "5",
+            f"twitch.tv/{username}", quality, "-o", recorded_filename
+        ]
+        # Use DEVNULL to prevent buffer overflow from unread pipes. With handoff, a session of
+        # its own keeps the capture out of signals sent to the recorder's process group
+        return subprocess.Popen(
+            self.io_policy.command("capture", streamlink_cmd), 
+            stdout=subprocess.DEVNULL, 
+            stderr=subprocess.DEVNULL,
+            start_new_session=self.handoff_enabled
+        )
+
+    def _progress(self, display_name):
+        """A tqdm bar on a terminal, periodic log lines otherwise"""
+        mode = self.progress_mode
+        if mode == "auto":
+            mode = "bar" if sys.stdout.isatty() else "log"
+        if mode == "bar":
+            return tqdm(total=0, unit='B', unit_scale=True, desc=display_name[:50], ncols=100)
+        return _ProgressLog(display_name, self.progress_log_interval if mode == "log" else 0)
 
-    def _monitor_recording(self, process, filename, display_name):
-        """Monitor recording process with better progress display and timeout"""
+    def _monitor_recording(self, process, filename, display_name, start_time=None, stats=None):
+        """Monitor recording process with better progress display and timeout.
+
+        stats, if given, is kept up to date with the file size and ingest rate for the dashboard.
+        """
         try:
             # Maximum recording time: 12 hours (configurable safety limit)
             max_recording_time = 12 * 3600
-            start_time = time.time()
+            start_time = start_time or time.time()
             
-            with tqdm(total=0, unit='B', unit_scale=True, desc=display_name[:50], ncols=100) as pbar:
+            recording_io = self.io_policy.track(filename)
+            with self._progress(display_name) as pbar:
                 last_size = 0
+                stats_at = None
                 stalled_count = 0
                 file_check_failures = 0
                 
@@ -842,6 +5159,8 @@ class TwitchRecorder:
                         break
                     
                     if self._shutdown_event.is_set():
+                        if self._handing_off(process):
+                            return  # Left running for the next instance
                         logging.info(f"Shutdown requested, stopping recording for {display_name}")
                         process.terminate()
                         break
@@ -849,17 +5168,29 @@ class TwitchRecorder:
                     try:
                         if os.path.exists(filename):
                             current_size = os.path.getsize(filename)
+                            if stats is not None:
+                                now = time.monotonic()
+                                if stats_at is not None:
+                                    growth = max(0, current_size - stats["bytes"])
+                                    stats["mbps"] = growth * 8 / max(now - stats_at, 1e-3) / 1e6
+                                stats["bytes"], stats_at = current_size, now
                             if current_size > last_size:
                                 pbar.total = current_size
                                 pbar.n = current_size
                                 pbar.refresh()
                                 last_size = current_size
+                                recording_io.update(current_size)
                                 stalled_count = 0
                                 file_check_failures = 0
                             else:
                                 stalled_count += 1
                                 if stalled_count > 12:  # 1 minute of no growth
                                     logging.warning(f"Recording appears stalled for {display_name}")
+                                    if self.ingress_budget_mbps and self._ingress_mbps() > self.ingress_budget_mbps * self.ingress_headroom_fraction:
+                                        logging.warning(
+                                            f"Ingress is {self._ingress_mbps():.1f} of {self.ingress_budget_mbps} Mbps, "
+                                            f"the link may be saturated"
+                                        )
                                     stalled_count = 0  # Reset to avoid spam
                         else:
                             file_check_failures += 1
@@ -874,6 +5205,7 @@ class TwitchRecorder:
                 # Final update
                 try:
                     if os.path.exists(filename):
+                        recording_io.finish()
                         final_size = os.path.getsize(filename)
                         pbar.total = final_size
                         pbar.n = final_size
@@ -885,52 +5217,410 @@ class TwitchRecorder:
         except Exception as e:
             logging.error(f"Error monitoring recording: {e}")
 
+def parse_timestamp(value):
+    """Seconds from a plain number of seconds, "M:SS" or "H:MM:SS(.fff)"."""
+    seconds = 0.0
+    for part in value.split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def config_file_path():
+    """config/config.json, falling back to config.json"""
+    return "config/config.json" if os.path.exists("config/config.json") else "config.json"
+
+
+class CompressingLogHandler(logging.handlers.TimedRotatingFileHandler):
+    """Log file rotated at midnight or once it reaches max_bytes.
+
+    Rotated files are named <log>.<YYYYmmdd-HHMMSS>, gzipped in a background
+    thread, and the oldest are removed beyond backup_count.
+    """
+
+    def __init__(self, filename, max_bytes=0, backup_count=14, compress=True):
+        super().__init__(filename, when="midnight", backupCount=backup_count, encoding="utf-8", delay=True)
+        self.max_bytes = max_bytes
+        self.compress = compress
+
+    def shouldRollover(self, record):
+        if super().shouldRollover(record):
+            return True
+        return bool(self.max_bytes and self.stream is not None and self.stream.tell() >= self.max_bytes)
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+            rotated = f"{self.baseFilename}.{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}"
+            suffix = 1
+            while os.path.exists(rotated) or os.path.exists(f"{rotated}.gz"):
+                rotated = f"{self.baseFilename}.{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}-{suffix}"
+                suffix += 1
+            os.replace(self.baseFilename, rotated)
+            if self.compress:
+                threading.Thread(target=self._compress, args=(rotated,), name="log-compress", daemon=True).start()
+        self._remove_old_logs()
+        self.rolloverAt = self.computeRollover(int(time.time()))
+
+    @staticmethod
+    def _compress(rotated):
+        try:
+            with open(rotated, "rb") as source, gzip.open(f"{rotated}.gz.tmp", "wb") as target:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+            os.replace(f"{rotated}.gz.tmp", f"{rotated}.gz")
+            os.remove(rotated)
+        except FileNotFoundError:
+            pass  # Pruned before it was compressed
+        except OSError as e:
+            print(f"Could not compress {rotated}: {e}", file=sys.stderr)
+
+    def _remove_old_logs(self):
+        if self.backupCount <= 0:
+            return
+        prefix = os.path.basename(self.baseFilename) + "."
+        directory = os.path.dirname(self.baseFilename)
+        # A file still being compressed exists with and without .gz; count it once
+        rotated = sorted({
+            name[:-3] if name.endswith(".gz") else name
+            for name in os.listdir(directory) if name.startswith(prefix) and not name.endswith(".tmp")
+        })
+        for name in rotated[:-self.backupCount]:
+            for path in (os.path.join(directory, name), os.path.join(directory, f"{name}.gz")):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+class JsonLogFormatter(logging.Formatter):
+    """One JSON object per line, without the terminal colour codes"""
+
+    ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;]*m")
+
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "thread": record.threadName,
+            # The queue handler has already folded any traceback into the message
+            "message": self.ANSI_ESCAPE.sub("", record.getMessage()),
+        }
+        return json.dumps(entry)
+
+
 def setup_logging():
-    """Setup logging with proper configuration"""
-    # Create logs directory if it doesn't exist
-    os.makedirs("logs", exist_ok=True)
-    
-    # Setup file handler with rotation
-    log_filename = f"logs/twitch-recorder-{datetime.datetime.now().strftime('%Y%m%d')}.log"
-    
-    # Configure logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_filename),
-            logging.StreamHandler(sys.stdout)
-        ]
+    """Log through a queue, so threads only enqueue records and one listener thread does the I/O.
+
+    Settings come from the config file; a missing or broken one leaves the
+    defaults in place and is reported once the recorder reads it.
+    """
+    try:
+        with open(config_file_path(), "r") as config_file:
+            options = json.load(config_file)
+    except (OSError, ValueError):
+        options = {}
+    log_dir = options.get("log_dir", "logs")
+    os.makedirs(log_dir, exist_ok=True)
+
+    if options.get("log_format", "text") == "json":
+        formatter = JsonLogFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    file_handler = CompressingLogHandler(
+        os.path.join(log_dir, "twitch-recorder.log"),
+        max_bytes=int(options.get("log_max_mb", 50) * 1024 * 1024),
+        backup_count=options.get("log_backup_count", 14),
+        compress=options.get("log_compress", True),
     )
+    handlers = [file_handler]
+    if options.get("log_console", True):
+        handlers.append(logging.StreamHandler(sys.stdout))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)  # Drains the queue before exit
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(logging.INFO)
+
+
+def _format_bytes(size):
+    for unit in ("B", "K", "M", "G"):
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}T"
+
+
+def _format_duration(seconds):
+    seconds = int(max(0, seconds))
+    if seconds >= 86400:
+        return f"{seconds // 86400}d{seconds % 86400 // 3600}h"
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class Dashboard:
+    """Curses view of a running recorder, fed by the updates its state socket pushes.
+
+    It redraws when an update arrives or a key is pressed and never looks at
+    processes, logs or disks itself. Keys: q quits, p toggles profiling.
+    """
+
+    RETRY_SECONDS = 2
+    STATE_COLORS = {"recording": 1, "live": 1, "offline": 2, "unchecked": 2, "rate_limited": 2}
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self.state = None
+        self.error = None
+        self._socket = None
+        self._buffer = b""
+        self._selector = selectors.DefaultSelector()
+
+    def run(self):
+        curses.wrapper(self._main)
+
+    def _connect(self):
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            client.connect(self.socket_path)
+        except OSError as e:
+            client.close()
+            self.error = f"Recorder not reachable at {self.socket_path} ({e.strerror or e}), retrying"
+            return
+        self._socket = client
+        self._buffer = b""
+        self.error = None
+        self._selector.register(client, selectors.EVENT_READ)
+
+    def _disconnect(self, reason):
+        self._selector.unregister(self._socket)
+        self._socket.close()
+        self._socket = None
+        self.error = reason
+
+    def _receive(self):
+        try:
+            data = self._socket.recv(65536)
+        except OSError:
+            data = b""
+        if not data:
+            self._disconnect("Recorder stopped, reconnecting")
+            return
+        *lines, self._buffer = (self._buffer + data).split(b"\n")
+        if lines:
+            try:
+                self.state = json.loads(lines[-1])  # Older updates are already stale
+            except ValueError:
+                pass
+
+    def _main(self, screen):
+        try:
+            curses.curs_set(0)
+        except curses.error:
+            pass
+        if curses.has_colors():
+            curses.use_default_colors()
+            for pair, color in enumerate((curses.COLOR_GREEN, curses.COLOR_YELLOW, curses.COLOR_RED, curses.COLOR_CYAN), 1):
+                curses.init_pair(pair, color, -1)
+        screen.nodelay(True)
+        self._selector.register(sys.stdin, selectors.EVENT_READ)
+        while True:
+            if self._socket is None:
+                self._connect()
+            self._draw(screen)
+            # The timeout only keeps the clock and retries going; updates and keys wake it up
+            for key, _ in self._selector.select(1.0 if self._socket else self.RETRY_SECONDS):
+                if key.fileobj is self._socket:
+                    self._receive()
+            while True:
+                key = screen.getch()
+                if key == -1:
+                    break
+                if key in (ord("q"), ord("Q"), 27):
+                    return
+                if key in (ord("p"), ord("P")) and self._socket:
+                    try:
+                        self._socket.sendall(b"profile\n")
+                    except OSError:
+                        self._disconnect("Recorder stopped, reconnecting")
+
+    def _draw(self, screen):
+        screen.erase()
+        height, width = screen.getmaxyx()
+        row = 0
+
+        def line(text="", attr=0, column=0):
+            nonlocal row
+            if row < height - 1 and column < width:
+                try:
+                    screen.addnstr(row, column, text, width - column - 1, attr)
+                except curses.error:
+                    pass
+            row += 1
+
+        def color(pair):
+            return curses.color_pair(pair) if curses.has_colors() else 0
+
+        state = self.state
+        now = time.time()
+        header = " TWITCH RECORDER"
+        if state:
+            header += f"   pid {state['pid']}   up {_format_duration(state['uptime'])}"
+            if state.get("node"):
+                header += f"   node {state['node']}"
+        line(header.ljust(width - 9) + time.strftime("%H:%M:%S"), curses.A_BOLD | color(4))
+        if not state:
+            line()
+            line(f" {self.error or 'Waiting for the first update'}", color(3))
+            self._footer(screen, height, width)
+            screen.refresh()
+            return
+        system = state["system"]
+        summary = (
+            f" Recordings {state['recordings']['active']}/{state['recordings']['max']}   "
+            f"Ingest {system['ingest_mbps']:.1f} Mbps"
+            + (f" (link {system['ingress_mbps']:.1f}/{system['ingress_budget_mbps']} Mbps)" if system.get("ingress_budget_mbps") else "")
+            + f"   CPU {system['cpu_percent']:.0f}%   "
+            f"Mem {system['memory_percent']:.0f}%"
+        )
+        if system.get("load"):
+            summary += "   Load " + " ".join(f"{value:.2f}" for value in system["load"])
+        line(summary)
+        if state.get("profiling"):
+            line(" Profiling is on", color(2))
+        line()
+
+        line(" CAPTURES", curses.A_BOLD)
+        if not state["captures"]:
+            line("   none", curses.A_DIM)
+        for capture in state["captures"]:
+            line(
+                f"   {capture['channel']:<20} {_format_duration(now - capture['started_at']):>9}  "
+                f"{_format_bytes(capture['bytes']):>7}  {capture['mbps']:>5.1f} Mbps  {capture['quality']:<8} "
+                f"{capture['file']}",
+                color(1)
+            )
+        line()
+
+        line(" CHANNELS", curses.A_BOLD)
+        for channel in state["channels"]:
+            detail = ""
+            if channel["state"] not in ("recording", "live") and channel.get("next_check_at"):
+                detail = f"next check in {_format_duration(channel['next_check_at'] - now)}"
+            elif channel.get("checked_at"):
+                detail = f"checked {_format_duration(now - channel['checked_at'])} ago"
+            if not channel.get("leased", True):
+                detail = "held by another node"
+            line(
+                f"   {channel['name']:<20} {channel['state']:<12} {detail}",
+                color(self.STATE_COLORS.get(channel["state"], 3))
+            )
+        line()
+
+        line(" JOBS", curses.A_BOLD)
+        if not state["jobs"]:
+            line("   idle", curses.A_DIM)
+        for job in state["jobs"]:
+            cpu = f"cpu {job['cpu_percent']:.0f}%" if job.get("cpu_percent") is not None else ""
+            line(f"   {job['kind']:<10} {_format_duration(now - job['started_at']):>9}  {cpu:<9} {job['file']}")
+        queues = state["queues"]
+        waiting = f"   waiting: remux {queues['remux']}"
+        if queues.get("compress") is not None:
+            waiting += f", compress {queues['compress']}"
+        line(waiting)
+        line()
+
+        line(" STORAGE", curses.A_BOLD)
+        for tier in state["storage"]:
+            used = tier["used"] / tier["total"] if tier["total"] else 0
+            filled = int(used * 20)
+            line(
+                f"   {tier['tier']:<8} [{'#' * filled}{'-' * (20 - filled)}] {used * 100:3.0f}%  "
+                f"{_format_bytes(tier['free'])} free of {_format_bytes(tier['total'])}  {tier['path']}",
+                color(3) if used > 0.9 else 0
+            )
+
+        if self.error:
+            line()
+            line(f" {self.error}", color(3))
+        self._footer(screen, height, width)
+        screen.refresh()
+
+    def _footer(self, screen, height, width):
+        try:
+            screen.addnstr(height - 1, 0, " q quit   p toggle profiling", width - 1, curses.A_DIM)
+        except curses.error:
+            pass
+
+
+def run_dashboard(argv):
+    """twitch-recorder.py dashboard [socket]: the socket defaults to the one in the config"""
+    if argv:
+        path = argv[0]
+    else:
+        try:
+            with open(config_file_path(), "r") as config_file:
+                path = state_socket_path(json.load(config_file))
+        except (OSError, ValueError):
+            path = state_socket_path({})
+    if not hasattr(socket, "AF_UNIX"):
+        print("The dashboard needs Unix domain sockets, which this platform does not have")
+        return 1
+    try:
+        Dashboard(path).run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
 
 def main(argv):
+    if argv[:1] == ["dashboard"]:
+        # A client of the running recorder; it must not write to the recorder's log
+        sys.exit(run_dashboard(argv[1:]))
     setup_logging()
-    
-    try:
-        twitch_recorder = TwitchRecorder()
-    except SystemExit:
-        return
-    except Exception as e:
-        logging.error(f"Failed to initialize TwitchRecorder: {e}")
-        return
 
-    usage_message = "twitch-recorder.py -u <usernames> -q <quality>"
+    usage_message = (
+        "twitch-recorder.py -u <usernames> -q <quality> | --repair [channel ...] | --batch-process [channel ...]"
+        " | --clip <file> <start> <end> [output] | dashboard [socket]"
+    )
 
     try:
-        opts, args = getopt.getopt(argv, "hu:q:l:", ["usernames=", "quality=", "log=", "logging=", "disable-ffmpeg"])
+        opts, args = getopt.getopt(argv, "hu:q:l:", ["usernames=", "quality=", "log=", "logging=", "disable-ffmpeg", "repair", "batch-process", "clip"])
     except getopt.GetoptError:
         print(usage_message)
         sys.exit(2)
+    repair_only = any(opt == "--repair" for opt, _ in opts)
+    batch_only = any(opt == "--batch-process" for opt, _ in opts)
+    clip_only = any(opt == "--clip" for opt, _ in opts)
+    if clip_only and len(args) not in (3, 4):
+        print(usage_message)
+        sys.exit(2)
+
+    try:
+        twitch_recorder = TwitchRecorder(maintenance=repair_only or batch_only or clip_only)
+    except SystemExit:
+        return
+    except Exception as e:
+        logging.error(f"Failed to initialize TwitchRecorder: {e}")
+        return
         
     for opt, arg in opts:
         if opt == "-h":
             print(usage_message)
             sys.exit()
         elif opt in ("-u", "--usernames"):
-            twitch_recorder.usernames = [username.strip() for username in arg.split(",")]
+            twitch_recorder.set_override("usernames", [username.strip() for username in arg.split(",")])
             logging.info(f"Usernames set to: {twitch_recorder.usernames}")
         elif opt in ("-q", "--quality"):
-            twitch_recorder.quality = arg
+            twitch_recorder.set_override("quality", arg)
             logging.info(f"Quality set to: {arg}")
         elif opt in ("-l", "--log", "--logging"):
             logging_level = getattr(logging, arg.upper(), None)
@@ -939,9 +5629,31 @@ def main(argv):
             logging.getLogger().setLevel(logging_level)
             logging.info(f"Logging level set to {arg.upper()}")
         elif opt == "--disable-ffmpeg":
-            twitch_recorder.disable_ffmpeg = True
+            twitch_recorder.set_override("disable_ffmpeg", True)
             logging.info("FFmpeg disabled")
 
+    if repair_only:
+        # Repair the recordings of the given channels (all when none are given) and exit
+        if not twitch_recorder._ffmpeg_available:
+            sys.exit(1)
+        summary = twitch_recorder.repair_recordings(args or None)
+        sys.exit(1 if summary["failed"] else 0)
+    if batch_only:
+        # Clear the processing backlog of the given channels (all when none are given) and exit
+        twitch_recorder.disable_ffmpeg = twitch_recorder.disable_ffmpeg or not twitch_recorder._ffmpeg_available
+        summary = twitch_recorder.batch_process(args or None)
+        sys.exit(1 if any(stage["failed"] for stage in summary.values()) else 0)
+    if clip_only:
+        try:
+            output, _, _ = twitch_recorder.extract_clip(
+                args[0], parse_timestamp(args[1]), parse_timestamp(args[2]), args[3] if len(args) > 3 else None
+            )
+        except Exception as e:
+            logging.error(f"Clip extraction failed: {e}")
+            sys.exit(1)
+        print(output)
+        sys.exit(0)
+
     try:
         twitch_recorder.run()
     except KeyboardInterrupt: